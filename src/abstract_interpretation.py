@@ -0,0 +1,317 @@
+import dataclasses
+import math
+from typing import List, Dict, Tuple, Union, Callable
+from .dsl import Type, Variable, Program
+
+"""
+The bound of integers. math.inf is used when the value is not bounded.
+"""
+Bound = Union[int, float]
+
+
+@dataclasses.dataclass
+class Facts:
+    """
+    The facts of a variable that hold for all inputs
+
+    Attributes
+    ----------
+    minimum : Bound
+        The lower bound of the value (or the elements if the variable is a list)
+    maximum : Bound
+        The upper bound of the value (or the elements if the variable is a list)
+    min_length : Bound
+        The lower bound of the length. It is not used if the variable is an integer.
+    max_length : Bound
+        The upper bound of the length. It is not used if the variable is an integer.
+    sorted : bool
+        Whether the list is always sorted in the ascending order or not
+    """
+    minimum: Bound
+    maximum: Bound
+    min_length: Bound = 0
+    max_length: Bound = math.inf
+    sorted: bool = False
+
+    @property
+    def non_negative(self) -> bool:
+        return self.minimum >= 0
+
+    @property
+    def positive(self) -> bool:
+        return self.minimum > 0
+
+
+def _mul(x: Bound, y: Bound) -> Bound:
+    # 0 * inf should be 0 because the bounds are integers
+    if x == 0 or y == 0:
+        return 0
+    return x * y
+
+
+def _trunc_div(x: Bound, n: int) -> Bound:
+    # int(float(x) / n) in Python
+    if math.isinf(x):
+        return x
+    return (1 if x >= 0 else -1) * (abs(x) // n)
+
+
+def _interval_mul(lhs: Tuple[Bound, Bound], rhs: Tuple[Bound, Bound]) -> Tuple[Bound, Bound]:
+    products = [_mul(x, y) for x in lhs for y in rhs]
+    return min(products), max(products)
+
+
+def _scale(k: int) -> Callable[[Bound, Bound], Tuple[Bound, Bound]]:
+    return lambda lo, hi: (_mul(lo, k), _mul(hi, k))
+
+
+def _div(k: int) -> Callable[[Bound, Bound], Tuple[Bound, Bound]]:
+    return lambda lo, hi: (_trunc_div(lo, k), _trunc_div(hi, k))
+
+
+def _sqr(lo: Bound, hi: Bound) -> Tuple[Bound, Bound]:
+    if lo >= 0:
+        return _mul(lo, lo), _mul(hi, hi)
+    if hi <= 0:
+        return _mul(hi, hi), _mul(lo, lo)
+    return 0, max(_mul(lo, lo), _mul(hi, hi))
+
+
+# name -> (the transfer function of the interval, whether the function is monotonically increasing)
+_UNARY_LAMBDAS: Dict[str, Tuple[Callable[[Bound, Bound], Tuple[Bound, Bound]], Callable[[Bound, Bound], bool]]] = {
+    "IDT": (lambda lo, hi: (lo, hi), lambda lo, hi: True),
+    "INC": (lambda lo, hi: (lo + 1, hi + 1), lambda lo, hi: True),
+    "DEC": (lambda lo, hi: (lo - 1, hi - 1), lambda lo, hi: True),
+    "SHL": (_scale(2), lambda lo, hi: True),
+    "SHR": (_div(2), lambda lo, hi: True),
+    "doNEG": (lambda lo, hi: (-hi, -lo), lambda lo, hi: lo == hi),
+    "MUL3": (_scale(3), lambda lo, hi: True),
+    "DIV3": (_div(3), lambda lo, hi: True),
+    "MUL4": (_scale(4), lambda lo, hi: True),
+    "DIV4": (_div(4), lambda lo, hi: True),
+    "SQR": (_sqr, lambda lo, hi: lo >= 0 or lo == hi),
+}
+
+# name -> the function that receives the interval and returns (always true, always false)
+_PREDICATES: Dict[str, Callable[[Bound, Bound], Tuple[bool, bool]]] = {
+    "isPOS": lambda lo, hi: (lo > 0, hi <= 0),
+    "isNEG": lambda lo, hi: (hi < 0, lo >= 0),
+    "isODD": lambda lo, hi: (lo == hi and lo % 2 == 1, lo == hi and lo % 2 == 0),
+    "isEVEN": lambda lo, hi: (lo == hi and lo % 2 == 0, lo == hi and lo % 2 == 1),
+}
+
+# name -> (the transfer function of the intervals, whether the function is monotonically increasing)
+_BINARY_LAMBDAS: Dict[str, Tuple[Callable[[Tuple[Bound, Bound], Tuple[Bound, Bound]], Tuple[Bound, Bound]], bool]] = {
+    "+": (lambda x, y: (x[0] + y[0], x[1] + y[1]), True),
+    "-": (lambda x, y: (x[0] - y[1], x[1] - y[0]), False),
+    "*": (_interval_mul, False),
+    "MIN": (lambda x, y: (min(x[0], y[0]), min(x[1], y[1])), True),
+    "MAX": (lambda x, y: (max(x[0], y[0]), max(x[1], y[1])), True),
+}
+
+
+def _element(xs: Facts, null: Union[None, int], may_be_null: bool) -> Facts:
+    if xs.max_length == 0:
+        # The list is always empty
+        return Facts(null, null) if null is not None else Facts(-math.inf, math.inf)
+    if not may_be_null:
+        return Facts(xs.minimum, xs.maximum)
+    if null is None:
+        return Facts(-math.inf, math.inf)
+    return Facts(min(xs.minimum, null), max(xs.maximum, null))
+
+
+def _list(minimum: Bound, maximum: Bound, min_length: Bound, max_length: Bound,
+          is_sorted: bool) -> Facts:
+    # The lists whose elements are same are always sorted
+    is_sorted = is_sorted or max_length <= 1 or minimum == maximum
+    return Facts(minimum, maximum, min_length, max_length, is_sorted)
+
+
+def _sliced_length(n: Facts, xs: Facts, take: bool) -> Tuple[Bound, Bound]:
+    if n.minimum < 0:
+        # The negative index counts from the end (Python's slice)
+        return 0, xs.max_length
+    if take:
+        return min(n.minimum, xs.min_length), min(n.maximum, xs.max_length)
+    return max(xs.min_length - n.maximum, 0), max(xs.max_length - n.minimum, 0)
+
+
+def _scanl1(op: str, xs: Facts) -> Facts:
+    lo, hi, n = xs.minimum, xs.maximum, xs.max_length
+    if op == "+":
+        # The prefix sums of k elements are in [k * lo, k * hi]
+        return _list(min(lo, _mul(n, lo)), max(hi, _mul(n, hi)), xs.min_length, n, lo >= 0)
+    if op == "-":
+        return _list(min(lo, lo - _mul(n - 1, hi)), max(hi, hi - _mul(n - 1, lo)),
+                     xs.min_length, n, hi <= 0)
+    if op == "*":
+        if lo >= 0 and hi <= 1:
+            return _list(lo, hi, xs.min_length, n, False)
+        if lo >= 1:
+            return _list(lo, math.inf, xs.min_length, n, True)
+        return _list(-math.inf, math.inf, xs.min_length, n, False)
+    # The running minimum of the sorted list is its first element
+    return _list(lo, hi, xs.min_length, n, op == "MAX" or xs.sorted)
+
+
+def transfer(name: str, arguments: List[Facts], null: Union[None, int] = None) -> Facts:
+    """
+    Return the facts of the result of the function
+
+    Parameters
+    ----------
+    name : str
+        The name of the function (e.g., "HEAD", "MAP INC")
+    arguments : list of Facts
+        The facts of the arguments
+    null : int or None
+        The value returned by HEAD, ACCESS and so on when the list is empty.
+        If it is None, the value is unknown.
+
+    Returns
+    -------
+    Facts
+    """
+    if name == "REVERSE":
+        xs, = arguments
+        return _list(xs.minimum, xs.maximum, xs.min_length, xs.max_length, False)
+    if name == "SORT":
+        xs, = arguments
+        return _list(xs.minimum, xs.maximum, xs.min_length, xs.max_length, True)
+    if name in ["TAKE", "DROP"]:
+        n, xs = arguments
+        return _list(xs.minimum, xs.maximum, *_sliced_length(n, xs, name == "TAKE"), xs.sorted)
+    if name == "ACCESS":
+        n, xs = arguments
+        return _element(xs, null, True)
+    if name in ["HEAD", "LAST", "MINIMUM", "MAXIMUM"]:
+        xs, = arguments
+        return _element(xs, null, xs.min_length == 0)
+    if name == "SUM":
+        xs, = arguments
+        # The sum of k elements is in [k * lo, k * hi], and it is linear in k
+        sums = [_mul(k, bound) for k in [xs.min_length, xs.max_length]
+                for bound in [xs.minimum, xs.maximum]]
+        return Facts(min(sums), max(sums))
+
+    symbols = name.split(" ")
+    if len(symbols) != 2:
+        raise RuntimeError("Unknown function: {}".format(name))
+    hof, lambda_name = symbols
+    if hof == "MAP" and lambda_name in _UNARY_LAMBDAS:
+        xs, = arguments
+        f, monotone = _UNARY_LAMBDAS[lambda_name]
+        return _list(*f(xs.minimum, xs.maximum), xs.min_length, xs.max_length,
+                     xs.sorted and monotone(xs.minimum, xs.maximum))
+    if hof in ["FILTER", "COUNT"] and lambda_name in _PREDICATES:
+        xs, = arguments
+        always_true, always_false = _PREDICATES[lambda_name](xs.minimum, xs.maximum)
+        if always_true:
+            min_length, max_length = xs.min_length, xs.max_length
+        elif always_false:
+            min_length, max_length = 0, 0
+        else:
+            min_length, max_length = 0, xs.max_length
+        if hof == "COUNT":
+            return Facts(min_length, max_length)
+        lo, hi = xs.minimum, xs.maximum
+        if lambda_name == "isPOS":
+            lo = max(lo, 1)
+        elif lambda_name == "isNEG":
+            hi = min(hi, -1)
+        return _list(lo, hi, min_length, max_length, xs.sorted)
+    if hof == "ZIPWITH" and lambda_name in _BINARY_LAMBDAS:
+        xs, ys = arguments
+        f, monotone = _BINARY_LAMBDAS[lambda_name]
+        return _list(*f((xs.minimum, xs.maximum), (ys.minimum, ys.maximum)),
+                     min(xs.min_length, ys.min_length), min(xs.max_length, ys.max_length),
+                     monotone and xs.sorted and ys.sorted)
+    if hof == "SCANL1" and lambda_name in _BINARY_LAMBDAS:
+        xs, = arguments
+        return _scanl1(lambda_name, xs)
+    raise RuntimeError("Unknown function: {}".format(name))
+
+
+def input_facts(t: Type, value_range: Union[None, int] = None,
+                max_list_length: Union[None, int] = None) -> Facts:
+    """
+    Return the facts of an input variable
+
+    Parameters
+    ----------
+    t : Type
+    value_range : int or None
+        The inputs are in [-value_range, value_range]. If it is None, the values are not bounded.
+    max_list_length : int or None
+        The maximum length of input lists. If it is None, the lengths are not bounded.
+
+    Returns
+    -------
+    Facts
+    """
+    bound = value_range if value_range is not None else math.inf
+    if t == Type.Int:
+        return Facts(-bound, bound)
+    return _list(-bound, bound, 0,
+                 max_list_length if max_list_length is not None else math.inf, False)
+
+
+def analyze(program: Program, value_range: Union[None, int] = None,
+            max_list_length: Union[None, int] = None) -> Dict[Variable, Facts]:
+    """
+    Infer the facts of all variables by the abstract interpretation
+
+    Parameters
+    ----------
+    program : Program
+    value_range : int or None
+        The inputs are in [-value_range, value_range], and value_range is used as Null
+        (same as generate_io_samples). If it is None, the inputs are not bounded and
+        Null is unknown.
+    max_list_length : int or None
+        The maximum length of input lists. If it is None, the lengths are not bounded.
+
+    Returns
+    -------
+    dict from Variable to Facts
+    """
+    facts = dict()
+    for v in program.inputs:
+        facts[v] = input_facts(v.t, value_range, max_list_length)
+    for statement in program.body:
+        facts[statement.variable] = transfer(
+            statement.expression.function.name,
+            [facts[arg] for arg in statement.expression.arguments],
+            value_range)
+    return facts
+
+
+def may_produce_valid_output(program: Program, value_range: int, max_list_length: int) -> bool:
+    """
+    Return whether the program may produce the output in [-value_range, value_range - 1]
+
+    generate_io_samples fails to generate examples if the outputs are out of the range,
+    so the programs that return False can be discarded before compilation.
+    Null (value_range) is not a valid output (ExampleSampler also rejects the examples whose outputs are Null).
+
+    Parameters
+    ----------
+    program : Program
+    value_range : int
+    max_list_length : int
+
+    Returns
+    -------
+    bool
+        False if the output is out of the range for all inputs
+    """
+    if len(program.body) == 0:
+        return True
+    output = program.body[-1].variable
+    facts = analyze(program, value_range, max_list_length)[output]
+    overlapped = facts.minimum <= value_range - 1 and facts.maximum >= -value_range
+    if output.t == Type.Int:
+        return overlapped
+    # The empty list is always valid
+    return overlapped or facts.min_length == 0
@@ -0,0 +1,163 @@
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from typing import List, Dict, Hashable, Union
+from .dsl import Program
+from .dataset import Example
+from .compact_program import FunctionTable
+from .entry_store import EntryStore
+
+
+class BucketStore:
+    """
+    The buckets of the pending entries that spill the cold buckets to disk
+
+    Each bucket (e.g., the entries of one signature) is an EntryStore.
+    If the total size of the buckets in memory exceeds `max_memory_bytes`,
+    the least recently appended buckets are appended to their files and removed from memory.
+    `pop` reads the file and the entries in memory, so only one bucket is loaded at a time
+    when the buckets are popped one by one.
+
+    Attributes
+    ----------
+    max_memory_bytes : int or None
+        The maximum total size of the buckets in memory. If it is None, the buckets are never spilled.
+    num_spills : int
+        The number of times the buckets are written to the files
+    """
+
+    def __init__(self, table: FunctionTable, symbols: List[str],
+                 max_memory_bytes: Union[None, int] = None,
+                 directory: Union[None, str] = None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        table : FunctionTable
+        symbols : list of str
+            The arguments of EntryStore
+        max_memory_bytes : int or None
+        directory : str or None
+            The directory of the spilled buckets. If it is None, a temporary directory is
+            created when a bucket is spilled first.
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.num_spills = 0
+        self._table = table
+        self._symbols = symbols
+        self._directory = directory
+        self._tmpdir: Union[None, tempfile.TemporaryDirectory] = None
+        self._buckets: OrderedDict = OrderedDict()  # key -> EntryStore (the least recently used first)
+        self._sizes: Dict[Hashable, int] = dict()  # key -> the number of the entries (including spilled ones)
+        self._filenames: Dict[Hashable, str] = dict()
+        self._memory_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._sizes
+
+    def keys(self) -> List[Hashable]:
+        """
+        Return the keys of the buckets in the order of creation
+        """
+        return list(self._sizes.keys())
+
+    def size(self, key: Hashable) -> int:
+        """
+        Return the number of the entries in the bucket
+        """
+        return self._sizes.get(key, 0)
+
+    def append(self, key: Hashable, program: Program, examples: List[Example],
+               attribute: Dict[str, bool]) -> int:
+        """
+        Add the entry to the bucket
+
+        Parameters
+        ----------
+        key : Hashable
+            The key of the bucket
+        program : Program
+        examples : list of Example
+        attribute : dict from str to bool
+
+        Returns
+        -------
+        int
+            The index of the entry in the bucket. It is same as the index in the EntryStore returned by pop.
+        """
+        if not key in self._buckets:
+            self._buckets[key] = EntryStore(self._table, self._symbols)
+        bucket = self._buckets[key]
+        self._buckets.move_to_end(key)
+
+        self._memory_bytes -= bucket.nbytes
+        bucket.append(program, examples, attribute)
+        self._memory_bytes += bucket.nbytes
+        index = self._sizes.get(key, 0)
+        self._sizes[key] = index + 1
+
+        if self.max_memory_bytes is not None:
+            while self._memory_bytes > self.max_memory_bytes and len(self._buckets) != 0:
+                self._spill(next(iter(self._buckets)))
+        return index
+
+    def _spill(self, key: Hashable):
+        bucket = self._buckets.pop(key)
+        self._memory_bytes -= bucket.nbytes
+        if not key in self._filenames:
+            if self._directory is None:
+                self._tmpdir = tempfile.TemporaryDirectory()
+                self._directory = self._tmpdir.name
+            os.makedirs(self._directory, exist_ok=True)
+            self._filenames[key] = os.path.join(
+                self._directory, "bucket-{:05d}.pickle".format(len(self._filenames)))
+        # The chunks are appended, so the order of the entries is kept.
+        # Only the arrays are written because the table is shared by all buckets.
+        with open(self._filenames[key], "ab") as f:
+            pickle.dump(bucket.arrays(), f)
+        self.num_spills += 1
+
+    def pop(self, key: Hashable) -> EntryStore:
+        """
+        Remove the bucket and return all its entries
+
+        Parameters
+        ----------
+        key : Hashable
+
+        Returns
+        -------
+        EntryStore
+        """
+        store = EntryStore(self._table, self._symbols)
+        filename = self._filenames.pop(key, None)
+        if filename is not None:
+            with open(filename, "rb") as f:
+                while True:
+                    try:
+                        store.extend_arrays(pickle.load(f))
+                    except EOFError:
+                        break
+            os.remove(filename)
+        bucket = self._buckets.pop(key, None)
+        if bucket is not None:
+            self._memory_bytes -= bucket.nbytes
+            store.extend(bucket)
+        self._sizes.pop(key, None)
+        return store
+
+    def close(self):
+        """
+        Remove the spilled files
+        """
+        for filename in self._filenames.values():
+            os.remove(filename)
+        self._filenames.clear()
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """
+    The bounded cache that discards the least recently used items
+
+    Attributes
+    ----------
+    maxsize : int
+        The maximum number of items
+    hits : int
+        The number of lookups that find the item
+    misses : int
+        The number of lookups that do not find the item
+    """
+
+    def __init__(self, maxsize: int):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        maxsize : int
+        """
+        if maxsize <= 0:
+            raise RuntimeError("maxsize should be positive: {}".format(maxsize))
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the cached value and mark it as recently used
+
+        Parameters
+        ----------
+        key : Hashable
+        default : Any
+            The value returned when the key is not cached
+
+        Returns
+        -------
+        Any
+        """
+        if key not in self._items:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the cached value without changing the order and the counters
+        """
+        return self._items.get(key, default)
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Cache the value. The least recently used item is discarded if the cache is full.
+
+        Parameters
+        ----------
+        key : Hashable
+        value : Any
+        """
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # This does not change the order and the counters
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def hit_rate(self) -> float:
+        n = self.hits + self.misses
+        return self.hits / n if n != 0 else 0.0
+
+
+class ProgramCache:
+    """
+    The caches used by generate_dataset (the keys are Program.fingerprint)
+
+    Attributes
+    ----------
+    simplified : LRUCache
+        The raw program -> the simplified and normalized program
+    compiled : LRUCache
+        The simplified program -> the program compiled by generate_io_samples.
+        The value is None if the compilation or the generation of IO examples was failed.
+    """
+
+    def __init__(self, simplified_size: int = 100000, compiled_size: int = 100000):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        simplified_size : int
+            The maximum number of cached simplification results
+        compiled_size : int
+            The maximum number of cached compilation results
+        """
+        self.simplified = LRUCache(simplified_size)
+        self.compiled = LRUCache(compiled_size)
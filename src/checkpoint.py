@@ -0,0 +1,122 @@
+import os
+import pickle
+from typing import List, Any, Tuple, Union
+from .program_generator import Frame
+
+
+class Checkpoint:
+    """
+    The checkpoint of the exhaustive enumeration
+
+    The checkpoint consists of two files in the directory:
+    * log.pickle : the append-only sequence of pickled records (e.g., the generated entries)
+    * frontier.pickle : the snapshot of the enumeration frontier and the size of the valid log
+
+    Records are appended to the log when they are created, and the frontier is
+    written (atomically, by renaming a temporary file) only once per `interval` programs.
+    So the cost of a checkpoint does not depend on the number of the generated entries.
+
+    Attributes
+    ----------
+    directory : str
+        The directory to store the checkpoint
+    interval : int
+        The number of programs between the snapshots of the frontier
+    """
+
+    def __init__(self, directory: str, interval: int = 10000):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        directory : str
+        interval : int
+        """
+        self.directory = directory
+        self.interval = interval
+        self._log = None
+        self._n_programs = 0
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.directory, "log.pickle")
+
+    @property
+    def _frontier_path(self) -> str:
+        return os.path.join(self.directory, "frontier.pickle")
+
+    def load(self) -> Union[None, Tuple[List[Frame], List[Any]]]:
+        """
+        Load the last checkpoint and open the log to append records
+
+        The records written after the last snapshot of the frontier are discarded
+        because the corresponding programs will be enumerated again.
+
+        Returns
+        -------
+        (list of Frame, list of records) or None
+            The frontier and the records. If there is no checkpoint, it returns None.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(self._frontier_path):
+            self._log = open(self._log_path, "wb")
+            return None
+
+        with open(self._frontier_path, "rb") as f:
+            frontier, log_size = pickle.load(f)
+
+        records = []
+        with open(self._log_path, "r+b") as f:
+            f.truncate(log_size)
+            while f.tell() < log_size:
+                records.append(pickle.load(f))
+        self._log = open(self._log_path, "ab")
+        return frontier, records
+
+    def append(self, record: Any):
+        """
+        Append the record to the log
+        """
+        pickle.dump(record, self._log)
+
+    def step(self, frontier: List[Frame]):
+        """
+        Notify that one program is processed
+
+        It saves the frontier once per `interval` calls.
+
+        Parameters
+        ----------
+        frontier : list of Frame
+            The current frontier of the enumeration
+        """
+        self._n_programs += 1
+        if self._n_programs % self.interval == 0:
+            self.save(frontier)
+
+    def save(self, frontier: List[Frame]):
+        """
+        Save the frontier
+
+        Parameters
+        ----------
+        frontier : list of Frame
+            The current frontier of the enumeration
+        """
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        tmp = self._frontier_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((frontier, self._log.tell()), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._frontier_path)
+
+    def close(self):
+        """
+        Close the log
+        """
+        if self._log is not None:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,229 @@
+import numpy as np
+from typing import List, Dict, Union
+from .dsl import Function, Type, Variable, Expression, Statement, Program, id_to_name
+
+"""
+The pseudo opcodes that represent the input variables
+"""
+INPUT_INT = -1
+INPUT_INT_LIST = -2
+
+
+class FunctionTable:
+    """
+    The bidirectional mapping between functions and integer opcodes
+
+    Attributes
+    ----------
+    functions : list of Function
+        The functions. The opcode of a function is its index in this list.
+    max_arity : int
+        The maximum number of arguments of the functions
+    """
+    __slots__ = ("functions", "max_arity", "_opcodes")
+
+    def __init__(self, functions: List[Function]):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        functions : list of Function
+        """
+        self.functions = list(functions)
+        self.max_arity = max(
+            [len(f.signature.input_types) for f in self.functions], default=0)
+        self._opcodes: Dict[Function, int] = dict()
+        for i, f in enumerate(self.functions):
+            self._opcodes[f] = i
+
+    def opcode(self, function: Function) -> int:
+        """
+        Return the opcode of the function
+        """
+        return self._opcodes[function]
+
+    def function(self, opcode: int) -> Function:
+        """
+        Return the function of the opcode
+        """
+        return self.functions[opcode]
+
+
+def input_opcode(t: Type) -> int:
+    """
+    Return the pseudo opcode of the input variable
+    """
+    return INPUT_INT if t == Type.Int else INPUT_INT_LIST
+
+
+class CompactProgram:
+    """
+    The array-backed representation of DSL programs
+
+    Each row of `code` defines one variable, and the id of the variable is
+    the index of the row. The rows are sorted by definition order, so the
+    input variables can be placed between statements.
+    The row of a statement is (opcode, argument ids..., -1 padding), and
+    the row of an input variable is (INPUT_INT or INPUT_INT_LIST, -1...).
+
+    Attributes
+    ----------
+    table : FunctionTable
+        The table used to decode opcodes
+    code : np.array
+        The array with the shape of (#variables, 1 + table.max_arity)
+    """
+    __slots__ = ("table", "code")
+
+    def __init__(self, table: FunctionTable, code: Union[None, np.array] = None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        table : FunctionTable
+        code : np.array or None
+            The rows of the program. If it is None, the program will be empty.
+        """
+        self.table = table
+        self.code = code if code is not None else np.zeros(
+            (0, 1 + table.max_arity), dtype=np.int16)
+
+    def __len__(self) -> int:
+        """
+        Return the number of statements
+        """
+        return int(np.count_nonzero(self.code[:, 0] >= 0))
+
+    def __eq__(self, rhs) -> bool:
+        return isinstance(rhs, CompactProgram) and np.array_equal(self.code, rhs.code)
+
+    def __hash__(self) -> int:
+        return hash(self.code.tobytes())
+
+    @property
+    def input_types(self) -> List[Type]:
+        """
+        Return the types of the input variables
+        """
+        return [Type.Int if op == INPUT_INT else Type.IntList for op in self.code[:, 0] if op < 0]
+
+    def variable_type(self, id: int) -> Type:
+        """
+        Return the type of the variable
+        """
+        op = int(self.code[id, 0])
+        if op < 0:
+            return Type.Int if op == INPUT_INT else Type.IntList
+        return self.table.function(op).signature.output_type
+
+    def append(self, function: Function, arguments: List[int],
+               new_inputs: Union[None, List[Type]] = None) -> "CompactProgram":
+        """
+        Return the program that the statement is appended to
+
+        Parameters
+        ----------
+        function : Function
+            The function that the new statement calls
+        arguments : list of int
+            The ids of the arguments
+        new_inputs : list of Type or None
+            The types of input variables defined before the new statement.
+            Their ids are assigned from len(self.code). None means no new inputs.
+
+        Returns
+        -------
+        CompactProgram
+            The new program. This program is not modified.
+        """
+        if new_inputs is None:
+            new_inputs = []
+        rows = np.full((len(new_inputs) + 1, self.code.shape[1]), -1,
+                       dtype=self.code.dtype)
+        for i, t in enumerate(new_inputs):
+            rows[i, 0] = input_opcode(t)
+        rows[-1, 0] = self.table.opcode(function)
+        rows[-1, 1:1 + len(arguments)] = arguments
+        return CompactProgram(self.table, np.concatenate([self.code, rows]))
+
+    def to_program(self) -> Program:
+        """
+        Convert to Program
+
+        Returns
+        -------
+        Program
+            The program whose variable ids are the row indexes
+        """
+        inputs = []
+        body = []
+        types = []
+        for id, row in enumerate(self.code.tolist()):
+            op = row[0]
+            if op < 0:
+                t = Type.Int if op == INPUT_INT else Type.IntList
+                inputs.append(Variable(id, t))
+            else:
+                f = self.table.function(op)
+                t = f.signature.output_type
+                args = [Variable(arg, types[arg])
+                        for arg in row[1:1 + len(f.signature.input_types)]]
+                body.append(Statement(Variable(id, t), Expression(f, args)))
+            types.append(t)
+        return Program(inputs, body)
+
+    @staticmethod
+    def from_program(program: Program, table: FunctionTable) -> "CompactProgram":
+        """
+        Convert from Program
+
+        Parameters
+        ----------
+        program : Program
+            The program to convert. The variables are sorted by ids,
+            so the ids should be increasing in the definition order
+            (it holds for the generated and normalized programs).
+        table : FunctionTable
+
+        Returns
+        -------
+        CompactProgram
+        """
+        variables = sorted([(v.id, None, v.t) for v in program.inputs] +
+                           [(s.variable.id, s.expression, None) for s in program.body],
+                           key=lambda x: x[0])
+        id_to_index = dict([(id, i) for i, (id, _, _) in enumerate(variables)])
+        code = np.full((len(variables), 1 + table.max_arity), -1,
+                       dtype=np.int16)
+        for i, (_, expression, t) in enumerate(variables):
+            if expression is None:
+                code[i, 0] = input_opcode(t)
+            else:
+                code[i, 0] = table.opcode(expression.function)
+                for j, arg in enumerate(expression.arguments):
+                    code[i, 1 + j] = id_to_index[arg.id]
+        return CompactProgram(table, code)
+
+    def to_string(self) -> str:
+        """
+        Return the source code of the program
+
+        Returns
+        -------
+        code : string
+            The source code. It is same as Program.to_string of to_program().
+        """
+        code = ""
+        rows = self.code.tolist()
+        for id, row in enumerate(rows):
+            if row[0] < 0:
+                code += "{} <- {}\n".format(id_to_name(id),
+                                            "int" if row[0] == INPUT_INT else "[int]")
+        for id, row in enumerate(rows):
+            if row[0] >= 0:
+                f = self.table.function(row[0])
+                code += "{} <- {} {}\n".format(id_to_name(id), f.name, " ".join(
+                    map(id_to_name, row[1:1 + len(f.signature.input_types)])))
+        return code
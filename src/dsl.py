@@ -1,7 +1,8 @@
 import dataclasses
+import hashlib
+import struct
 from enum import Enum
-from typing import List
-import copy
+from typing import List, Dict
 from src.deepcoder_utils import generate_io_samples
 
 
@@ -64,6 +65,7 @@ class Variable:
     t : Type
         The type of this variable
     """
+    __slots__ = ("id", "t")
 
     id: int
     t: Type
@@ -87,6 +89,7 @@ class Expression:
     arguments: list of Variable
         The arguments of the function call
     """
+    __slots__ = ("function", "arguments")
 
     function: Function
     arguments: List[Variable]
@@ -103,16 +106,76 @@ class Statement:
         The variable defined in this statement
     expression : Expression
     """
+    __slots__ = ("variable", "expression")
 
     variable: Variable
     expression: Expression
 
 
+def id_to_name(id: int) -> str:
+    """
+    Return the name of the variable used in the source code
+
+    Parameters
+    ----------
+    id : int
+        The identifier of the variable
+
+    Returns
+    -------
+    name : str
+        The name of the variable (e.g., "a", "b", ...)
+    """
+    name = ""
+    while True:
+        x = id % 26
+        id //= 26
+        name += chr(x + ord('a'))
+        if id == 0:
+            break
+    return name
+
+
+def name_to_id(name: str) -> int:
+    """
+    Return the identifier of the variable from its name
+
+    Parameters
+    ----------
+    name : str
+        The name of the variable (e.g., "a", "b", ...)
+
+    Returns
+    -------
+    id : int
+        The identifier of the variable. It is the inverse of id_to_name.
+    """
+    id = 0
+    for i, c in enumerate(name):
+        id += (ord(c) - ord('a')) * (26 ** i)
+    return id
+
+
+_function_digests: Dict[str, bytes] = dict()
+
+
+def _function_digest(name: str) -> bytes:
+    digest = _function_digests.get(name)
+    if digest is None:
+        digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+        _function_digests[name] = digest
+    return digest
+
+
 @dataclasses.dataclass
 class Program:
     """
     The program of DSL
 
+    The source code and the fingerprint are computed lazily and cached,
+    so the program should not be modified after calling to_string or fingerprint
+    (the programs returned by clone do not have the caches).
+
     Attributes
     ----------
     inputs : list of Variable
@@ -122,10 +185,15 @@ class Program:
         The interpreter will execute an expression and store the result
         to the variablefor each element of the list.
     """
+    __slots__ = ("inputs", "body", "_string", "_fingerprint")
 
     inputs: List[Variable]
     body: List[Statement]
 
+    def __post_init__(self):
+        self._string = None
+        self._fingerprint = None
+
     def to_string(self) -> str:
         """
         Return the source code of the program
@@ -135,19 +203,10 @@ class Program:
         code : string
             The source code of this program
         """
+        if self._string is not None:
+            return self._string
 
         code = ""
-
-        def id_to_name(id: int) -> str:
-            name = ""
-            while True:
-                x = id % 26
-                id //= 26
-                name += chr(x + ord('a'))
-                if id == 0:
-                    break
-            return name
-
         for input in self.inputs:
             code += "{} <- {}\n".format(id_to_name(input.id),
                                         "int" if input.t == Type.Int else "[int]")
@@ -155,8 +214,38 @@ class Program:
             code += "{} <- {} {}\n".format(id_to_name(statement.variable.id), statement.expression.function.name, " ".join(
                 map(lambda x: id_to_name(x.id), statement.expression.arguments)))
 
+        self._string = code
         return code
 
+    def fingerprint(self) -> int:
+        """
+        Return the structural fingerprint of the program
+
+        The programs with the same source code have the same fingerprint.
+        It is a 128-bit hash, so it can be used as the key of sets and dicts
+        instead of the source code.
+
+        Returns
+        -------
+        fingerprint : int
+        """
+        if self._fingerprint is not None:
+            return self._fingerprint
+
+        h = hashlib.blake2b(digest_size=16)
+        h.update(struct.pack("<qq", len(self.inputs), len(self.body)))
+        for input in self.inputs:
+            h.update(struct.pack("<qb", input.id, input.t.value))
+        for statement in self.body:
+            h.update(struct.pack("<qq", statement.variable.id,
+                                 len(statement.expression.arguments)))
+            h.update(_function_digest(statement.expression.function.name))
+            h.update(struct.pack("<{}q".format(len(statement.expression.arguments)),
+                                 *[arg.id for arg in statement.expression.arguments]))
+
+        self._fingerprint = int.from_bytes(h.digest(), "little")
+        return self._fingerprint
+
     def clone(self):
         """
         Return the copy of the program
@@ -169,15 +258,12 @@ class Program:
             The program that is same as this program
         """
 
-        inputs = []
+        inputs = [Variable(input.id, input.t) for input in self.inputs]
         body = []
-        for input in self.inputs:
-            inputs.append(copy.deepcopy(input))
         for statement in self.body:
-            args = []
-            for arg in statement.expression.arguments:
-                args.append(copy.deepcopy(arg))
-            body.append(Statement(copy.deepcopy(statement.variable),
+            args = [Variable(arg.id, arg.t)
+                    for arg in statement.expression.arguments]
+            body.append(Statement(Variable(statement.variable.id, statement.variable.t),
                                   Expression(statement.expression.function, args)))
 
         return Program(inputs, body)
@@ -0,0 +1,336 @@
+import time
+from typing import List, Dict, Set, Tuple, Union
+from .dsl import Function, Variable, Expression, Statement, Program
+from .compact_program import CompactProgram
+from .program_simplifier import _clone, remove_redundant_variables
+from .rewrite_rules import RewriteEngine, RewriteRule, LINQ_RULES
+
+"""
+The node of e-graphs.
+("input", id, type) represents the input variable, and
+("call", function, (class ids...)) represents the function call.
+"""
+ENode = Tuple
+
+
+class EGraph:
+    """
+    The e-graph of straight-line DSL programs
+
+    Each e-class is a set of e-nodes that are known to be equivalent.
+    The children of call nodes are e-class ids.
+    """
+
+    def __init__(self):
+        self._parent: List[int] = []
+        self._classes: Dict[int, Set[ENode]] = dict()
+        self._hashcons: Dict[ENode, int] = dict()
+
+    def find(self, c: int) -> int:
+        """
+        Return the canonical id of the e-class
+        """
+        root = c
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[c] != root:
+            self._parent[c], c = root, self._parent[c]
+        return root
+
+    def _canonicalize(self, node: ENode) -> ENode:
+        if node[0] == "input":
+            return node
+        return ("call", node[1], tuple([self.find(c) for c in node[2]]))
+
+    def add(self, node: ENode) -> int:
+        """
+        Add the e-node and return the id of its e-class
+        """
+        node = self._canonicalize(node)
+        c = self._hashcons.get(node)
+        if c is not None:
+            return self.find(c)
+        c = len(self._parent)
+        self._parent.append(c)
+        self._classes[c] = set([node])
+        self._hashcons[node] = c
+        return c
+
+    def union(self, a: int, b: int) -> bool:
+        """
+        Merge the e-classes
+
+        Returns
+        -------
+        bool
+            Whether the e-classes are different or not
+        """
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return False
+        if len(self._classes[a]) < len(self._classes[b]):
+            a, b = b, a
+        self._parent[b] = a
+        self._classes[a] |= self._classes.pop(b)
+        return True
+
+    def rebuild(self):
+        """
+        Restore the congruence (the e-nodes with the equivalent children are merged)
+        """
+        while True:
+            merges = []
+            hashcons = dict()
+            for c in list(self._classes.keys()):
+                nodes = set([self._canonicalize(node) for node in self._classes[c]])
+                self._classes[c] = nodes
+                for node in nodes:
+                    other = hashcons.get(node)
+                    if other is not None and other != c:
+                        merges.append((other, c))
+                    else:
+                        hashcons[node] = c
+            self._hashcons = hashcons
+            if len(merges) == 0:
+                break
+            for a, b in merges:
+                self.union(a, b)
+
+    @property
+    def num_nodes(self) -> int:
+        """
+        Return the number of e-nodes
+        """
+        return len(self._hashcons)
+
+    def classes(self) -> Dict[int, Set[ENode]]:
+        """
+        Return the e-classes (the canonical id -> the set of e-nodes)
+        """
+        return self._classes
+
+    def add_program(self, program: Program) -> int:
+        """
+        Add the program and return the e-class of its output
+        """
+        variable_to_class = dict()
+        for v in program.inputs:
+            variable_to_class[v.id] = self.add(("input", v.id, v.t))
+        c = None
+        for statement in program.body:
+            c = self.add(("call", statement.expression.function,
+                          tuple([variable_to_class[arg.id] for arg in statement.expression.arguments])))
+            variable_to_class[statement.variable.id] = c
+        return c
+
+    def saturate(self, rules: RewriteEngine, max_nodes: int, max_iterations: int,
+                 timeout_seconds: Union[None, float] = None) -> bool:
+        """
+        Apply the rewrite rules until no rule adds the new equivalence
+
+        The rules with conditions are ignored because the conditions are defined on expressions.
+
+        Parameters
+        ----------
+        rules : RewriteEngine
+        max_nodes : int
+            The maximum number of e-nodes
+        max_iterations : int
+            The maximum number of iterations
+        timeout_seconds : float or None
+            The time budget. If it is None, only max_nodes and max_iterations bound the saturation,
+            so the result does not depend on the machine.
+
+        Returns
+        -------
+        bool
+            Whether the e-graph is saturated or not
+        """
+        begin = time.perf_counter()
+        for _ in range(max_iterations):
+            matches = []
+            for c, nodes in self._classes.items():
+                for node in nodes:
+                    if node[0] == "input":
+                        continue
+                    outer = node[1]
+                    for position, child in enumerate(node[2]):
+                        for inner in self._classes[self.find(child)]:
+                            if inner[0] == "input":
+                                continue
+                            for rule, f in rules.rules(outer.name, inner[1].name, position):
+                                if rule.condition is None:
+                                    matches.append((c, node, inner, rule, f))
+
+            changed = False
+            for c, node, inner, rule, f in matches:
+                arguments = [(node if src == "outer" else inner)[2][i]
+                             for src, i in rule.arguments]
+                if rule.function is None:
+                    target = arguments[0]
+                else:
+                    target = self.add(
+                        ("call", f if f is not None else node[1], tuple(arguments)))
+                changed |= self.union(c, target)
+            self.rebuild()
+
+            if not changed:
+                return True
+            if self.num_nodes > max_nodes:
+                return False
+            if timeout_seconds is not None and time.perf_counter() - begin > timeout_seconds:
+                return False
+        return False
+
+    def extract(self, root: int) -> Program:
+        """
+        Extract the smallest program of the e-class
+
+        The cost of an e-node is the number of function calls in its expression tree,
+        and the ties are broken by the names of functions and the ids of inputs
+        so that the equivalent e-graphs give the same program.
+
+        Parameters
+        ----------
+        root : int
+            The e-class of the output
+
+        Returns
+        -------
+        Program
+            The program. The ids of the input variables are same as the added program.
+        """
+        best: Dict[int, Tuple[Tuple, ENode]] = dict()
+
+        def cost(node: ENode) -> Union[None, Tuple]:
+            if node[0] == "input":
+                return (0, (), node[1])
+            children = [best.get(self.find(child)) for child in node[2]]
+            if any([child is None for child in children]):
+                return None
+            return (1 + sum([child[0][0] for child in children]),
+                    (node[1].name, *[child[0] for child in children]), 0)
+
+        updated = True
+        while updated:
+            updated = False
+            for c, nodes in self._classes.items():
+                for node in nodes:
+                    key = cost(node)
+                    if key is None:
+                        continue
+                    if not c in best or key < best[c][0]:
+                        best[c] = (key, node)
+                        updated = True
+
+        root = self.find(root)
+        root_node = best[root][1]
+        if root_node[0] == "input":
+            # The output should be defined by a statement even if it is equivalent to an input
+            root_node = min([(cost(node), node) for node in self._classes[root]
+                             if node[0] == "call" and cost(node) is not None],
+                            key=lambda x: x[0])[1]
+
+        inputs = []
+        body = []
+        class_to_variable = dict()
+        next_id = 1 + max([node[1] for nodes in self._classes.values()
+                           for node in nodes if node[0] == "input"], default=-1)
+
+        def emit_call(node: ENode) -> Variable:
+            nonlocal next_id
+            arguments = [emit(child) for child in node[2]]
+            v = Variable(next_id, node[1].signature.output_type)
+            next_id += 1
+            body.append(Statement(v, Expression(node[1], arguments)))
+            return v
+
+        def emit(c: int) -> Variable:
+            c = self.find(c)
+            if c in class_to_variable:
+                return class_to_variable[c]
+            _, node = best[c]
+            if node[0] == "input":
+                v = Variable(node[1], node[2])
+                inputs.append(v)
+            else:
+                v = emit_call(node)
+            class_to_variable[c] = v
+            return v
+
+        if root_node is best[root][1]:
+            emit(root)
+        else:
+            emit_call(root_node)
+        inputs.sort(key=lambda v: v.id)
+        return Program(inputs, body)
+
+
+class EGraphSimplifier:
+    """
+    The simplifier that canonicalizes programs by equality saturation
+
+    It can be used as the simplify function of generate_dataset.
+
+    Attributes
+    ----------
+    num_saturated : int
+        The number of programs whose e-graphs are saturated within the budget
+    num_programs : int
+        The number of simplified programs
+    """
+
+    def __init__(self, functions: List[Function], rules: Union[None, List[RewriteRule]] = None,
+                 max_nodes: int = 1000, max_iterations: int = 10,
+                 timeout_seconds: Union[None, float] = None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        functions : list of Function
+            The functions that can be used in the simplified programs
+        rules : list of RewriteRule or None
+            The identities. If it is None, LINQ_RULES is used.
+        max_nodes : int
+            The maximum number of e-nodes of each program
+        max_iterations : int
+            The maximum number of the iterations of the saturation
+        timeout_seconds : float or None
+            The time budget of the saturation of each program. It is disabled by default
+            because the simplified programs would depend on the load of the machine.
+        """
+        self._rules = RewriteEngine(rules if rules is not None else LINQ_RULES, functions)
+        self.max_nodes = max_nodes
+        self.timeout_seconds = timeout_seconds
+        self.max_iterations = max_iterations
+        self.num_saturated = 0
+        self.num_programs = 0
+
+    def __call__(self, program: Union[Program, CompactProgram]) -> Program:
+        """
+        Return the smallest equivalent program found by the e-graph
+
+        Parameters
+        ----------
+        program : Program or CompactProgram
+            The program that will be simplified. It is not modified.
+
+        Returns
+        -------
+        Program
+            The simplified program. It is not normalized.
+        """
+        program = remove_redundant_variables(_clone(program))
+        self.num_programs += 1
+        if len(program.body) == 0:
+            return program
+
+        egraph = EGraph()
+        root = egraph.add_program(program)
+        if egraph.saturate(self._rules, self.max_nodes, self.max_iterations, self.timeout_seconds):
+            self.num_saturated += 1
+        extracted = egraph.extract(root)
+        # The tree cost does not consider the shared expressions, so the extracted program can be longer
+        return extracted if len(extracted.body) <= len(program.body) else program
@@ -0,0 +1,185 @@
+import array
+import numpy as np
+from typing import List, Dict, Tuple
+from .dsl import Type, Program
+from .dataset import Primitive, Example, Entry
+from .compact_program import FunctionTable, CompactProgram
+
+
+class EntryStore:
+    """
+    The columnar store of the entries that are not written yet
+
+    The entries are kept in flat arrays instead of Python objects:
+    the programs are the rows of CompactProgram, the inputs and outputs of the examples are
+    one int32 array (a list is stored as its length followed by its elements),
+    and the attributes are packed into bits. The source code, the programs and
+    the examples are rebuilt only when they are accessed.
+
+    Attributes
+    ----------
+    table : FunctionTable
+        The table used to encode the programs
+    symbols : list of str
+        The keys of the attributes
+    """
+
+    def __init__(self, table: FunctionTable, symbols: List[str]):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        table : FunctionTable
+        symbols : list of str
+            The keys of the attributes. The attributes of the rebuilt entries have the keys in this order.
+        """
+        self.table = table
+        self.symbols = list(symbols)
+        self._width = 1 + table.max_arity
+        self._attribute_bytes = (len(self.symbols) + 7) // 8
+        self._code = array.array("h")
+        self._code_offsets = array.array("q", [0])
+        # The values are bounded by the value range (OverflowError is raised otherwise)
+        self._values = array.array("i")
+        self._value_offsets = array.array("q", [0])
+        self._attributes = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._code_offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Return the size of the arrays in bytes
+        """
+        return sum([x.itemsize * len(x) for x in
+                    [self._code, self._code_offsets, self._values, self._value_offsets]]) + \
+            len(self._attributes)
+
+    def append(self, program: Program, examples: List[Example], attribute: Dict[str, bool]) -> int:
+        """
+        Add the entry
+
+        Parameters
+        ----------
+        program : Program
+            The program of the entry. It should be normalized
+            (the ids are consecutive numbers and the inputs are defined first),
+            so the rebuilt program is same as this program.
+        examples : list of Example
+        attribute : dict from str to bool
+
+        Returns
+        -------
+        int
+            The index of the entry
+        """
+        code = CompactProgram.from_program(program, self.table).code
+        self._code.extend(code.ravel().tolist())
+        self._code_offsets.append(len(self._code))
+
+        for example in examples:
+            for value in example.inputs + [example.output]:
+                if isinstance(value, list):
+                    self._values.append(len(value))
+                    self._values.extend(map(int, value))
+                else:
+                    self._values.append(int(value))
+        self._value_offsets.append(len(self._values))
+
+        bits = np.array([attribute.get(symbol, False) for symbol in self.symbols], dtype=np.bool_)
+        self._attributes.extend(np.packbits(bits).tobytes().ljust(self._attribute_bytes, b"\0"))
+        return len(self) - 1
+
+    def extend(self, other: "EntryStore"):
+        """
+        Add all entries of the other store
+
+        Parameters
+        ----------
+        other : EntryStore
+            The store with the same functions and symbols.
+            The index of its i-th entry becomes len(self) + i.
+        """
+        self.extend_arrays(other.arrays())
+
+    def arrays(self) -> Tuple[array.array, array.array, array.array, array.array, bytearray]:
+        """
+        Return the arrays of the entries
+
+        The table and the symbols are not contained, so the arrays are small to be pickled.
+        They can be added to the store with the same table and symbols by `extend_arrays`.
+        """
+        return self._code, self._code_offsets, self._values, self._value_offsets, self._attributes
+
+    def extend_arrays(self, arrays: Tuple[array.array, array.array, array.array, array.array, bytearray]):
+        """
+        Add all entries of the arrays returned by `arrays`
+        """
+        code, code_offsets, values, value_offsets, attributes = arrays
+        code_base = len(self._code)
+        value_base = len(self._values)
+        self._code.extend(code)
+        self._code_offsets.extend([offset + code_base for offset in code_offsets[1:]])
+        self._values.extend(values)
+        self._value_offsets.extend([offset + value_base for offset in value_offsets[1:]])
+        self._attributes.extend(attributes)
+
+    def compact_program(self, index: int) -> CompactProgram:
+        """
+        Return the program of the entry as CompactProgram
+        """
+        code = np.array(self._code[self._code_offsets[index]:self._code_offsets[index + 1]],
+                        dtype=np.int16)
+        return CompactProgram(self.table, code.reshape(-1, self._width))
+
+    def program(self, index: int) -> Program:
+        """
+        Return the program of the entry
+        """
+        return self.compact_program(index).to_program()
+
+    def source_code(self, index: int) -> str:
+        """
+        Return the source code of the entry (without the last newline)
+        """
+        return self.compact_program(index).to_string()[:-1]
+
+    def examples(self, index: int) -> List[Example]:
+        """
+        Return the examples of the entry
+        """
+        program = self.compact_program(index)
+        types = program.input_types + \
+            [program.variable_type(len(program.code) - 1)]
+        values = self._values[self._value_offsets[index]:self._value_offsets[index + 1]]
+        examples = []
+        i = 0
+        while i < len(values):
+            primitives: List[Primitive] = []
+            for t in types:
+                if t == Type.Int:
+                    primitives.append(values[i])
+                    i += 1
+                else:
+                    primitives.append(list(values[i + 1:i + 1 + values[i]]))
+                    i += 1 + values[i]
+            examples.append(Example(primitives[:-1], primitives[-1]))
+        return examples
+
+    def attribute(self, index: int) -> Dict[str, bool]:
+        """
+        Return the attribute of the entry
+        """
+        packed = np.frombuffer(
+            bytes(self._attributes[index * self._attribute_bytes:(index + 1) * self._attribute_bytes]),
+            dtype=np.uint8)
+        bits = np.unpackbits(packed)[:len(self.symbols)]
+        return dict([(symbol, bool(bit)) for symbol, bit in zip(self.symbols, bits)])
+
+    def entry(self, index: int) -> Entry:
+        """
+        Return the entry
+        """
+        return Entry(self.source_code(index), self.examples(index), self.attribute(index))
@@ -0,0 +1,320 @@
+import numpy as np
+from typing import List, Dict, Tuple, Union
+from .dsl import Type, Variable, Program
+from .dataset import Example
+from .interpreter import IntListBatch, execute_statements, from_batch
+from .abstract_interpretation import may_produce_valid_output
+
+"""
+The closed interval of integers. The interval is empty if the lower bound is larger than the upper bound.
+"""
+Interval = Tuple[int, int]
+
+_NULLABLE_FUNCTIONS = set(["HEAD", "LAST", "MINIMUM", "MAXIMUM", "ACCESS"])
+
+
+def _ceil_div(x: int, n: int) -> int:
+    return -((-x) // n)
+
+
+def _isqrt(x: int) -> int:
+    # The largest r such that r * r <= x (x >= 0)
+    r = int(x ** 0.5)
+    while r * r > x:
+        r -= 1
+    while (r + 1) * (r + 1) <= x:
+        r += 1
+    return r
+
+
+def _iroot(x: int, n: int) -> int:
+    # The largest r such that r ** n <= x (x >= 0)
+    r = int(x ** (1.0 / n))
+    while r > 0 and r ** n > x:
+        r -= 1
+    while (r + 1) ** n <= x:
+        r += 1
+    return r
+
+
+def _sum_preimage(lo: int, hi: int, n: int) -> Interval:
+    # The sum of at most n elements in the interval is in [lo, hi]
+    if lo > 0 or hi < 0:
+        return (1, 0)
+    return (_ceil_div(lo, n), hi // n)
+
+
+def _symmetric_preimage(lo: int, hi: int, n: int) -> Interval:
+    # The alternating sum of at most n elements in the interval is in [lo, hi]
+    if lo > 0 or hi < 0:
+        return (1, 0)
+    r = min(-lo, hi) // n
+    return (-r, r)
+
+
+def _sqr_preimage(lo: int, hi: int) -> Interval:
+    if hi < 0:
+        return (1, 0)
+    r = _isqrt(hi)
+    if lo <= 0:
+        return (-r, r)
+    # Only the positive part is used
+    return (_isqrt(lo - 1) + 1, r)
+
+
+def _mul_preimage(lo: int, hi: int, n: int) -> Interval:
+    # The product of at most n elements is in [lo, hi]
+    if lo > 0 or hi < 0:
+        return (1, 0)
+    r = _iroot(min(-lo, hi), n)
+    return (-r, r)
+
+
+# name -> the preimage of the interval (the interval of x such that f(x) is in [lo, hi])
+_UNARY_PREIMAGES = {
+    "IDT": lambda lo, hi: (lo, hi),
+    "INC": lambda lo, hi: (lo - 1, hi - 1),
+    "DEC": lambda lo, hi: (lo + 1, hi + 1),
+    "SHL": lambda lo, hi: (_ceil_div(lo, 2), hi // 2),
+    "SHR": lambda lo, hi: (lo * 2, hi * 2),
+    "doNEG": lambda lo, hi: (-hi, -lo),
+    "MUL3": lambda lo, hi: (_ceil_div(lo, 3), hi // 3),
+    "DIV3": lambda lo, hi: (lo * 3, hi * 3),
+    "MUL4": lambda lo, hi: (_ceil_div(lo, 4), hi // 4),
+    "DIV4": lambda lo, hi: (lo * 4, hi * 4),
+    "SQR": _sqr_preimage,
+}
+
+# name -> the preimages of the intervals of the arguments (x, y) such that f(x, y) is in [lo, hi]
+_BINARY_PREIMAGES = {
+    "+": lambda lo, hi: [(_ceil_div(lo, 2), hi // 2)] * 2,
+    "-": lambda lo, hi: [(_ceil_div(lo, 2), hi // 2), (-(hi // 2), -_ceil_div(lo, 2))],
+    "*": lambda lo, hi: [_mul_preimage(lo, hi, 2)] * 2,
+    "MIN": lambda lo, hi: [(lo, hi)] * 2,
+    "MAX": lambda lo, hi: [(lo, hi)] * 2,
+}
+
+# name -> the preimage of the elements such that all partial results are in [lo, hi]
+_SCANL1_PREIMAGES = {
+    "+": _sum_preimage,
+    "-": _symmetric_preimage,
+    "*": _mul_preimage,
+    "MIN": lambda lo, hi, n: (lo, hi),
+    "MAX": lambda lo, hi, n: (lo, hi),
+}
+
+
+def preimage(name: str, interval: Interval, max_list_length: int) -> List[Union[None, Interval]]:
+    """
+    Compute the intervals of the arguments that keep the output in the interval
+
+    If all arguments (the elements if the argument is a list) are in the returned intervals,
+    the output (the elements if the output is a list) is in the interval or Null.
+    The intervals are sufficient conditions, so they may be narrower than the exact preimage.
+
+    Parameters
+    ----------
+    name : str
+        The name of the function
+    interval : Interval
+        The interval of the output
+    max_list_length : int
+        The maximum length of the lists
+
+    Returns
+    -------
+    list of (Interval or None)
+        The interval of each argument. None means that the argument is not constrained
+        (e.g., the index of TAKE, the list of COUNT).
+    """
+    lo, hi = interval
+    symbols = name.split(" ")
+    if symbols[0] in ["TAKE", "DROP", "ACCESS"]:
+        return [None, (lo, hi)]
+    if symbols[0] in ["REVERSE", "SORT", "HEAD", "LAST", "MINIMUM", "MAXIMUM", "FILTER"]:
+        return [(lo, hi)]
+    if symbols[0] == "COUNT":
+        return [None]
+    if symbols[0] == "SUM":
+        return [_sum_preimage(lo, hi, max_list_length)]
+    if symbols[0] == "MAP":
+        return [_UNARY_PREIMAGES[symbols[1]](lo, hi)]
+    if symbols[0] == "ZIPWITH":
+        return _BINARY_PREIMAGES[symbols[1]](lo, hi)
+    if symbols[0] == "SCANL1":
+        return [_SCANL1_PREIMAGES[symbols[1]](lo, hi, max_list_length)]
+    raise RuntimeError("Unknown function: {}".format(name))
+
+
+def input_intervals(program: Program, value_range: int, max_list_length: int) -> Dict[Variable, Interval]:
+    """
+    Propagate the value range backward from the output to the inputs
+
+    Parameters
+    ----------
+    program : Program
+    value_range : int
+        All values (except Null) should be in [-value_range, value_range - 1]
+    max_list_length : int
+
+    Returns
+    -------
+    dict from Variable to Interval
+        The interval of each variable. If the inputs are in the intervals,
+        all variables are in their intervals. The interval may be empty.
+    """
+    intervals = dict()
+
+    def constrain(v: Variable, interval: Interval):
+        lo, hi = intervals.get(v, (-value_range, value_range - 1))
+        intervals[v] = (max(lo, interval[0]), min(hi, interval[1]))
+
+    for v in program.inputs:
+        constrain(v, (-value_range, value_range - 1))
+    for statement in reversed(program.body):
+        constrain(statement.variable, (-value_range, value_range - 1))
+        interval = intervals[statement.variable]
+        if interval[0] > interval[1]:
+            # No value is valid
+            return {v: (1, 0) for v in list(intervals.keys()) + program.inputs}
+        expression = statement.expression
+        for arg, arg_interval in zip(expression.arguments,
+                                     preimage(expression.function.name, interval, max_list_length)):
+            if arg_interval is not None:
+                constrain(arg, arg_interval)
+    return {v: intervals[v] for v in program.inputs}
+
+
+class ExampleSampler:
+    """
+    The sampler of IO examples that does not rely on rejection
+
+    The value range is propagated backward through the program (see input_intervals),
+    and the inputs are sampled from the propagated intervals at once, so all intermediate values
+    and the output are in the value range by construction. The sampled examples are verified by executing
+    the program, and the invalid examples are sampled again only when the propagation is not precise
+    (e.g., COUNT of a long list). Null is regarded as a valid intermediate value, but the output should not be Null
+    (same as generate_io_samples and may_produce_valid_output).
+
+    Attributes
+    ----------
+    num_programs : int
+        The number of programs passed to `sample`
+    num_fallbacks : int
+        The number of programs that fell back to rejection sampling
+    num_rejected_examples : int
+        The number of rejected examples
+    num_failures : int
+        The number of programs whose examples could not be sampled
+    """
+
+    def __init__(self, value_range: int, max_list_length: int, max_attempts: int = 10,
+                 rng: Union[None, np.random.RandomState] = None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        value_range : int
+            All values (except Null) are in [-value_range, value_range - 1]
+        max_list_length : int
+            The lengths of input lists are in [1, max_list_length], and
+            the integer inputs are in [-max_list_length, max_list_length]
+        max_attempts : int
+            The maximum number of the batches sampled for one program
+        rng : np.random.RandomState or None
+        """
+        self.value_range = value_range
+        self.max_list_length = max_list_length
+        self.max_attempts = max_attempts
+        self._rng = rng if rng is not None else np.random
+        self.num_programs = 0
+        self.num_fallbacks = 0
+        self.num_rejected_examples = 0
+        self.num_failures = 0
+
+    @property
+    def fallback_rate(self) -> float:
+        return self.num_fallbacks / self.num_programs if self.num_programs != 0 else 0.0
+
+    def _sample_inputs(self, program: Program, intervals: Dict[Variable, Interval], n: int):
+        L = self.max_list_length
+        inputs = []
+        for v in program.inputs:
+            lo, hi = intervals[v]
+            if v.t == Type.Int:
+                inputs.append(self._rng.randint(max(lo, -L), min(hi, L) + 1,
+                                                size=n).astype(np.int64))
+            else:
+                lengths = self._rng.randint(1, L + 1, size=n).astype(np.int64)
+                values = self._rng.randint(lo, hi + 1, size=(n, L)).astype(np.int64)
+                values[np.arange(L)[None, :] >= lengths[:, None]] = 0
+                inputs.append(IntListBatch(values, lengths))
+        return inputs
+
+    def _is_valid(self, program: Program, values: Dict[Variable, np.array], n: int) -> np.array:
+        valid = np.ones(n, dtype=np.bool_)
+        # The output should be in the value range
+        nullable = set([statement.variable for statement in program.body[:-1]
+                        if statement.expression.function.name.split(" ")[0] in _NULLABLE_FUNCTIONS])
+        for v, value in values.items():
+            if isinstance(value, IntListBatch):
+                mask = np.arange(value.values.shape[1])[None, :] < value.lengths[:, None]
+                in_range = (value.values >= -self.value_range) & (value.values < self.value_range)
+                valid &= np.all(in_range | ~mask, axis=1)
+            else:
+                in_range = (value >= -self.value_range) & (value < self.value_range)
+                if v in nullable:
+                    in_range |= value == self.value_range
+                valid &= in_range
+        return valid
+
+    def sample(self, program: Program, num_examples: int) -> Union[None, List[Example]]:
+        """
+        Sample IO examples of the program
+
+        Parameters
+        ----------
+        program : Program
+        num_examples : int
+
+        Returns
+        -------
+        list of Example or None
+            None if the examples could not be sampled
+            (e.g., there is no valid input, or the attempts are exhausted).
+        """
+        self.num_programs += 1
+        if not may_produce_valid_output(program, self.value_range, self.max_list_length):
+            # The output is always out of the range (e.g., always Null)
+            self.num_failures += 1
+            return None
+        intervals = input_intervals(program, self.value_range, self.max_list_length)
+        if any([lo > hi for lo, hi in intervals.values()]) or \
+                any([max(lo, -self.max_list_length) > min(hi, self.max_list_length)
+                     for v, (lo, hi) in intervals.items() if v.t == Type.Int]):
+            self.num_failures += 1
+            return None
+
+        examples: List[Example] = []
+        fallback = False
+        for _ in range(self.max_attempts):
+            n = num_examples - len(examples)
+            inputs = self._sample_inputs(program, intervals, n)
+            values = execute_statements(program, inputs, self.value_range)
+            valid = self._is_valid(program, values, n)
+            if not np.all(valid):
+                fallback = True
+                self.num_rejected_examples += int(np.sum(~valid))
+            inputs = list(zip(*[from_batch(x) for x in inputs]))
+            outputs = from_batch(values[program.body[-1].variable])
+            for i in np.nonzero(valid)[0]:
+                examples.append(Example(list(inputs[i]), outputs[i]))
+            if len(examples) == num_examples:
+                break
+        if fallback:
+            self.num_fallbacks += 1
+        if len(examples) != num_examples:
+            self.num_failures += 1
+            return None
+        return examples
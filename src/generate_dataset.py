@@ -3,14 +3,30 @@ import copy
 import pickle
 import os
 import contextlib
+import collections
+import functools
+import hashlib
+import multiprocessing
+import random
 import numpy as np
 import chainer as ch
-from typing import List, Tuple, Union, Dict, Callable, Iterator
+from typing import List, Tuple, Union, Dict, Callable, Iterator, Any, Iterable
 from .dataset import Primitive, Example, Entry, Dataset, dataset_metadata
 from .deepcoder_utils import generate_io_samples
 from .dsl import Function, Program, Type, to_function, Signature
-from .program_simplifier import normalize
-from .program_generator import programs, random_programs
+from .program_simplifier import normalize, Pipeline
+from .program_generator import ProgramEnumerator, random_programs, Constraint, RandomProgramSampler
+from .interpreter import Value, execute, inputs_to_batch, output_key
+from .program_space import count_programs, SizedIterator
+from .checkpoint import Checkpoint
+from .abstract_interpretation import may_produce_valid_output
+from .cache import ProgramCache
+from .sharded_dataset import ShardedDatasetWriter
+from .incremental_execution import ProbeInputs, IncrementalExecutor
+from .example_sampler import ExampleSampler
+from .compact_program import FunctionTable
+from .bucket_store import BucketStore
+from .membership import ExactSet, BloomFilter
 
 
 @dataclasses.dataclass
@@ -43,12 +59,133 @@ class EquivalenceCheckingSpec:
     ratio_of_examples : float
     num_of_examples : int
     rng : np.random.RandomState or None
+    num_of_examples_in_first_phase : int
+        The number of examples used to split the programs before using all examples.
+        Only the programs that are not distinguished by these examples are executed
+        with the remaining examples.
+    num_of_probes : int
+        The number of the fixed inputs (ProbeInputs) used when all programs are enumerated.
+        The enumerated programs are executed with them incrementally (IncrementalExecutor),
+        and the programs whose outputs are different for the probes are never merged.
+        If it is 0, the probes are not used.
     """
     ratio_of_examples: float
     num_of_examples: int
     rng: Union[np.random.RandomState, None]
+    num_of_examples_in_first_phase: int = 3
+    num_of_probes: int = 0
 
 
+_NOT_CACHED = object()
+# The entry of the program that is not sent to the workers because it was processed before
+_ALREADY_DISPATCHED = object()
+
+
+def _probe_key(value: Value) -> bytes:
+    # The 128-bit digest of the outputs for the probes. It is kept for each pending entry,
+    # so the full output_key (num_of_probes values) is not kept in memory.
+    return hashlib.blake2b(output_key(value), digest_size=16).digest()
+
+
+def _equivalence_classes(programs: List[Program], examples: List[List[Primitive]],
+                         input_types: List[Type], null: int, num_first: int,
+                         keys: Union[None, List[bytes]] = None) -> List[List[int]]:
+    """
+    Split the programs into the classes of the programs whose outputs are same for all examples
+
+    The programs are split by the first `num_first` examples at first, and the remaining
+    examples are used only for the classes that contain multiple programs.
+    The classes are same as the ones created by using all examples at once.
+    If `keys` (e.g., the outputs for the probes) is not None, the programs are split by them before
+    using the examples.
+
+    Returns
+    -------
+    list of list of int
+        The indexes of the programs in each class. The classes are sorted by their first indexes.
+    """
+    classes = [list(range(len(programs)))]
+    if keys is not None:
+        buckets = dict()  # bytes -> [int]
+        for i, key in enumerate(keys):
+            if not key in buckets:
+                buckets[key] = []
+            buckets[key].append(i)
+        classes = list(buckets.values())
+    for phase in [examples[:num_first], examples[num_first:]]:
+        if len(phase) == 0:
+            continue
+        inputs = inputs_to_batch(phase, input_types)
+        new_classes = []
+        for c in classes:
+            if len(c) == 1:
+                new_classes.append(c)
+                continue
+            buckets = dict()  # bytes -> [int]
+            for i in c:
+                key = output_key(execute(programs[i], inputs, null))
+                if not key in buckets:
+                    buckets[key] = []
+                buckets[key].append(i)
+            new_classes.extend(buckets.values())
+        classes = new_classes
+    classes.sort(key=lambda c: c[0])
+    return classes
+
+# The number of programs sent to a worker process at once
+_CHUNK_SIZE = 64
+
+# The function executed by the worker processes. It is set before forking them.
+_worker_function: Union[None, Callable[[Any], Any]] = None
+
+
+def _run_chunk(seed: int, xs: List[Any]) -> List[Any]:
+    results = []
+    for i, x in enumerate(xs):
+        # generate_io_samples uses the global random states
+        np.random.seed((seed + i) % (2 ** 32))
+        random.seed((seed + i) % (2 ** 32))
+        results.append(_worker_function(x))
+    return results
+
+
+def _parallel_map(f: Callable[[Any], Any], xs: Iterable[Any], n_processes: int,
+                  seed: int) -> Iterator[Any]:
+    """
+    Apply the function in the worker processes and yield the results in order
+
+    At most 2 * n_processes chunks are processed at once, so `xs` can be an infinite iterator.
+    Each element is processed with the random state seeded by (seed + the index of the element),
+    so the result of an element does not depend on the number of processes, the scheduling,
+    and the other elements.
+    `xs` is consumed before the results of the previous elements are yielded,
+    so the elements should not depend on the results (e.g., the feedback to a sampler).
+    """
+    global _worker_function
+    _worker_function = f
+    xs = iter(xs)
+    # The fork context is used to share `f` (it may be a closure) with the workers
+    with multiprocessing.get_context("fork").Pool(n_processes) as pool:
+        _worker_function = None
+        pending = collections.deque()
+        n_chunks = 0
+        while True:
+            while len(pending) < 2 * n_processes:
+                chunk = []
+                for x in xs:
+                    chunk.append(x)
+                    if len(chunk) == _CHUNK_SIZE:
+                        break
+                if len(chunk) == 0:
+                    break
+                pending.append(pool.apply_async(
+                    _run_chunk, ((seed + n_chunks * _CHUNK_SIZE) % (2 ** 32), chunk)))
+                n_chunks += 1
+            if len(pending) == 0:
+                break
+            yield from pending.popleft().get()
+
+# The simplify function should not modify the argument (return the modified copy instead)
 SimplifyFunction = Callable[[Program], Program]
 
 
@@ -72,7 +209,18 @@ def generate_dataset(functions: List[generate_io_samples.Function], spec: Datase
                      destination: str,
                      num_dataset: Union[None, int] = None,
                      simplify: Union[None, SimplifyFunction] = None,
-                     decorator: Union[None, IteratorDecorator] = None):
+                     decorator: Union[None, IteratorDecorator] = None,
+                     constraints: Union[None, List[Constraint]] = None,
+                     sampler: Union[None, RandomProgramSampler] = None,
+                     checkpoint: Union[None, Checkpoint] = None,
+                     cache: Union[None, ProgramCache] = None,
+                     n_processes: Union[None, int] = None,
+                     max_shard_bytes: Union[None, int] = None,
+                     example_sampler: Union[None, ExampleSampler] = None,
+                     max_memory_bytes: Union[None, int] = None,
+                     spill_directory: Union[None, str] = None,
+                     invalid_programs: Union[None, ExactSet, BloomFilter] = None,
+                     seen_programs: Union[None, ExactSet, BloomFilter] = None):
     """
     Generate dataset to the file
 
@@ -90,30 +238,106 @@ def generate_dataset(functions: List[generate_io_samples.Function], spec: Datase
         The number of dataset to be created.
         If this argument is None, the function enumerate all source code
     simplify : function or None
-        The function to simplify the source code
+        The function to simplify the source code.
+        If it is a Pipeline, it is applied only once.
     decorator: IteratorDecorator or None
         The decorator of iterators. It is maily used to show the progress (e.g., tqdm)
+    constraints : list of Constraint or None
+        The constraints that the generated programs should satisfy (e.g., SymmetryBreaking, NoDeadCode)
+    sampler : RandomProgramSampler or None
+        The sampler used when num_dataset is not None. It should be created with
+        the functions converted by to_function. The lengths of the simplified programs are
+        reported to the sampler, and its statistics show the discard rates.
+        If this argument is None, random_programs is used.
+    checkpoint : Checkpoint or None
+        The checkpoint used when num_dataset is None. If the checkpoint directory contains
+        the previous run, the enumeration is resumed from it.
+        The arguments should be same as the previous run, and the program decorator
+        should not prefetch the programs.
+    cache : ProgramCache or None
+        The caches of the simplified and compiled programs. If it is not None,
+        the failures are remembered by the bounded cache instead of the unbounded set,
+        so the same program may be compiled again after it is evicted.
+        The hit/miss counters of the cache can be used to check its effectiveness.
+    n_processes : int or None
+        The number of worker processes that generate IO examples.
+        The sampling (or enumeration), simplification, deduplication and pruning are done
+        in this process. The programs that are being processed by the workers, the invalid programs,
+        and the duplicates (found by seen_programs or the pending entries) are not sent to the workers.
+        The lengths are reported to the sampler before the next program is sampled.
+        If it is None or 1, all stages are done in this process.
+        The workers seed the random states (np.random and random) for each program
+        by using the seed drawn from np.random, so the results are deterministic
+        if np.random is seeded, and they do not depend on the number of workers.
+        It cannot be used with the checkpoint.
+    max_shard_bytes : int or None
+        If it is not None, the dataset is written to the directory `destination` as
+        the shard files of this size (see ShardedDatasetWriter and ShardedDataset).
+        The entries are written as soon as they are pruned instead of being kept until the end.
+    example_sampler : ExampleSampler or None
+        The sampler of IO examples. If it is None, generate_io_samples.generate_IO_examples is used.
+        Its statistics are not updated by the worker processes if n_processes is larger than 1.
+    max_memory_bytes : int or None
+        The maximum size of the pending entries kept in memory when enumerating source code.
+        If it is exceeded, the signatures that are not updated recently are spilled to the files,
+        and they are read one by one when pruning the entries (see BucketStore).
+        The fingerprints of the entries (and the 16-byte digests of the outputs for the probes)
+        are always kept in memory to detect duplicates.
+        If it is None, all entries are kept in memory.
+    spill_directory : str or None
+        The directory of the spilled entries. If it is None, a temporary directory is used.
+    invalid_programs : ExactSet, BloomFilter or None
+        The set of the programs whose entries could not be generated.
+        If it is None, the exact set (or the cache if it is not None) is used.
+        BloomFilter bounds the memory usage, but the valid programs may be discarded
+        with the probability of its false positive rate.
+        Its memory usage (nbytes) and hit rate can be used to check its effectiveness.
+    seen_programs : ExactSet, BloomFilter or None
+        The set of the processed programs. If it is not None, it is used to detect duplicates
+        instead of the pending entries, and the programs in this set are skipped without generating
+        their entries again (e.g., the programs pruned in the random sampling).
+        If it is None, only the programs in the dataset are regarded as duplicates.
 
     Notes
     -----
-    Currently this function generates and prunes source code in memory.
-    It might be a problem if the program size is large.
+    When enumerating source code, the pending entries are kept in EntryStore (and spilled to the files
+    if max_memory_bytes is not None) until the entries of each signature are pruned.
+    When sampling programs, an entry is written as soon as it is added if its length is min_program_length,
+    because no shorter equivalent program can replace it. The other entries are kept in memory
+    (without the compiled programs) until num_dataset entries are found, so the memory usage still grows
+    with the number of such entries.
+    The entries are streamed to the files only if max_shard_bytes is not None.
+    Otherwise all entries are kept in memory and written as one file at the end.
     """
 
     @dataclasses.dataclass
     class IntermidiateEntry:
         source_code: str
-        program: generate_io_samples.Program
+        program: Union[None, generate_io_samples.Program]  # None if it is created by a worker process
+        dsl_program: Program
         examples: List[Example]
         attribute: Dict[str, bool]
 
     def simplify_and_normalize(program: Program) -> Program:
+        if cache is None:
+            return _simplify_and_normalize(program)
+        key = program.fingerprint()
+        retval = cache.simplified.get(key)
+        if retval is None:
+            retval = _simplify_and_normalize(program)
+            cache.simplified.put(key, retval)
+        return retval
+
+    def _simplify_and_normalize(program: Program) -> Program:
+        if isinstance(simplify, Pipeline):
+            # The pipeline detects the fixpoint and normalizes the program by itself
+            return simplify(program)
         while True:
-            p_old = program.to_string()
+            p_old = program.fingerprint()
             if simplify is not None:
                 program = simplify(program)
 
-            if program.to_string() == p_old:
+            if program.fingerprint() == p_old:
                 break
         program = normalize(program)
         return program
@@ -127,28 +351,72 @@ def generate_dataset(functions: List[generate_io_samples.Function], spec: Datase
         return Signature(input, output)
 
     functions_dsl = [to_function(f) for f in functions]
-    invalid_program = set()
-    entries = dict()  # Signature -> dict(str -> IntermidiateEntry)
+    # set of fingerprints
+    invalid_program = invalid_programs if invalid_programs is not None else ExactSet()
+    entries = dict()  # Signature -> dict(fingerprint -> IntermidiateEntry)
+
+    def is_invalid(key: int) -> bool:
+        if cache is not None and invalid_programs is None:
+            return key in cache.compiled and cache.compiled.peek(key) is None
+        return key in invalid_program
+
+    def add_invalid(key: int):
+        if cache is not None and invalid_programs is None:
+            cache.compiled.put(key, None)
+        else:
+            invalid_program.add(key)
+
+    def is_duplicate(signature: Signature, key: int) -> bool:
+        if seen_programs is None:
+            return key in entries[signature]
+        # The set replaces the membership test of `entries`, so `entries` only keeps the entries
+        if key in seen_programs:
+            # The program was processed in the past (or it is a false positive of the filter)
+            return True
+        seen_programs.add(key)
+        return False
+
+    def compile_program(program: Program, code: str) -> Union[None, generate_io_samples.Program]:
+        if cache is not None:
+            key = program.fingerprint()
+            p = cache.compiled.get(key, _NOT_CACHED)
+            if p is not _NOT_CACHED:
+                return p
+
+        with contextlib.redirect_stdout(None):  # ignore stdout
+            p = generate_io_samples.compile(
+                code, V=spec.value_range, L=spec.max_list_length)
+        if cache is not None:
+            cache.compiled.put(key, p)
+        return p
 
     def generate_intermidiate_entry(program: Program) -> Union[None, IntermidiateEntry]:
+        if not may_produce_valid_output(program, spec.value_range, spec.max_list_length):
+            # The outputs are always out of the range, so generating IO examples never succeeds
+            return None
+
         # last newline should be removed to compile source code
         code = program.to_string()[:-1]
 
         # Compile the source code
-        with contextlib.redirect_stdout(None):  # ignore stdout
-            p = generate_io_samples.compile(
-                code, V=spec.value_range, L=spec.max_list_length)
+        p = compile_program(program, code)
         if p is None:
             # Compilation is failed
             return None
 
-        try:
-            # Generate IO examples
-            with contextlib.redirect_stdout(None):  # ignore stdout
-                examples = generate_io_samples.generate_IO_examples(
-                    p, N=spec.num_examples, L=spec.max_list_length, V=spec.value_range)
-        except ValueError:
-            return None
+        if example_sampler is not None:
+            examples = example_sampler.sample(program, spec.num_examples)
+            if examples is None:
+                return None
+        else:
+            try:
+                # Generate IO examples
+                with contextlib.redirect_stdout(None):  # ignore stdout
+                    examples = generate_io_samples.generate_IO_examples(
+                        p, N=spec.num_examples, L=spec.max_list_length, V=spec.value_range)
+            except ValueError:
+                return None
+            examples = list(map(lambda x: Example(x[0], x[1]), examples))
 
         # Generate binary attribute
         ss = set()
@@ -162,40 +430,211 @@ def generate_dataset(functions: List[generate_io_samples.Function], spec: Datase
                     attribute[symbol] = False
                 attribute[symbol] |= symbol in ss
 
-        return IntermidiateEntry(code, p, list(map(lambda x: Example(x[0], x[1]), examples)), attribute)
+        return IntermidiateEntry(code, p, program, examples, attribute)
+
+    def process(program: Union[None, Program]) -> Union[None, Tuple[str, List[Example], Dict[str, bool]]]:
+        # Executed by the worker processes. The compiled program is not returned because it is not picklable.
+        if program is None:
+            # The program is not sent to the workers
+            return None
+        entry = generate_intermidiate_entry(program)
+        if entry is None:
+            return None
+        return entry.source_code, entry.examples, entry.attribute
+
+    def simplified_programs(programs: Iterable[Program]) \
+            -> Iterator[Tuple[Program, Callable[[], Union[None, IntermidiateEntry]]]]:
+        # Yield the simplified program and the function to create its entry
+        def simplify_all():
+            for program in programs:
+                raw_length = len(program.body)
+                program = simplify_and_normalize(program)
+                if sampler is not None and num_dataset is not None:
+                    # The length is reported before the next program is sampled
+                    sampler.observe(raw_length, len(program.body))
+                yield program
+
+        if n_processes is None or n_processes == 1:
+            for program in simplify_all():
+                # The entry is generated only if the program is not a duplicate
+                yield program, functools.partial(generate_intermidiate_entry, program)
+            return
+
+        # The programs are simplified in this process, and the programs that were processed before
+        # (or are being processed) are not sent to the workers. Such a program is also skipped
+        # (or discarded by pruning) when it is processed in this process, and the workers seed
+        # the random states for each program, so the entries do not depend on the number of workers.
+        in_flight = collections.deque()  # (program, whether it is sent to the workers)
+        in_flight_keys = set()  # The fingerprints of the programs in the workers (bounded by the prefetch)
+
+        def is_processed(program: Program, key: int) -> bool:
+            if key in in_flight_keys or is_invalid(key):
+                return True
+            if seen_programs is not None:
+                return key in seen_programs
+            return key in entries.get(get_signature(program), ())
+
+        def dispatch():
+            for program in simplify_all():
+                if not (spec.min_program_length <= len(program.body) <= spec.max_program_length):
+                    in_flight.append((program, False))
+                    yield None
+                    continue
+                key = program.fingerprint()
+                if is_processed(program, key):
+                    in_flight.append((program, False))
+                    yield None
+                    continue
+                in_flight_keys.add(key)
+                in_flight.append((program, True))
+                yield program
+
+        for result in _parallel_map(process, dispatch(), n_processes, np.random.randint(2 ** 31)):
+            program, dispatched = in_flight.popleft()
+            if not dispatched:
+                yield program, (lambda: _ALREADY_DISPATCHED)
+                continue
+            in_flight_keys.remove(program.fingerprint())
+            entry = None
+            if result is not None:
+                code, examples, attribute = result
+                entry = IntermidiateEntry(code, None, program, examples, attribute)
+            yield program, (lambda entry=entry: entry)
+
+    if checkpoint is not None and not (n_processes is None or n_processes == 1):
+        raise RuntimeError("The checkpoint cannot be used with multiple processes")
+
+    # The destination of the pruned entries
+    if max_shard_bytes is None:
+        dataset = []
+        write = dataset.append
+    else:
+        writer = ShardedDatasetWriter(destination, spec.value_range, spec.max_list_length,
+                                      max_shard_bytes)
+        write = writer.append
 
     if num_dataset is None:
         # Enumerate source code
-        d = decorator.program_decorator if decorator is not None else lambda x: x
-        for program in d(programs(functions_dsl, spec.min_program_length, spec.max_program_length)):
-            program = simplify_and_normalize(program)  # Simplify the program
+        # The pending entries are kept in the compact stores until they are pruned
+        table = FunctionTable([to_function(f)
+                               for f in generate_io_samples.get_language(spec.value_range)[0]])
+        symbols = list(dict.fromkeys([symbol for f in functions_dsl for symbol in f.name.split(" ")]))
+        buckets = BucketStore(table, symbols, max_memory_bytes,
+                              spill_directory)  # Signature -> EntryStore
+
+        def add_entry(signature: Signature, key: int, program: Program, examples: List[Example],
+                      attribute: Dict[str, bool]):
+            entries[signature][key] = buckets.append(
+                signature, program, examples, attribute)
+
+        frontier = None
+        if checkpoint is not None:
+            state = checkpoint.load()
+            if state is not None:
+                # Resume from the checkpoint
+                frontier, records = state
+                for record in records:
+                    if record[0] == "invalid":
+                        add_invalid(record[1])
+                        continue
+                    _, signature, code, dsl_program, examples, attribute = record
+                    if not signature in entries:
+                        entries[signature] = dict()
+                    key = dsl_program.fingerprint()
+                    add_entry(signature, key, dsl_program, examples, attribute)
+                    if seen_programs is not None:
+                        seen_programs.add(key)
+
+        executor = None
+        if equivalence_spec.num_of_probes > 0:
+            executor = IncrementalExecutor(
+                ProbeInputs(equivalence_spec.num_of_probes, spec.value_range, spec.max_list_length,
+                            equivalence_spec.rng),
+                spec.value_range)
+        probe_keys = dict()  # fingerprint -> the digest of the outputs for the probes
+        # The number of the inputs and the output for the probes of each raw program
+        raw_outputs = collections.deque()
+
+        def add_program(program: Program, get_entry: Callable[[], Union[None, IntermidiateEntry]],
+                        raw_output: Union[None, Tuple[int, Any]]):
             if not (spec.min_program_length <= len(program.body) <= spec.max_program_length):
                 # If the length of simplified program is out of range, discard the program
-                continue
+                return
 
             signature = get_signature(program)
             if not signature in entries:
                 entries[signature] = dict()
 
-            if program.to_string() in invalid_program:
+            key = program.fingerprint()
+            if is_invalid(key):
                 # Generating the entry for this program was failed in the past
-                continue
+                return
+            if is_duplicate(signature, key):
+                # the program is already added to the dataset
+                return
 
-            entry = generate_intermidiate_entry(program)
+            entry = get_entry()
+            if entry is _ALREADY_DISPATCHED:
+                # The program was processed before, so it is not invalid
+                return
             if entry is None:
-                invalid_program.add(program.to_string())
-                continue
-            if entry.source_code in entries[signature]:
-                # the program is already added to the dataset
-                continue
+                add_invalid(key)
+                if checkpoint is not None:
+                    checkpoint.append(("invalid", key))
+                return
+
+            add_entry(signature, key, entry.dsl_program,
+                      entry.examples, entry.attribute)
+            if executor is not None:
+                num_inputs, output = raw_output
+                if len(program.inputs) != num_inputs:
+                    # The inputs are removed by the simplification, so the probes are assigned differently
+                    output = executor.execute(program)
+                # The simplification does not change the output
+                probe_keys[key] = _probe_key(output)
+            if checkpoint is not None:
+                checkpoint.append(("entry", signature, entry.source_code, entry.dsl_program,
+                                   entry.examples, entry.attribute))
 
-            entries[signature][entry.source_code] = entry
+        d = decorator.program_decorator if decorator is not None else lambda x: x
+        enumerator = ProgramEnumerator(functions_dsl, spec.min_program_length,
+                                       spec.max_program_length, constraints, frontier)
+        ps = iter(enumerator)
+        if executor is not None:
+            def execute_incrementally(ps):
+                for program in ps:
+                    # Only the last statement is evaluated if the prefix was executed
+                    raw_outputs.append(
+                        (len(program.inputs), executor.output(enumerator.frame)))
+                    yield program
+            ps = execute_incrementally(ps)
+        if decorator is not None and not constraints and frontier is None:
+            # The number of programs is known only if there are no constraints
+            ps = SizedIterator(ps, count_programs(
+                functions_dsl, spec.min_program_length, spec.max_program_length).total())
+        for program, get_entry in simplified_programs(d(ps)):
+            add_program(program, get_entry,
+                        raw_outputs.popleft() if executor is not None else None)
+            if checkpoint is not None:
+                # The frontier does not contain the processed programs
+                checkpoint.step(enumerator.frontier)
+        if checkpoint is not None:
+            checkpoint.save(enumerator.frontier)
+            checkpoint.close()
+
+        def pop_entries():
+            # The entries are released as soon as they are pruned
+            while len(entries) != 0:
+                signature = next(iter(entries))
+                # Only this bucket is loaded from the disk
+                yield signature, entries.pop(signature), buckets.pop(signature)
 
-        dataset = []
         # Prune entries
         d = decorator.entry_decorator if decorator is not None else lambda x: x
         rng = equivalence_spec.rng if equivalence_spec.rng is not None else np.random
-        for signature, ientries in d(entries.items()):
+        for signature, ientries, store in d(SizedIterator(pop_entries(), len(entries))):
+            if len(ientries) == 0:
+                continue
             examples: List[List[Primitive]] = list()
             # Extract examples for checking equivalence
             num = max(
@@ -208,52 +647,59 @@ def generate_dataset(functions: List[generate_io_samples.Function], spec: Datase
             from_partial_entries = num % len(ientries)
 
             # Extract examples from all entries
-            not_used = dict()  # str -> [int]
-            for entry in ientries.values():
+            not_used = dict()  # int -> [int]
+            for i in ientries.values():
                 indexes = set(rng.choice(list(range(spec.num_examples)),
                                         from_all_entries, replace=False))
+                entry_examples = store.examples(i)
                 for index in indexes:
-                    examples.append(entry.examples[index].inputs)
-                not_used[entry.source_code] = [i for i in range(
-                    spec.num_examples) if not (i in indexes)]
+                    examples.append(entry_examples[index].inputs)
+                not_used[i] = [j for j in range(
+                    spec.num_examples) if not (j in indexes)]
             # Extract examples from partial entries
             if from_partial_entries != 0:
-                for entry in rng.choice(list(ientries.values()), from_partial_entries, replace=False):
-                    index = rng.choice(not_used[entry.source_code])
-                    examples.append(entry.examples[index].inputs)
+                for i in rng.choice(list(ientries.values()), from_partial_entries, replace=False):
+                    index = rng.choice(not_used[i])
+                    examples.append(store.examples(i)[index].inputs)
+
+            # Rebuild the programs to execute them
+            programs = [store.program(i) for i in ientries.values()]
 
             # Execute programs
-            es = dict()  # Tuple[Primitive] -> IntermidiateEntry
-            for entry in ientries.values():
-                result = []
-                for example in examples:
-                    output = entry.program.fun(example)
-                    if entry.program.out == int:
-                        result.append(output)
-                    else:
-                        result.append(tuple(output))
-                result = tuple(result)
-                if not result in es:
-                    es[result] = entry
-                else:
-                    # If there is a equivalent program, prune the longer program
-                    l1 = len(es[result].source_code.split("\n"))
-                    l2 = len(entry.source_code.split("\n"))
-                    if l1 > l2:
-                        es[result] = entry
+            keys = None
+            if executor is not None:
+                keys = [probe_keys.pop(key) if key in probe_keys else
+                        _probe_key(executor.execute(program))  # resumed from the checkpoint
+                        for key, program in zip(ientries.keys(), programs)]
+            indexes = list(ientries.values())
+            es = []
+            for c in _equivalence_classes(programs, examples,
+                                          signature.input_types, spec.value_range,
+                                          equivalence_spec.num_of_examples_in_first_phase, keys):
+                # If there are equivalent programs, prune the longer programs
+                # (the number of lines is same as the source code)
+                es.append(indexes[min(c, key=lambda i: len(programs[i].inputs) + len(programs[i].body))])
 
             # Create dataset instance
-            for entry in es.values():
-                dataset.append(Entry(
-                    entry.source_code, entry.examples, entry.attribute
-                ))
+            for i in es:
+                write(store.entry(i))
+        buckets.close()
     else:
         # Generate the fixed number of the dataset
+        # Signature -> dict(fingerprint -> Entry or None (if the entry is already written))
         entries = dict()
+        # The inputs used to check equivalence (the examples of the first entry of each signature)
+        probes = dict()  # Signature -> list of Value
+        outputs_to_key = dict()  # Signature -> dict(bytes -> (fingerprint, the number of lines))
         n_entries = 0
         d = decorator.program_decorator if decorator is not None else lambda x: x
-        for program in d(random_programs(functions_dsl, spec.min_program_length, spec.max_program_length)):
-            program = simplify_and_normalize(program)  # Simplify the program
+        if sampler is None:
+            sampler_or_programs = random_programs(functions_dsl, spec.min_program_length, spec.max_program_length,
+                                                  constraints=constraints)
+        else:
+            sampler_or_programs = sampler
+        results = simplified_programs(d(sampler_or_programs))
+        for program, get_entry in results:
             if not (spec.min_program_length <= len(program.body) <= spec.max_program_length):
                 # If the length of simplified program is out of range, discard the program
                 continue
@@ -262,51 +708,75 @@ def generate_dataset(functions: List[generate_io_samples.Function], spec: Datase
             if not signature in entries:
                 entries[signature] = dict()
 
-            if program.to_string() in invalid_program:
+            key = program.fingerprint()
+            if is_invalid(key):
                 # Generating the entry for this program was failed in the past
                 continue
+            if is_duplicate(signature, key):
+                # the program is already added to the dataset
+                continue
 
-            entry = generate_intermidiate_entry(program)
-            if entry is None:
-                invalid_program.add(program.to_string())
+            entry = get_entry()
+            if entry is _ALREADY_DISPATCHED:
+                # The program was processed before, so it is not invalid
                 continue
-            if entry.source_code in entries[signature]:
-                # the program is already added to the dataset
+            if entry is None:
+                add_invalid(key)
                 continue
 
             # Prune the program
             def prune_program():
-                for e in entries[signature].values():
-                    for example in entry.examples:
-                        output = e.program.fun(example.inputs)
-                        if example.output == output:
-                            # The `entry` and `e` are identical
-                            l1 = len(entry.source_code.split("\n"))
-                            l2 = len(e.source_code.split("\n"))
-                            if l1 < l2:
-                                return l2
-                            else:
-                                return "Ignore"
-                return "Add"
-            
-            pruned_result =  prune_program()
+                if not signature in probes:
+                    probes[signature] = inputs_to_batch(
+                        [example.inputs for example in entry.examples], signature.input_types)
+                    outputs_to_key[signature] = dict()
+                # The program is executed only once, and the equivalent program is found by the index
+                outputs = output_key(
+                    execute(entry.dsl_program, probes[signature], spec.value_range))
+                l1 = len(entry.source_code.split("\n"))
+                value = outputs_to_key[signature].get(outputs)
+                if value is None:
+                    outputs_to_key[signature][outputs] = (key, l1)
+                    return "Add"
+                # The `entry` and `entries[signature][k]` are identical
+                k, l2 = value
+                if l1 < l2:
+                    # Replace the existing entry with `entry`
+                    outputs_to_key[signature][outputs] = (key, l1)
+                    return k
+                else:
+                    return "Ignore"
+
+            pruned_result = prune_program()
+            if pruned_result == "Ignore":
+                continue
             if pruned_result == "Add":
                 n_entries += 1
-                entries[signature][entry.source_code] = entry
-            elif pruned_result != "Ignore":
-                del entries[signature][entry.source_code]
-                entries[signature][entry.source_code] = entry
-            
+            else:
+                # The replaced entry is longer than `entry`, so it is not written yet
+                del entries[signature][pruned_result]
+            if len(program.body) == spec.min_program_length:
+                # No shorter program can replace the entry, so it is written now
+                write(Entry(entry.source_code, entry.examples, entry.attribute))
+                entries[signature][key] = None
+            else:
+                # The compiled program is not kept
+                entries[signature][key] = Entry(entry.source_code, entry.examples, entry.attribute)
+
             if n_entries >= num_dataset:
                 break
+        # Stop the worker processes
+        results.close()
 
-        dataset = []
         # Create dataset instance
         for es in entries.values():
             for entry in es.values():
-                dataset.append(Entry(
-                    entry.source_code, entry.examples, entry.attribute
-                ))
+                if entry is not None:
+                    write(entry)
+
+    if max_shard_bytes is not None:
+        writer.close()
+        return
 
     # Create metadata
     dataset = ch.datasets.TupleDataset(dataset)
@@ -0,0 +1,157 @@
+import weakref
+import numpy as np
+from typing import List, Dict, Tuple, Union
+from .dsl import Type, Variable, Program
+from .interpreter import Value, IntListBatch, evaluate, execute
+from .program_generator import Frame
+
+
+class ProbeInputs:
+    """
+    The fixed set of inputs used to execute programs
+
+    The k-th input variable of type t (counted from the first input) always has the same values,
+    so the outputs of programs can be compared if their input types are same.
+
+    Attributes
+    ----------
+    num_examples : int
+        The number of examples
+    """
+
+    def __init__(self, num_examples: int, value_range: int, max_list_length: int,
+                 rng: Union[None, np.random.RandomState] = None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        num_examples : int
+        value_range : int
+            The elements of lists are in [-value_range, value_range - 1]
+        max_list_length : int
+            The lengths of lists are in [1, max_list_length], and
+            the integers are in [-max_list_length, max_list_length]
+            (the integers are mainly used as indexes and lengths).
+        rng : np.random.RandomState or None
+        """
+        self.num_examples = num_examples
+        self._value_range = value_range
+        self._max_list_length = max_list_length
+        self._rng = rng if rng is not None else np.random
+        self._values: Dict[Tuple[Type, int], Value] = dict()
+
+    def value(self, t: Type, index: int) -> Value:
+        """
+        Return the values of the index-th input of the type
+        """
+        key = (t, index)
+        if not key in self._values:
+            if t == Type.Int:
+                self._values[key] = self._rng.randint(-self._max_list_length,
+                                                      self._max_list_length + 1,
+                                                      size=self.num_examples).astype(np.int64)
+            else:
+                lengths = self._rng.randint(
+                    1, self._max_list_length + 1, size=self.num_examples).astype(np.int64)
+                values = self._rng.randint(-self._value_range, self._value_range,
+                                           size=(self.num_examples, self._max_list_length)).astype(np.int64)
+                values[np.arange(self._max_list_length)[None, :] >= lengths[:, None]] = 0
+                self._values[key] = IntListBatch(values, lengths)
+        return self._values[key]
+
+    def inputs(self, input_types: List[Type]) -> List[Value]:
+        """
+        Return the values of the inputs
+
+        Parameters
+        ----------
+        input_types : list of Type
+
+        Returns
+        -------
+        list of Value
+        """
+        counts = {Type.Int: 0, Type.IntList: 0}
+        retval = []
+        for t in input_types:
+            retval.append(self.value(t, counts[t]))
+            counts[t] += 1
+        return retval
+
+
+class IncrementalExecutor:
+    """
+    The executor of the enumerated programs that reuses the values of the prefixes
+
+    The values of the variables are cached in each Frame of the enumeration while the frame is alive,
+    so executing a program evaluates only its last statement if the parent frame was executed.
+    """
+
+    def __init__(self, probes: ProbeInputs, null: int):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        probes : ProbeInputs
+            The inputs of the programs
+        null : int
+            The value returned by HEAD, ACCESS and so on when the list is empty
+        """
+        self.probes = probes
+        self.null = null
+        # Frame -> (Variable -> Value, the number of the inputs of each type)
+        self._cache = weakref.WeakKeyDictionary()
+        self.num_evaluated_statements = 0
+
+    def _environment(self, frame: Frame) -> Tuple[Dict[Variable, Value], Dict[Type, int]]:
+        env = self._cache.get(frame)
+        if env is not None:
+            return env
+        if frame.parent is None:
+            env = (dict(), {Type.Int: 0, Type.IntList: 0})
+        else:
+            values, counts = self._environment(frame.parent)
+            values = dict(values)
+            counts = dict(counts)
+            for v in frame.new_inputs:
+                values[v] = self.probes.value(v.t, counts[v.t])
+                counts[v.t] += 1
+            expression = frame.statement.expression
+            values[frame.statement.variable] = evaluate(
+                expression.function.name, [values[arg] for arg in expression.arguments], self.null)
+            self.num_evaluated_statements += 1
+            env = (values, counts)
+        self._cache[frame] = env
+        return env
+
+    def output(self, frame: Frame) -> Value:
+        """
+        Return the output of the program of the frame
+
+        Parameters
+        ----------
+        frame : Frame
+
+        Returns
+        -------
+        Value
+        """
+        values, _ = self._environment(frame)
+        return values[frame.statement.variable]
+
+    def execute(self, program: Program) -> Value:
+        """
+        Execute the program that is not enumerated (e.g., the simplified program) from scratch
+
+        Parameters
+        ----------
+        program : Program
+
+        Returns
+        -------
+        Value
+        """
+        self.num_evaluated_statements += len(program.body)
+        return execute(program, self.probes.inputs([v.t for v in program.inputs]), self.null)
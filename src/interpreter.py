@@ -0,0 +1,429 @@
+import dataclasses
+import numpy as np
+from typing import List, Union, Dict, Callable
+from .dsl import Type, Program, Variable
+from .dataset import Primitive
+
+
+@dataclasses.dataclass
+class IntListBatch:
+    """
+    The batch of integer lists
+
+    Attributes
+    ----------
+    values : np.array
+        The padded values. The shape is (N, W) where
+            N is the number of examples and
+            W is the width of the padded lists (W >= 1).
+        The padding elements are always 0.
+    lengths : np.array
+        The lengths of the lists. The shape is (N,).
+    """
+    values: np.array
+    lengths: np.array
+
+
+"""
+The batch of values. Int values are represented as np.array with the shape of (N,).
+"""
+Value = Union[np.array, IntListBatch]
+
+"""
+The value of the examples whose values overflow (see evaluate).
+The overflowed int is OVERFLOW, and the overflowed list is [OVERFLOW].
+"""
+OVERFLOW = int(np.iinfo(np.int64).min)
+
+# The values whose absolute values exceed this limit are regarded as overflowed.
+# The product of two values within the limit fits in 64-bit integers.
+_LIMIT = 2 ** 31
+
+
+def _mask(lengths: np.array, width: int) -> np.array:
+    return np.arange(width)[None, :] < lengths[:, None]
+
+
+def _list(values: np.array, lengths: np.array) -> IntListBatch:
+    # Clear the padding elements
+    return IntListBatch(np.where(_mask(lengths, values.shape[1]), values, 0), lengths)
+
+
+def _trunc_div(x: np.array, n: int) -> np.array:
+    # int(float(x) / n) in Python
+    return np.sign(x) * (np.abs(x) // n)
+
+
+_LAMBDAS: Dict[str, Callable[..., np.array]] = {
+    "IDT": lambda x: x,
+    "INC": lambda x: x + 1,
+    "DEC": lambda x: x - 1,
+    "SHL": lambda x: x * 2,
+    "SHR": lambda x: _trunc_div(x, 2),
+    "doNEG": lambda x: -x,
+    "MUL3": lambda x: x * 3,
+    "DIV3": lambda x: _trunc_div(x, 3),
+    "MUL4": lambda x: x * 4,
+    "DIV4": lambda x: _trunc_div(x, 4),
+    "SQR": lambda x: x * x,
+    "isPOS": lambda x: x > 0,
+    "isNEG": lambda x: x < 0,
+    "isODD": lambda x: x % 2 == 1,
+    "isEVEN": lambda x: x % 2 == 0,
+    "+": lambda x, y: x + y,
+    "-": lambda x, y: x - y,
+    "*": lambda x, y: x * y,
+    "MIN": np.minimum,
+    "MAX": np.maximum,
+}
+
+
+def _reverse(xs: IntListBatch, null: int) -> IntListBatch:
+    width = xs.values.shape[1]
+    index = xs.lengths[:, None] - 1 - np.arange(width)[None, :]
+    values = np.take_along_axis(xs.values, np.clip(index, 0, width - 1), 1)
+    return _list(values, xs.lengths)
+
+
+def _sort(xs: IntListBatch, null: int) -> IntListBatch:
+    mask = _mask(xs.lengths, xs.values.shape[1])
+    values = np.sort(
+        np.where(mask, xs.values, np.iinfo(np.int64).max), axis=1)
+    return _list(values, xs.lengths)
+
+
+def _take(n: np.array, xs: IntListBatch, null: int) -> IntListBatch:
+    # xs[:n] in Python
+    lengths = np.where(n >= 0, np.minimum(n, xs.lengths),
+                       np.maximum(xs.lengths + n, 0))
+    return _list(xs.values, lengths)
+
+
+def _drop(n: np.array, xs: IntListBatch, null: int) -> IntListBatch:
+    # xs[n:] in Python
+    width = xs.values.shape[1]
+    start = np.where(n >= 0, np.minimum(n, xs.lengths),
+                     np.maximum(xs.lengths + n, 0))
+    index = start[:, None] + np.arange(width)[None, :]
+    values = np.take_along_axis(xs.values, np.clip(index, 0, width - 1), 1)
+    return _list(values, xs.lengths - start)
+
+
+def _access(n: np.array, xs: IntListBatch, null: int) -> np.array:
+    width = xs.values.shape[1]
+    value = np.take_along_axis(
+        xs.values, np.clip(n, 0, width - 1)[:, None], 1)[:, 0]
+    return np.where((n >= 0) & (n < xs.lengths), value, null)
+
+
+def _head(xs: IntListBatch, null: int) -> np.array:
+    return np.where(xs.lengths > 0, xs.values[:, 0], null)
+
+
+def _last(xs: IntListBatch, null: int) -> np.array:
+    index = np.maximum(xs.lengths - 1, 0)[:, None]
+    value = np.take_along_axis(xs.values, index, 1)[:, 0]
+    return np.where(xs.lengths > 0, value, null)
+
+
+def _minimum(xs: IntListBatch, null: int) -> np.array:
+    mask = _mask(xs.lengths, xs.values.shape[1])
+    value = np.where(mask, xs.values, np.iinfo(np.int64).max).min(axis=1)
+    return np.where(xs.lengths > 0, value, null)
+
+
+def _maximum(xs: IntListBatch, null: int) -> np.array:
+    mask = _mask(xs.lengths, xs.values.shape[1])
+    value = np.where(mask, xs.values, np.iinfo(np.int64).min).max(axis=1)
+    return np.where(xs.lengths > 0, value, null)
+
+
+def _sum(xs: IntListBatch, null: int) -> np.array:
+    return xs.values.sum(axis=1)
+
+
+def _map(f):
+    def run(xs: IntListBatch, null: int) -> IntListBatch:
+        return _list(f(xs.values), xs.lengths)
+    return run
+
+
+def _filter(p):
+    def run(xs: IntListBatch, null: int) -> IntListBatch:
+        keep = _mask(xs.lengths, xs.values.shape[1]) & p(xs.values)
+        # Move the kept elements to the front without changing their order
+        order = np.argsort(~keep, axis=1, kind="stable")
+        values = np.take_along_axis(xs.values, order, 1)
+        return _list(values, keep.sum(axis=1))
+    return run
+
+
+def _count(p):
+    def run(xs: IntListBatch, null: int) -> np.array:
+        return (_mask(xs.lengths, xs.values.shape[1]) & p(xs.values)).sum(axis=1)
+    return run
+
+
+def _zipwith(op):
+    def run(xs: IntListBatch, ys: IntListBatch, null: int) -> IntListBatch:
+        width = min(xs.values.shape[1], ys.values.shape[1])
+        values = op(xs.values[:, :width], ys.values[:, :width])
+        return _list(values, np.minimum(xs.lengths, ys.lengths))
+    return run
+
+
+def _scanl1(op):
+    def run(xs: IntListBatch, null: int) -> IntListBatch:
+        values = xs.values.copy()
+        for i in range(1, values.shape[1]):
+            # The accumulated value is saturated so that the next step does not wrap around.
+            # The saturated values exceed _LIMIT, so the example is regarded as overflowed.
+            values[:, i] = np.clip(op(values[:, i - 1], values[:, i]),
+                                   -_LIMIT - 1, _LIMIT + 1)
+        return _list(values, xs.lengths)
+    return run
+
+
+_FUNCTIONS: Dict[str, Callable[..., Value]] = {
+    "REVERSE": _reverse,
+    "SORT": _sort,
+    "TAKE": _take,
+    "DROP": _drop,
+    "ACCESS": _access,
+    "HEAD": _head,
+    "LAST": _last,
+    "MINIMUM": _minimum,
+    "MAXIMUM": _maximum,
+    "SUM": _sum,
+}
+
+_HIGHER_ORDER_FUNCTIONS = {
+    "MAP": _map,
+    "FILTER": _filter,
+    "COUNT": _count,
+    "ZIPWITH": _zipwith,
+    "SCANL1": _scanl1,
+}
+
+
+def implementation(name: str) -> Callable[..., Value]:
+    """
+    Return the vectorized implementation of the function
+
+    Parameters
+    ----------
+    name : str
+        The name of the function (e.g., "HEAD", "MAP INC")
+
+    Returns
+    -------
+    function
+        The function that receives the argument values and the Null value,
+        and returns the result value.
+    """
+    if name not in _FUNCTIONS:
+        symbols = name.split(" ")
+        if len(symbols) != 2 or symbols[0] not in _HIGHER_ORDER_FUNCTIONS or symbols[1] not in _LAMBDAS:
+            raise RuntimeError("Unknown function: {}".format(name))
+        _FUNCTIONS[name] = _HIGHER_ORDER_FUNCTIONS[symbols[0]](
+            _LAMBDAS[symbols[1]])
+    return _FUNCTIONS[name]
+
+
+def _overflowed_rows(value: Value) -> np.array:
+    if isinstance(value, IntListBatch):
+        mask = _mask(value.lengths, value.values.shape[1])
+        return np.any(mask & ((value.values > _LIMIT) | (value.values < -_LIMIT)), axis=1)
+    return (value > _LIMIT) | (value < -_LIMIT)
+
+
+def evaluate(name: str, arguments: List[Value], null: int) -> Value:
+    """
+    Apply the function to the arguments with the overflow detection
+
+    The examples whose arguments or result exceed 2^31 in absolute value are regarded as overflowed,
+    and their results are replaced with OVERFLOW (or [OVERFLOW]). The arguments of the other examples
+    are within 2^31, so the results are same as the ones computed with Python integers.
+    OVERFLOW propagates to the subsequent statements because it also exceeds the limit.
+
+    Parameters
+    ----------
+    name : str
+        The name of the function
+    arguments : list of Value
+    null : int
+
+    Returns
+    -------
+    Value
+    """
+    result = implementation(name)(*arguments, null)
+    overflow = _overflowed_rows(result)
+    for argument in arguments:
+        overflow |= _overflowed_rows(argument)
+    if not np.any(overflow):
+        return result
+    if isinstance(result, IntListBatch):
+        values = np.where(overflow[:, None], 0, result.values)
+        values[overflow, 0] = OVERFLOW
+        return IntListBatch(values, np.where(overflow, 1, result.lengths))
+    return np.where(overflow, OVERFLOW, result)
+
+
+def to_batch(primitives: List[Primitive], t: Type) -> Value:
+    """
+    Convert the list of primitives into the batch
+
+    Parameters
+    ----------
+    primitives : list of Primitive
+        The values of one variable (one value per example)
+    t : Type
+        The type of the values
+
+    Returns
+    -------
+    Value
+    """
+    if t == Type.Int:
+        return np.array(primitives, dtype=np.int64)
+    lengths = np.array([len(p) for p in primitives], dtype=np.int64)
+    values = np.zeros((len(primitives), max(1, lengths.max(initial=0))),
+                      dtype=np.int64)
+    for i, p in enumerate(primitives):
+        values[i, :len(p)] = p
+    return IntListBatch(values, lengths)
+
+
+def from_batch(value: Value) -> List[Primitive]:
+    """
+    Convert the batch into the list of primitives
+
+    Parameters
+    ----------
+    value : Value
+
+    Returns
+    -------
+    list of Primitive
+    """
+    if isinstance(value, IntListBatch):
+        return [list(map(int, values[:length])) for values, length in zip(value.values, value.lengths)]
+    return list(map(int, value))
+
+
+def inputs_to_batch(inputs: List[List[Primitive]], input_types: List[Type]) -> List[Value]:
+    """
+    Convert the inputs of examples into the batches
+
+    Parameters
+    ----------
+    inputs : list of list of Primitive
+        The inputs of each example
+    input_types : list of Type
+        The types of the inputs
+
+    Returns
+    -------
+    list of Value
+        The batch of each input variable
+    """
+    return [to_batch([x[i] for x in inputs], t) for i, t in enumerate(input_types)]
+
+
+def execute_statements(program: Program, inputs: List[Value], null: int) -> Dict[Variable, Value]:
+    """
+    Execute the program and return the values of all variables
+
+    Parameters
+    ----------
+    program : Program
+        The program to execute
+    inputs : list of Value
+        The batch of each input variable
+    null : int
+        The value returned by HEAD, ACCESS and so on when the list is empty
+        (generate_io_samples uses value_range as Null)
+
+    Returns
+    -------
+    dict from Variable to Value
+    """
+    values = dict(zip(program.inputs, inputs))
+    for statement in program.body:
+        args = [values[arg] for arg in statement.expression.arguments]
+        values[statement.variable] = evaluate(
+            statement.expression.function.name, args, null)
+    return values
+
+
+def execute(program: Program, inputs: List[Value], null: int) -> Value:
+    """
+    Execute the program for all examples at once
+
+    Parameters
+    ----------
+    program : Program
+        The program to execute
+    inputs : list of Value
+        The batch of each input variable
+    null : int
+        The value returned by HEAD, ACCESS and so on when the list is empty
+
+    Returns
+    -------
+    Value
+        The output of the program
+
+    Notes
+    -----
+    Values are computed with 64-bit integers. The programs may be executed with the inputs
+    of other programs (e.g., when checking equivalence), so the intermediate values can exceed
+    64-bit integers. The outputs of such examples are OVERFLOW (see evaluate)
+    instead of the results of Python integers.
+    """
+    return execute_statements(program, inputs, null)[program.body[-1].variable]
+
+
+def output_key(value: Value) -> bytes:
+    """
+    Return the hashable representation of the value
+
+    Two batches have the same key if and only if all elements are same.
+
+    Parameters
+    ----------
+    value : Value
+
+    Returns
+    -------
+    bytes
+    """
+    if isinstance(value, IntListBatch):
+        width = max(1, value.lengths.max(initial=0))
+        return value.lengths.astype(np.int64).tobytes() + \
+            np.ascontiguousarray(
+                value.values[:, :width], dtype=np.int64).tobytes()
+    return np.ascontiguousarray(value, dtype=np.int64).tobytes()
+
+
+def equal_rows(lhs: Value, rhs: Value) -> np.array:
+    """
+    Compare two batches example by example
+
+    Parameters
+    ----------
+    lhs : Value
+    rhs : Value
+
+    Returns
+    -------
+    np.array
+        The boolean array with the shape of (N,)
+    """
+    if isinstance(lhs, IntListBatch):
+        # The padding elements are 0, so it is enough to compare the common width
+        width = min(lhs.values.shape[1], rhs.values.shape[1])
+        return (lhs.lengths == rhs.lengths) & \
+            np.all(lhs.values[:, :width] == rhs.values[:, :width], axis=1)
+    return lhs == rhs
@@ -0,0 +1,149 @@
+import math
+import sys
+from typing import Set
+
+
+class ExactSet:
+    """
+    The set of program fingerprints
+
+    Attributes
+    ----------
+    hits : int
+        The number of lookups that find the key
+    lookups : int
+        The number of lookups
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.lookups = 0
+        self._items: Set[int] = set()
+
+    def add(self, key: int):
+        """
+        Add the key
+
+        Parameters
+        ----------
+        key : int
+            The fingerprint of the program
+        """
+        self._items.add(key)
+
+    def __contains__(self, key: int) -> bool:
+        self.lookups += 1
+        if key in self._items:
+            self.hits += 1
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups != 0 else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Return the (approximate) memory usage in bytes
+        """
+        return sys.getsizeof(self._items) + sum([sys.getsizeof(key) for key in self._items])
+
+
+class BloomFilter:
+    """
+    The memory-bounded set of program fingerprints
+
+    The filter never misses the added keys, but it may report that a key that was not added
+    is contained with the probability of about `false_positive_rate`
+    if the number of the added keys is less than `capacity`.
+
+    Attributes
+    ----------
+    capacity : int
+        The expected number of the keys
+    false_positive_rate : float
+        The expected false positive rate
+    num_bits : int
+    num_hashes : int
+    hits : int
+        The number of lookups that find the key (including false positives)
+    lookups : int
+        The number of lookups
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.01):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        capacity : int
+        false_positive_rate : float
+        """
+        if capacity <= 0:
+            raise RuntimeError("capacity should be positive: {}".format(capacity))
+        if not (0.0 < false_positive_rate < 1.0):
+            raise RuntimeError(
+                "false_positive_rate should be in (0, 1): {}".format(false_positive_rate))
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.hits = 0
+        self.lookups = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._size = 0
+
+    def _indexes(self, key: int):
+        # The fingerprint is already a 128-bit hash, so its halves are used for the double hashing
+        h1 = key & 0xFFFFFFFFFFFFFFFF
+        h2 = ((key >> 64) & 0xFFFFFFFFFFFFFFFF) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: int):
+        """
+        Add the key
+
+        Parameters
+        ----------
+        key : int
+            The fingerprint of the program
+        """
+        added = False
+        for index in self._indexes(key):
+            mask = 1 << (index & 7)
+            if not (self._bits[index >> 3] & mask):
+                self._bits[index >> 3] |= mask
+                added = True
+        if added:
+            self._size += 1
+
+    def __contains__(self, key: int) -> bool:
+        self.lookups += 1
+        for index in self._indexes(key):
+            if not (self._bits[index >> 3] & (1 << (index & 7))):
+                return False
+        self.hits += 1
+        return True
+
+    def __len__(self) -> int:
+        """
+        Return the number of the added keys (the keys that look like duplicates are not counted)
+        """
+        return self._size
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups != 0 else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Return the memory usage of the bit array in bytes
+        """
+        return len(self._bits)
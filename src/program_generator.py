@@ -1,8 +1,13 @@
 import dataclasses
-import numpy as np
-from typing import List, Set, Union
+import collections
 import copy
+import functools
+import multiprocessing
+import os
+import numpy as np
+from typing import List, Set, Dict, Union, Callable, Any, Tuple
 from .dsl import Function, Type, Variable, Expression, Program, Statement
+from .compact_program import FunctionTable, CompactProgram
 
 
 class IdGenerator:
@@ -15,8 +20,8 @@ class IdGenerator:
         The next id
     """
 
-    def __init__(self):
-        self._n = 0
+    def __init__(self, n: int = 0):
+        self._n = n
 
     def generate(self):
         """
@@ -31,6 +36,17 @@ class IdGenerator:
         self._n += 1
         return id
 
+    def clone(self):
+        """
+        Return the copy of the generator
+
+        Returns
+        -------
+        IdGenerator
+            The generator that returns the same ids as this generator
+        """
+        return IdGenerator(self._n)
+
 
 @dataclasses.dataclass
 class ArgumentWithState:
@@ -40,6 +56,91 @@ class ArgumentWithState:
     new_variables: List[Variable]
 
 
+@functools.lru_cache(maxsize=None)
+def argument_patterns(num_int: int, num_int_list: int, signature: Tuple[Type, ...]) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Return all argument patterns that match the signature
+
+    The patterns depend only on the numbers of the existing variables,
+    so the results are cached.
+
+    Parameters
+    ----------
+    num_int : int
+        The number of the existing Int variables
+    num_int_list : int
+        The number of the existing IntList variables
+    signature : tuple of Type
+        The signature of the arguments
+
+    Returns
+    -------
+    tuple of tuple of int
+        The patterns. Each element of a pattern represents one argument.
+        Let n be the number of the existing variables of the argument type.
+        The value i < n means the i-th existing variable (sorted by id), and
+        the value i >= n means the (i - n)-th new variable of the type.
+    """
+    num_existing = {Type.Int: num_int, Type.IntList: num_int_list}
+    patterns = []
+
+    # Perform DFS to enumerate arguments
+    # Start from an empty list
+    s = [((), {Type.Int: 0, Type.IntList: 0})]
+    while len(s) != 0:
+        pattern, num_new = s.pop()
+
+        if len(pattern) == len(signature):
+            patterns.append(pattern)
+            continue
+
+        t_arg = signature[len(pattern)]  # The type of the argument
+        n = num_existing[t_arg] + num_new[t_arg]
+        # Create new var
+        num_new_var = dict(num_new)
+        num_new_var[t_arg] += 1
+        s.append(((*pattern, n), num_new_var))
+        # Use existing var (including the new vars created by the preceding arguments)
+        for i in reversed(range(n)):
+            s.append(((*pattern, i), num_new))
+
+    return tuple(patterns)
+
+
+def _typed_variables(variables: Set[Variable]):
+    typed_variables = {Type.Int: [], Type.IntList: []}
+    for v in variables:
+        typed_variables[v.t].append(v)
+    for vs in typed_variables.values():
+        vs.sort(key=lambda v: v.id)
+    return typed_variables
+
+
+def _arguments_from_pattern(pattern: Tuple[int, ...], id_generator: IdGenerator, variables: Set[Variable],
+                            typed_variables, signature) -> ArgumentWithState:
+    generator = id_generator
+    args = []
+    new_variables = []
+    new_typed_variables = {Type.Int: [], Type.IntList: []}
+    for index, t_arg in zip(pattern, signature):
+        existing = typed_variables[t_arg]
+        if index < len(existing):
+            args.append(existing[index])
+        elif index - len(existing) < len(new_typed_variables[t_arg]):
+            args.append(new_typed_variables[t_arg][index - len(existing)])
+        else:
+            # Create new var
+            if generator is id_generator:
+                generator = id_generator.clone()
+            v_new = Variable(generator.generate(), t_arg)
+            new_typed_variables[t_arg].append(v_new)
+            new_variables.append(v_new)
+            args.append(v_new)
+    if len(new_variables) != 0:
+        variables = set([*variables, *new_variables])
+    return ArgumentWithState(args, generator, variables, new_variables)
+
+
 def arguments(id_generator: IdGenerator, variables: Set[Variable], signature):
     """
     Enumerate all arguments that match the signature
@@ -58,34 +159,257 @@ def arguments(id_generator: IdGenerator, variables: Set[Variable], signature):
     ArgumentWithState
         The argument list and the state that will be used to continue enumeration
     """
+    typed_variables = _typed_variables(variables)
+    for pattern in argument_patterns(len(typed_variables[Type.Int]), len(typed_variables[Type.IntList]),
+                                     tuple(signature)):
+        yield _arguments_from_pattern(pattern, id_generator, variables, typed_variables, signature)
 
-    # Perform DFS to enumerate arguments
-    # Start from an empty list
-    s = list([ArgumentWithState([], id_generator, variables, set())])
-    while len(s) != 0:
-        elem = s.pop()
 
-        if len(elem.arguments) == len(signature):
-            yield elem
-        else:
-            t_arg = signature[len(elem.arguments)]  # The type of the argument
-            # Existing variables which type is t_arg
-            candidates = [v for v in elem.variables if v.t == t_arg]
-
-            for v in candidates:
-                # Use existing var
-                s.append(ArgumentWithState(
-                    [*(elem.arguments), v], elem.generator, elem.variables, elem.new_variables))
-            # Create new var
-            generator_new = copy.deepcopy(elem.generator)
-            v_new = Variable(generator_new.generate(), t_arg)
-            arg_new = [*(elem.arguments), v_new]
-            vars_new = set([*(elem.variables), v_new])
-            s.append(ArgumentWithState(arg_new, generator_new,
-                                       vars_new, [*(elem.new_variables), v_new]))
+def random_arguments(id_generator: IdGenerator, variables: Set[Variable], signature,
+                     rng: Union[None, np.random.RandomState] = None) -> ArgumentWithState:
+    """
+    Return the arguments that are uniformly sampled from the results of `arguments`
+
+    Parameters
+    ----------
+    id_generator : IdGenerator
+        The generator used to create new variables
+    variables : set of Variable
+        The set of variables that are currently defined
+    signature : list of Type
+        The signature of the arguments.
+    rng : None or np.random.RandomState
+        The random number generator
+
+    Returns
+    -------
+    ArgumentWithState
+        The argument list and the state that will be used to continue enumeration
+    """
+    if rng is None:
+        rng = np.random
+    typed_variables = _typed_variables(variables)
+    patterns = argument_patterns(len(typed_variables[Type.Int]), len(typed_variables[Type.IntList]),
+                                 tuple(signature))
+    pattern = patterns[rng.randint(len(patterns))]
+    return _arguments_from_pattern(pattern, id_generator, variables, typed_variables, signature)
+
+
+class Frame:
+    """
+    The node of the DFS used to enumerate programs
+
+    A frame shares the preceding statements with its parent frame,
+    and holds only the statement appended to the parent.
+
+    Attributes
+    ----------
+    parent : Frame or None
+        The parent frame. It is None if this frame represents the empty program.
+    new_inputs : list of Variable
+        The input variables created by the statement
+    statement : Statement or None
+        The appended statement
+    generator : IdGenerator
+        The generator used to create the variables of the children
+    length : int
+        The number of statements
+    """
+    __slots__ = ("parent", "new_inputs", "statement", "generator", "length", "__weakref__")
+
+    def __init__(self, parent, new_inputs: List[Variable], statement: Union[None, Statement],
+                 generator: IdGenerator):
+        self.parent = parent
+        self.new_inputs = new_inputs
+        self.statement = statement
+        self.generator = generator
+        self.length = 0 if parent is None else parent.length + 1
+
+    def frames(self):
+        """
+        Return the frames from the root to this frame
+
+        Returns
+        -------
+        list of Frame
+        """
+        frames = []
+        frame = self
+        while frame.parent is not None:
+            frames.append(frame)
+            frame = frame.parent
+        frames.reverse()
+        return frames
+
+    def variables(self) -> List[Variable]:
+        """
+        Return the variables defined in the program
+
+        Returns
+        -------
+        list of Variable
+        """
+        vars = []
+        for frame in self.frames():
+            vars.extend(frame.new_inputs)
+            vars.append(frame.statement.variable)
+        return vars
+
+    def program(self) -> Program:
+        """
+        Build the program represented by this frame
+
+        Returns
+        -------
+        Program
+            The program. It does not share any objects with the frames.
+        """
+        inputs = []
+        body = []
+        for frame in self.frames():
+            inputs.extend(frame.new_inputs)
+            body.append(frame.statement)
+        return Program(inputs, body).clone()
+
+
+class Constraint:
+    """
+    The base class of the constraints that prune the enumeration
+
+    Attributes
+    ----------
+    skipped : int
+        The number of the programs skipped by this constraint. When a prefix is rejected
+        during enumeration, all programs that start with the prefix are counted
+        (the ones rejected by the other constraints are also included).
+    """
+
+    def __init__(self):
+        self.skipped = 0
+
+    def accept_prefix(self, frame: Frame) -> bool:
+        """
+        Return whether the enumeration should visit the frame
+
+        If this method returns False, the frame and all its descendants are skipped.
+        """
+        return True
+
+    def accept_program(self, frame: Frame) -> bool:
+        """
+        Return whether the program of the frame should be yielded
+
+        If this method returns False, only the program of the frame is skipped.
+        """
+        return True
+
+    def merge(self, other: "Constraint"):
+        """
+        Merge the statistics of the constraint used in another process
+        """
+        self.skipped += other.skipped
+
+
+class SymmetryBreaking(Constraint):
+    """
+    The constraint that skips programs that are equivalent to other enumerated programs
+
+    This constraint applies the following orderings:
+    1) the input variables are created in order of first use
+       (`arguments` always satisfies it)
+    2) the arguments of commutative functions (e.g., ZIPWITH +) are sorted by ids
+    3) two adjacent independent statements are sorted by the index of the functions.
+       The statements are independent if the latter does not use the variables defined by
+       the former (the result and the new inputs), and at most one of them creates input variables
+       (otherwise swapping them changes the order of inputs).
+       The last statement is never reordered because it is the output of the program.
+
+    Each program skipped by this constraint is equivalent to an enumerated program
+    that has the same signature and length.
+    """
+
+    COMMUTATIVE_FUNCTIONS = set(
+        ["ZIPWITH +", "ZIPWITH *", "ZIPWITH MIN", "ZIPWITH MAX"])
+
+    def __init__(self, functions: List[Function]):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        functions : list of Function
+            The functions used in the enumeration. The order of statements is
+            defined by the index of this list.
+        """
+        super(SymmetryBreaking, self).__init__()
+        self._index = dict([(f, i) for i, f in enumerate(functions)])
+
+    def accept_prefix(self, frame: Frame) -> bool:
+        expression = frame.statement.expression
+        if expression.function.name in SymmetryBreaking.COMMUTATIVE_FUNCTIONS:
+            if expression.arguments[0].id > expression.arguments[1].id:
+                return False
+
+        # frame.parent is not the last statement anymore, so it can be reordered
+        if frame.length < 3:
+            return True
+        former = frame.parent.parent
+        latter = frame.parent
+        if len(former.new_inputs) != 0 and len(latter.new_inputs) != 0:
+            return True
+        defined = set([former.statement.variable, *former.new_inputs])
+        if any([arg in defined for arg in latter.statement.expression.arguments]):
+            return True
+        return self._index[former.statement.expression.function] <= self._index[latter.statement.expression.function]
+
+
+class NoDeadCode(Constraint):
+    """
+    The constraint that accepts only the programs without dead code
+
+    Every statement of the accepted programs is used to compute the output
+    (the last statement). The prefixes that cannot be completed into such programs
+    within max_length statements are skipped.
+    """
 
+    def __init__(self, functions: List[Function], max_length: int):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        functions : list of Function
+            The functions used in the enumeration
+        max_length : int
+            The maximum length of programs
+        """
+        super(NoDeadCode, self).__init__()
+        self._max_length = max_length
+        self._max_arity = max(
+            [len(f.signature.input_types) for f in functions], default=0)
+
+    @staticmethod
+    def num_unused_statements(frame: Frame) -> int:
+        """
+        Return the number of statements whose results are not used
+        (including the last statement)
+        """
+        used = set()
+        for f in frame.frames():
+            used.update(f.statement.expression.arguments)
+        return len([f for f in frame.frames() if not f.statement.variable in used])
+
+    def accept_prefix(self, frame: Frame) -> bool:
+        # Each statement defines 1 variable and uses at most max_arity unused variables
+        n_rest = self._max_length - frame.length
+        return NoDeadCode.num_unused_statements(frame) - n_rest * (self._max_arity - 1) <= 1
+
+    def accept_program(self, frame: Frame) -> bool:
+        return NoDeadCode.num_unused_statements(frame) <= 1
 
-def programs(functions: List[Function], min_length: int, max_length: int):
+
+def programs(functions: List[Function], min_length: int, max_length: int,
+             constraints: Union[None, List[Constraint]] = None):
     """
     Enumerate all programs which length is in [min_length:max_length]
 
@@ -97,42 +421,532 @@ def programs(functions: List[Function], min_length: int, max_length: int):
         The minimum length of programs
     max_length : int
         The maximum length of programs
+    constraints : list of Constraint or None
+        The constraints used to prune the enumeration
+
+    Yields
+    ------
+    Program
+        The program which length is in [min_length:max_length]
+    """
+    assert(min_length <= max_length)
+
+    # Start from a program with no expressions
+    return iter(ProgramEnumerator(functions, min_length, max_length, constraints))
+
+
+@functools.lru_cache(maxsize=None)
+def _num_descendants(functions: Tuple[Function, ...], num_int: int, num_int_list: int,
+                     length: int, min_length: int, max_length: int) -> int:
+    # The number of the programs whose lengths are in [min_length, max_length] and
+    # that have the prefix of `length` statements (excluding the prefix itself).
+    # It depends only on the numbers of the variables.
+    if length >= max_length:
+        return 0
+    n = 0
+    for f in functions:
+        signature = tuple(f.signature.input_types)
+        for pattern in argument_patterns(num_int, num_int_list, signature):
+            num_vars = {Type.Int: num_int, Type.IntList: num_int_list}
+            for index, t in zip(pattern, signature):
+                # The new variables are numbered from the number of the existing variables
+                num_vars[t] = max(num_vars[t], index + 1)
+            num_vars[f.signature.output_type] += 1
+            n += (1 if min_length <= length + 1 <= max_length else 0) + \
+                _num_descendants(functions, num_vars[Type.Int], num_vars[Type.IntList],
+                                 length + 1, min_length, max_length)
+    return n
+
+
+def _num_programs_with_prefix(functions: List[Function], frame: Frame,
+                              min_length: int, max_length: int) -> int:
+    variables = frame.variables()
+    num_int = len([v for v in variables if v.t == Type.Int])
+    return (1 if min_length <= frame.length <= max_length else 0) + \
+        _num_descendants(tuple(functions), num_int, len(variables) - num_int,
+                         frame.length, min_length, max_length)
+
+
+def _accept(constraints: List[Constraint], frame: Frame, prefix: bool,
+            num_skipped: Union[None, Callable[[], int]] = None) -> bool:
+    # num_skipped returns the number of the programs skipped by rejecting the prefix
+    for constraint in constraints:
+        if not (constraint.accept_prefix(frame) if prefix else constraint.accept_program(frame)):
+            constraint.skipped += num_skipped() if num_skipped is not None else 1
+            return False
+    return True
+
+
+def _children(functions: List[Function], frame: Frame, constraints: List[Constraint],
+              min_length: int, max_length: int) -> List[Frame]:
+    children = []
+
+    # Create a set of variables
+    vars = set(frame.variables())
+
+    # Enumerate functions
+    for func in functions:
+        # Enumerate arguments
+        for a in arguments(frame.generator, vars, func.signature.input_types):
+            generator = a.generator.clone()
+            statement = Statement(Variable(generator.generate(), func.signature.output_type),
+                                  Expression(func, a.arguments))
+            child = Frame(frame, a.new_variables, statement, generator)
+            if _accept(constraints, child, True,
+                       lambda: _num_programs_with_prefix(functions, child, min_length, max_length)):
+                children.append(child)
+    return children
+
+
+def _frames_from(functions: List[Function], stack: List[Frame], min_length: int, max_length: int,
+                 constraints: List[Constraint]):
+    # Perform DFS to enumerate source code.
+    # The children are pushed before yielding the frame, so `stack` always
+    # holds the remaining part of the enumeration when the caller gets a frame.
+    while len(stack) != 0:
+        frame = stack.pop()
+
+        if frame.length < max_length:
+            stack.extend(_children(functions, frame, constraints, min_length, max_length))
+        if min_length <= frame.length <= max_length and _accept(constraints, frame, False):
+            yield frame
+
+
+def _programs_from(functions: List[Function], stack: List[Frame], min_length: int, max_length: int,
+                   constraints: List[Constraint]):
+    for frame in _frames_from(functions, stack, min_length, max_length, constraints):
+        yield frame.program()
+
+
+class ProgramEnumerator:
+    """
+    The resumable enumeration of programs
+
+    It enumerates the same programs as `programs`, and the remaining part of the
+    enumeration can be saved (e.g., by pickle) and resumed later.
+
+    Attributes
+    ----------
+    frontier : list of Frame
+        The DFS stack. The programs that are not yielded yet are the descendants of
+        these frames (including themselves).
+    frame : Frame or None
+        The frame of the last yielded program. The frames of a program and its prefixes
+        are shared, so it can be used to cache the values of the prefixes
+        (e.g., IncrementalExecutor).
+    """
+
+    def __init__(self, functions: List[Function], min_length: int, max_length: int,
+                 constraints: Union[None, List[Constraint]] = None,
+                 frontier: Union[None, List[Frame]] = None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        functions : list of Function
+            All functions that can be used in source code
+        min_length : int
+            The minimum length of programs
+        max_length : int
+            The maximum length of programs
+        constraints : list of Constraint or None
+            The constraints used to prune the enumeration
+        frontier : list of Frame or None
+            The frontier saved from the other enumerator with the same arguments.
+            If it is None, the enumeration starts from the beginning.
+        """
+        assert(min_length <= max_length)
+        self.functions = functions
+        self.min_length = min_length
+        self.max_length = max_length
+        self.constraints = constraints or []
+        self.frontier = frontier if frontier is not None else [
+            Frame(None, [], None, IdGenerator())]
+        self.frame = None
+
+    def __iter__(self):
+        for frame in _frames_from(self.functions, self.frontier, self.min_length, self.max_length,
+                                  self.constraints):
+            self.frame = frame
+            yield frame.program()
+
+
+@dataclasses.dataclass
+class Shard:
+    """
+    The part of the program space
+
+    Attributes
+    ----------
+    frame : Frame
+        The root of the part
+    contains_descendants : bool
+        If it is True, this shard contains all programs whose prefix is `frame`.
+        Otherwise, this shard contains only the program of `frame`.
+    """
+    frame: Frame
+    contains_descendants: bool
+
+
+def shards(functions: List[Function], max_length: int, depth: int = 1,
+           constraints: Union[None, List[Constraint]] = None, min_length: int = 1) -> List[Shard]:
+    """
+    Split the program space by the first `depth` statements
+
+    Parameters
+    ----------
+    functions : list of Function
+        All functions that can be used in source code
+    max_length : int
+        The maximum length of programs
+    depth : int
+        The number of statements used to split the space
+    constraints : list of Constraint or None
+        The constraints used to prune the enumeration
+    min_length : int
+        The minimum length of programs (it is used only to count the skipped programs)
+
+    Returns
+    -------
+    list of Shard
+        The shards. Concatenating the programs of the shards in this order
+        reproduces the order of `programs`.
+    """
+    retval = []
+    s = [Frame(None, [], None, IdGenerator())]
+    while len(s) != 0:
+        frame = s.pop()
+        if frame.length >= min(depth, max_length):
+            retval.append(Shard(frame, True))
+            continue
+        retval.append(Shard(frame, False))
+        s.extend(_children(functions, frame, constraints or [], min_length, max_length))
+    return retval
+
+
+def shard_programs(functions: List[Function], shard: Shard, min_length: int, max_length: int,
+                   constraints: Union[None, List[Constraint]] = None):
+    """
+    Enumerate all programs of the shard which length is in [min_length:max_length]
+
+    Parameters
+    ----------
+    functions : list of Function
+        All functions that can be used in source code
+    shard : Shard
+        The shard created by `shards` with the same functions and constraints
+    min_length : int
+        The minimum length of programs
+    max_length : int
+        The maximum length of programs
+    constraints : list of Constraint or None
+        The constraints used to prune the enumeration
 
     Yields
     ------
     Program
+    """
+    constraints = constraints or []
+    if shard.contains_descendants:
+        yield from _programs_from(functions, [shard.frame], min_length, max_length, constraints)
+    elif min_length <= shard.frame.length <= max_length and _accept(constraints, shard.frame, False):
+        yield shard.frame.program()
+
+
+def _run_shard(functions: List[Function], min_length: int, max_length: int,
+               transform: Union[None, Callable[[Program], Any]], constraints: List[Constraint],
+               chunk_size: int, shard: Shard, frontier: Union[None, List[Frame]]) \
+        -> Tuple[List[Any], Union[None, List[Frame]], List[Constraint]]:
+    # Enumerate at most chunk_size programs of the shard from the frontier (the DFS stack), and
+    # return the results and the remaining frontier (None if the shard is completed)
+    results = []
+
+    def add(program: Program):
+        result = program if transform is None else transform(program)
+        if result is not None:
+            results.append(result)
+
+    if not shard.contains_descendants:
+        for program in shard_programs(functions, shard, min_length, max_length, constraints):
+            add(program)
+        return results, None, constraints
+
+    stack = frontier if frontier is not None else [shard.frame]
+    n = 0
+    for frame in _frames_from(functions, stack, min_length, max_length, constraints):
+        add(frame.program())
+        n += 1
+        if n == chunk_size:
+            break
+    return results, (stack if len(stack) != 0 else None), constraints
+
+
+@dataclasses.dataclass
+class _ShardState:
+    shard: Shard
+    frontier: Union[None, List[Frame]] = None
+    pending: Any = None  # multiprocessing.pool.AsyncResult
+    chunks: Any = dataclasses.field(default_factory=collections.deque)
+    done: bool = False
+
+
+def parallel_programs(functions: List[Function], min_length: int, max_length: int,
+                      n_processes: Union[None, int] = None, depth: int = 1,
+                      transform: Union[None, Callable[[Program], Any]] = None,
+                      constraints: Union[None, List[Constraint]] = None,
+                      chunk_size: int = 1000):
+    """
+    Enumerate all programs which length is in [min_length:max_length]
+    by using a process pool
+
+    The program space is split by `shards`, and each shard is enumerated as a sequence of tasks.
+    Each task enumerates at most `chunk_size` programs and returns the rest of the DFS stack,
+    so a large shard does not have to be kept in memory at once.
+    The results are yielded in the order of `programs`, so the results do not depend on
+    the number of processes.
+
+    Parameters
+    ----------
+    functions : list of Function
+        All functions that can be used in source code
+    min_length : int
+        The minimum length of programs
+    max_length : int
+        The maximum length of programs
+    n_processes : int or None
+        The number of processes. If it is None, os.cpu_count() is used.
+        If it is 1, the programs are enumerated in the current process.
+    depth : int
+        The number of statements used to split the space.
+        The larger value creates more and smaller shards.
+    transform : function or None
+        The function applied to each program in the worker processes
+        (e.g., simplification and filtering). The results that are None are discarded.
+        It should be picklable (e.g., a module-level function or functools.partial).
+    constraints : list of Constraint or None
+        The constraints used to prune the enumeration.
+        The statistics of the worker processes are merged into these objects.
+    chunk_size : int
+        The maximum number of programs enumerated by one task. At most about
+        2 * n_processes + 1 chunks of results are kept in memory.
+
+    Yields
+    ------
+    Program or the result of transform
+    """
+    assert(min_length <= max_length)
+
+    constraints = constraints or []
+    ss = shards(functions, max_length, depth, constraints, min_length)
+    if n_processes == 1:
+        for shard in ss:
+            for program in shard_programs(functions, shard, min_length, max_length, constraints):
+                result = program if transform is None else transform(program)
+                if result is not None:
+                    yield result
+        return
+
+    # The workers start with zero statistics, and they are merged after each task
+    workers_constraints = copy.deepcopy(constraints)
+    for constraint in workers_constraints:
+        constraint.skipped = 0
+    run = functools.partial(_run_shard, functions, min_length,
+                            max_length, transform, workers_constraints, chunk_size)
+    limit = 2 * (n_processes if n_processes is not None else os.cpu_count())
+    with multiprocessing.Pool(n_processes) as pool:
+        remaining = collections.deque(ss)
+        active = collections.deque()  # _ShardState in the order of shards
+
+        def receive(state: _ShardState):
+            results, frontier, cs = state.pending.get()
+            for constraint, c in zip(constraints, cs):
+                constraint.merge(c)
+            state.pending = None
+            state.chunks.append(results)
+            state.frontier = frontier
+            state.done = frontier is None
+
+        def schedule():
+            # The number of the tasks in flight and the chunks not yielded yet
+            in_use = 0
+            for state in active:
+                if state.pending is not None and state.pending.ready():
+                    receive(state)
+                in_use += len(state.chunks) + (state.pending is not None)
+            for i, state in enumerate(active):
+                if state.pending is None and not state.done and (i == 0 or in_use < limit):
+                    # The first shard is always continued to avoid deadlock
+                    state.pending = pool.apply_async(run, (state.shard, state.frontier))
+                    in_use += 1
+            while in_use < limit and len(remaining) != 0:
+                state = _ShardState(remaining.popleft())
+                state.pending = pool.apply_async(run, (state.shard, None))
+                active.append(state)
+                in_use += 1
+
+        while len(active) != 0 or len(remaining) != 0:
+            schedule()
+            head = active[0]
+            if len(head.chunks) != 0:
+                yield from head.chunks.popleft()
+            elif head.done:
+                active.popleft()
+            else:
+                receive(head)
+
+
+def compact_programs(functions: List[Function], min_length: int, max_length: int):
+    """
+    Enumerate all programs which length is in [min_length:max_length]
+    as CompactProgram
+
+    This function enumerates the same programs as `programs`, but each
+    program is represented by one small array instead of the tree of objects.
+
+    Parameters
+    ----------
+    functions : list of Function
+        All functions that can be used in source code
+    min_length : int
+        The minimum length of programs
+    max_length : int
+        The maximum length of programs
+
+    Yields
+    ------
+    CompactProgram
         The program which length is in [min_length:max_length]
     """
     assert(min_length <= max_length)
 
+    table = FunctionTable(functions)
+
     # Perform DFS to enumerate source code
     # Start from a program with no expressions
-    s = [(Program([], []), IdGenerator())]
+    s = [CompactProgram(table)]
     while len(s) != 0:
-        p, g = s.pop()
+        p = s.pop()
 
-        if min_length <= len(p.body) <= max_length:
+        length = len(p)
+        if min_length <= length <= max_length:
             yield p
-        if len(p.body) >= max_length:
+        if length >= max_length:
             continue
 
         # Create a set of variables
-        vars = set(p.inputs + list(map(lambda x: x.variable, p.body)))
+        vars = set([Variable(id, p.variable_type(id))
+                    for id in range(len(p.code))])
 
         # Enumerate functions
         for func in functions:
             # Enumerate arguments
-            for a in arguments(g, vars, func.signature.input_types):
-                p_new = copy.deepcopy(p)
-                for v in a.new_variables:
-                    p_new.inputs.append(v)
-                generator = copy.deepcopy(a.generator)
-                p_new.body.append(
-                    Statement(Variable(generator.generate(), func.signature.output_type), Expression(func, a.arguments)))
-                s.append((p_new, generator))
+            # The ids of new variables are the indexes of the new rows
+            for a in arguments(IdGenerator(len(p.code)), vars, func.signature.input_types):
+                s.append(p.append(func, [v.id for v in a.arguments], [
+                         v.t for v in a.new_variables]))
+
+
+def _next_unused(pattern: Tuple[int, ...], signature: Tuple[Type, ...], output_type: Type,
+                 num_vars: Dict[Type, int], unused: Dict[Type, Set[int]]) \
+        -> Tuple[Dict[Type, int], Dict[Type, Set[int]]]:
+    # The numbers of the variables and the indexes of the unused variables after appending the statement.
+    # The new inputs are used by the statement, and the output is the last variable of its type.
+    num_new = {Type.Int: 0, Type.IntList: 0}
+    unused = {t: set(indexes) for t, indexes in unused.items()}
+    for index, t in zip(pattern, signature):
+        if index == num_vars[t] + num_new[t]:
+            num_new[t] += 1
+        else:
+            unused[t].discard(index)
+    num_vars = {t: num_vars[t] + num_new[t] for t in num_vars}
+    unused[output_type].add(num_vars[output_type])
+    num_vars[output_type] += 1
+    return num_vars, unused
+
+
+@functools.lru_cache(maxsize=None)
+def _num_live_completions(functions: Tuple[Function, ...], num_int: int, num_int_list: int,
+                          num_unused_int: int, num_unused_int_list: int, n_rest: int) -> int:
+    # The number of the ways to append n_rest statements so that only the last statement is unused.
+    # It is invariant under permutations of the variables, so the unused variables are assumed
+    # to be the first ones.
+    if n_rest == 0:
+        return 1 if num_unused_int + num_unused_int_list == 1 else 0
+    n = 0
+    unused = {Type.Int: set(range(num_unused_int)), Type.IntList: set(range(num_unused_int_list))}
+    for f in functions:
+        signature = tuple(f.signature.input_types)
+        for pattern in argument_patterns(num_int, num_int_list, signature):
+            num_vars, next_unused = _next_unused(
+                pattern, signature, f.signature.output_type,
+                {Type.Int: num_int, Type.IntList: num_int_list}, unused)
+            n += _num_live_completions(functions, num_vars[Type.Int], num_vars[Type.IntList],
+                                       len(next_unused[Type.Int]), len(next_unused[Type.IntList]),
+                                       n_rest - 1)
+    return n
+
+
+def _random_live_programs(functions: List[Function], min_length: int, max_length: int,
+                          rng: np.random.RandomState, constraints: List[Constraint]):
+    # Sample the programs without dead code uniformly for each length.
+    # Each statement is drawn with the weight of the number of the programs that complete it,
+    # so every program of the sampled length has the same probability.
+    fs = tuple(functions)
+    if all([_num_live_completions(fs, 0, 0, 0, 0, length) == 0
+            for length in range(min_length, max_length + 1)]):
+        raise RuntimeError("There is no program without dead code")
+    while True:
+        length = rng.randint(min_length, max_length + 1)
+        if _num_live_completions(fs, 0, 0, 0, 0, length) == 0:
+            continue
+
+        frame = Frame(None, [], None, IdGenerator())
+        variables: Set[Variable] = set()
+        typed_variables = {Type.Int: [], Type.IntList: []}
+        unused = {Type.Int: set(), Type.IntList: set()}
+        for i in range(length):
+            num_vars = {t: len(vs) for t, vs in typed_variables.items()}
+            candidates = []
+            weights = []
+            for f in functions:
+                signature = tuple(f.signature.input_types)
+                for pattern in argument_patterns(num_vars[Type.Int], num_vars[Type.IntList], signature):
+                    next_num_vars, next_unused = _next_unused(
+                        pattern, signature, f.signature.output_type, num_vars, unused)
+                    weight = _num_live_completions(
+                        fs, next_num_vars[Type.Int], next_num_vars[Type.IntList],
+                        len(next_unused[Type.Int]), len(next_unused[Type.IntList]), length - i - 1)
+                    if weight != 0:
+                        candidates.append((f, pattern, next_unused))
+                        weights.append(weight)
+            # The weights can exceed the range of int64
+            total = sum(weights)
+            f, pattern, unused = candidates[rng.choice(
+                len(candidates), p=np.array([w / total for w in weights]))]
 
+            signature = tuple(f.signature.input_types)
+            arg = _arguments_from_pattern(
+                pattern, frame.generator, variables, typed_variables, signature)
+            generator = arg.generator.clone()
+            v = Variable(generator.generate(), f.signature.output_type)
+            frame = Frame(frame, arg.new_variables, Statement(v, Expression(f, arg.arguments)), generator)
 
-def random_programs(functions: List[Function], min_length: int, max_length: int, rng: Union[None, np.random.RandomState] = None):
+            # The ids are increasing, so the typed variables are kept sorted
+            variables = set([*arg.variables, v])
+            for v_new in [*arg.new_variables, v]:
+                typed_variables[v_new.t].append(v_new)
+            if not _accept(constraints, frame, True):
+                frame = None
+                break
+
+        if frame is None or not _accept(constraints, frame, False):
+            continue
+        yield frame.program()
+
+
+def random_programs(functions: List[Function], min_length: int, max_length: int, rng: Union[None, np.random.RandomState] = None,
+                    constraints: Union[None, List[Constraint]] = None):
     """
     Generate random programs which length is in [min_length:max_length]
 
@@ -146,6 +960,14 @@ def random_programs(functions: List[Function], min_length: int, max_length: int,
         The maximum length of programs
     rng : None or np.random.RandomState
         The random number generator
+    constraints : list of Constraint or None
+        The constraints that the programs should satisfy.
+        The program is re-sampled from scratch when it is rejected,
+        so the programs follow the distribution of the unconstrained sampler
+        conditioned on the constraints.
+        If it contains NoDeadCode, the programs without dead code are sampled directly
+        instead of rejecting the others: the length is drawn uniformly, and every program without
+        dead code of the length has the same probability (before the other constraints are applied).
 
     Yields
     ------
@@ -154,6 +976,13 @@ def random_programs(functions: List[Function], min_length: int, max_length: int,
     """
     if rng is None:
         rng = np.random
+    constraints = constraints or []
+    if any([isinstance(constraint, NoDeadCode) for constraint in constraints]):
+        # NoDeadCode is satisfied by construction
+        yield from _random_live_programs(
+            functions, min_length, max_length, rng,
+            [constraint for constraint in constraints if not isinstance(constraint, NoDeadCode)])
+        return
 
     while True:
         assert(min_length <= max_length)
@@ -161,25 +990,213 @@ def random_programs(functions: List[Function], min_length: int, max_length: int,
         # Decide the length of the program
         length = rng.randint(min_length, max_length + 1)
 
-        program = Program([], [])
-        generator = IdGenerator()
+        frame = Frame(None, [], None, IdGenerator())
         for i in range(length):
             # Create a set of variables
-            vars = set(program.inputs +
-                       list(map(lambda x: x.variable, program.body)))
+            vars = set(frame.variables())
 
             # Decide the functions
-            func = rng.choice(functions)
+            # (it draws the same random number as rng.choice without converting the list into np.array)
+            func = functions[rng.randint(len(functions))]
 
             # Decide the arguments
-            arg = rng.choice(
-                list(arguments(generator, vars, func.signature.input_types)))
+            arg = random_arguments(
+                frame.generator, vars, func.signature.input_types, rng)
+
+            # Add the function call
+            generator = arg.generator.clone()
+            statement = Statement(Variable(generator.generate(), func.signature.output_type),
+                                  Expression(func, arg.arguments))
+            frame = Frame(frame, arg.new_variables, statement, generator)
+            if not _accept(constraints, frame, True):
+                # All programs that start with this prefix are rejected
+                frame = None
+                break
+
+        if frame is None or not _accept(constraints, frame, False):
+            continue
+        yield frame.program()
+
+
+@dataclasses.dataclass
+class SamplerStatistics:
+    """
+    The statistics of RandomProgramSampler
+
+    Attributes
+    ----------
+    num_sampled : int
+        The number of the sampled programs
+    num_observed : int
+        The number of the programs whose simplified lengths are observed
+    num_too_short : int
+        The number of the programs that become shorter than min_length by simplification
+    num_too_long : int
+        The number of the programs that are longer than max_length after simplification
+    """
+    num_sampled: int = 0
+    num_observed: int = 0
+    num_too_short: int = 0
+    num_too_long: int = 0
+
+    def discard_rate(self) -> float:
+        """
+        Return the ratio of the discarded programs to the observed programs
+        """
+        if self.num_observed == 0:
+            return 0.0
+        return (self.num_too_short + self.num_too_long) / self.num_observed
+
+
+class RandomProgramSampler:
+    """
+    The random program sampler that draws programs in batches
+
+    All random numbers of a batch are drawn at once. The distribution of the raw lengths
+    is adjusted by the observed lengths after simplification (`observe`), so that
+    the lengths of the simplified programs follow the target distribution.
+
+    Attributes
+    ----------
+    statistics : SamplerStatistics
+    weights : np.array
+        The current distribution of the raw lengths ([min_length:max_raw_length])
+    """
+
+    def __init__(self, functions: List[Function], min_length: int, max_length: int,
+                 rng: Union[None, np.random.RandomState] = None, batch_size: int = 1024,
+                 max_raw_length: Union[None, int] = None, target: Union[None, List[float]] = None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        functions : list of Function
+            All functions that can be used in source code
+        min_length : int
+            The minimum length of programs after simplification
+        max_length : int
+            The maximum length of programs after simplification
+        rng : None or np.random.RandomState
+            The random number generator
+        batch_size : int
+            The number of programs sampled at once
+        max_raw_length : int or None
+            The maximum length of the sampled programs. If it is None, max_length is used.
+        target : list of float or None
+            The target distribution of the simplified lengths ([min_length:max_length]).
+            If it is None, the uniform distribution is used.
+        """
+        assert(min_length <= max_length)
+        self.functions = functions
+        self.min_length = min_length
+        self.max_length = max_length
+        self.max_raw_length = max_raw_length if max_raw_length is not None else max_length
+        assert(max_length <= self.max_raw_length)
+        self.rng = rng if rng is not None else np.random
+        self.batch_size = batch_size
+        n_target = max_length - min_length + 1
+        self.target = np.array(target if target is not None else np.ones(n_target), dtype=np.float64)
+        self.target /= self.target.sum()
+        self.statistics = SamplerStatistics()
+
+        n_raw = self.max_raw_length - min_length + 1
+        # counts[i, l]: the number of programs with the raw length of (min_length + i) and
+        #               the simplified length of l (the prior assumes that simplification keeps the length)
+        self._counts = np.zeros((n_raw, self.max_raw_length + 1))
+        for i in range(n_raw):
+            self._counts[i, min_length + i] = 1.0
+        self.weights = np.ones(n_raw) / n_raw
+        self._update_weights()
+
+    def _update_weights(self):
+        # Estimate the weights by Richardson-Lucy deconvolution
+        p = self._counts / self._counts.sum(axis=1, keepdims=True)
+        p = p[:, self.min_length:self.max_length + 1]  # The lengths that are not discarded
+        sensitivity = p.sum(axis=1)
+        weights = np.ones(len(self.weights)) / len(self.weights)
+        for _ in range(100):
+            m = weights @ p
+            m /= m.sum()
+            ratio = np.where(m > 0, self.target / np.maximum(m, 1e-12), 0.0)
+            weights = weights * (p @ ratio) / np.maximum(sensitivity, 1e-12)
+            weights /= weights.sum()
+        self.weights = weights
+
+    def observe(self, raw_length: int, simplified_length: int):
+        """
+        Record the length of the simplified program
+
+        Parameters
+        ----------
+        raw_length : int
+            The length of the program returned by this sampler
+        simplified_length : int
+            The length of the program after simplification
+        """
+        self.statistics.num_observed += 1
+        if simplified_length < self.min_length:
+            self.statistics.num_too_short += 1
+        elif simplified_length > self.max_length:
+            self.statistics.num_too_long += 1
+        self._counts[raw_length - self.min_length, min(simplified_length, self.max_raw_length)] += 1
+
+    def sample(self, n: int) -> List[Program]:
+        """
+        Sample the programs
+
+        Parameters
+        ----------
+        n : int
+            The number of programs
+
+        Returns
+        -------
+        list of Program
+        """
+        self._update_weights()
+        lengths = self.rng.choice(np.arange(self.min_length, self.max_raw_length + 1),
+                                  size=n, p=self.weights)
+        fs = self.rng.randint(len(self.functions), size=(n, self.max_raw_length))
+        us = self.rng.random_sample((n, self.max_raw_length))
+        self.statistics.num_sampled += n
+        return [self._program(length, f, u) for length, f, u in zip(lengths, fs, us)]
+
+    def _program(self, length: int, fs: np.array, us: np.array) -> Program:
+        generator = IdGenerator()
+        variables = set()
+        typed_variables = {Type.Int: [], Type.IntList: []}
+        program = Program([], [])
+        for i in range(length):
+            func = self.functions[fs[i]]
+            signature = tuple(func.signature.input_types)
+            patterns = argument_patterns(len(typed_variables[Type.Int]), len(typed_variables[Type.IntList]),
+                                         signature)
+            pattern = patterns[int(us[i] * len(patterns))]
+            arg = _arguments_from_pattern(
+                pattern, generator, variables, typed_variables, signature)
 
             # Add the function call
-            for v in arg.new_variables:
-                program.inputs.append(v)
-            generator = arg.generator
-            program.body.append(Statement(Variable(generator.generate(
-            ), func.signature.output_type), Expression(func, arg.arguments)))
+            generator = arg.generator.clone()
+            v = Variable(generator.generate(), func.signature.output_type)
+            program.inputs.extend(arg.new_variables)
+            program.body.append(Statement(v, Expression(func, arg.arguments)))
+
+            # The ids are increasing, so the typed variables are kept sorted
+            variables = set([*arg.variables, v])
+            for v_new in [*arg.new_variables, v]:
+                typed_variables[v_new.t].append(v_new)
+        return program
 
-        yield program
+    def __iter__(self):
+        """
+        Generate random programs infinitely
+
+        Yields
+        ------
+        Program
+            The program which length is in [min_length:max_raw_length]
+        """
+        while True:
+            for program in self.sample(self.batch_size):
+                yield program
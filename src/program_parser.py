@@ -0,0 +1,182 @@
+from typing import List, Dict, Tuple, Union, Iterable
+from .dsl import Function, Type, Variable, Expression, Statement, Program, name_to_id
+from .dataset import Entry
+
+
+class Parser:
+    """
+    The parser of the source code
+
+    It supports 2 formats:
+    * the format of Program.to_string (e.g., "a <- [int]\\nb <- HEAD a"), and
+    * the output of the search command (e.g., " %2 <- access %0 %1").
+    """
+
+    def __init__(self, functions: List[Function], aliases: Union[None, Dict[str, str]] = None):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        functions : list of Function
+            All functions that can be used in source code
+        aliases : dict from str to str or None
+            The mapping from the function names of the search command to the names of functions
+            (e.g., {"map (+1)": "MAP INC"}). The names of the search command that are not in
+            this dict are compared with the names of functions case-insensitively.
+        """
+        # (name, arity) -> Function
+        self._functions: Dict[Tuple[str, int], Function] = dict()
+        self._search_functions: Dict[Tuple[str, int], Function] = dict()
+        for f in functions:
+            arity = len(f.signature.input_types)
+            self._functions[(f.name, arity)] = f
+            self._search_functions[(f.name.lower(), arity)] = f
+        for name, dsl_name in (aliases or dict()).items():
+            for f in functions:
+                if f.name == dsl_name:
+                    self._search_functions[(name.lower(), len(
+                        f.signature.input_types))] = f
+
+    @staticmethod
+    def _split(line: str) -> Tuple[str, List[str]]:
+        lhs, sep, rhs = line.partition("<-")
+        if sep == "":
+            raise RuntimeError("Invalid line: {}".format(line))
+        return lhs.strip(), rhs.split()
+
+    @staticmethod
+    def _function(functions: Dict[Tuple[str, int], Function], tokens: List[str],
+                  line: str) -> Tuple[Function, List[str]]:
+        # The arguments are the last tokens, and the number of them is the arity
+        for n_args in range(len(tokens)):
+            f = functions.get((" ".join(tokens[:len(tokens) - n_args]), n_args))
+            if f is not None:
+                return f, tokens[len(tokens) - n_args:]
+        raise RuntimeError("Unknown function: {}".format(line))
+
+    def parse(self, code: str) -> Program:
+        """
+        Parse the source code written in the format of Program.to_string
+
+        Parameters
+        ----------
+        code : str
+            The source code. The last newline can be omitted.
+
+        Returns
+        -------
+        Program
+        """
+        inputs = []
+        body = []
+        types: Dict[int, Type] = dict()
+        for line in code.split("\n"):
+            if line == "":
+                continue
+            lhs, tokens = Parser._split(line)
+            id = name_to_id(lhs)
+            if tokens == ["int"] or tokens == ["[int]"]:
+                t = Type.Int if tokens[0] == "int" else Type.IntList
+                inputs.append(Variable(id, t))
+                types[id] = t
+                continue
+
+            f, args = Parser._function(self._functions, tokens, line)
+            arguments = []
+            for arg in args:
+                arg_id = name_to_id(arg)
+                if not arg_id in types:
+                    raise RuntimeError("Undefined variable: {}".format(line))
+                arguments.append(Variable(arg_id, types[arg_id]))
+            types[id] = f.signature.output_type
+            body.append(Statement(Variable(id, f.signature.output_type),
+                                  Expression(f, arguments)))
+        return Program(inputs, body)
+
+    def parse_search_result(self, solution: str, input_types: List[Type]) -> Program:
+        """
+        Parse the solution found by the search command
+
+        Parameters
+        ----------
+        solution : str
+            The solution (e.g., SearchResult.solution).
+            The variables %0, ..., %(n-1) are the inputs.
+        input_types : list of Type
+            The types of the inputs
+
+        Returns
+        -------
+        Program
+        """
+        inputs = [Variable(i, t) for i, t in enumerate(input_types)]
+        body = []
+        types = dict([(v.id, v.t) for v in inputs])
+        for line in solution.split("\n"):
+            if line.strip() == "":
+                continue
+            lhs, tokens = Parser._split(line)
+            f, args = Parser._function(self._search_functions,
+                                       [token.lower() for token in tokens], line)
+            arguments = []
+            for arg in args:
+                if not arg.startswith("%") or not int(arg[1:]) in types:
+                    raise RuntimeError("Undefined variable: {}".format(line))
+                arguments.append(Variable(int(arg[1:]), types[int(arg[1:])]))
+            id = int(lhs.lstrip("%"))
+            types[id] = f.signature.output_type
+            body.append(Statement(Variable(id, f.signature.output_type),
+                                  Expression(f, arguments)))
+        return Program(inputs, body)
+
+    def parse_entries(self, entries: Iterable[Entry]) -> List[Program]:
+        """
+        Parse the source code of the entries
+
+        Parameters
+        ----------
+        entries : iterable of Entry
+            The entries (e.g., [entry for entry, in dataset])
+
+        Returns
+        -------
+        list of Program
+        """
+        return [self.parse(entry.source_code) for entry in entries]
+
+
+def parse(code: str, functions: List[Function]) -> Program:
+    """
+    Parse the source code written in the format of Program.to_string
+
+    Parameters
+    ----------
+    code : str
+    functions : list of Function
+        All functions that can be used in source code
+
+    Returns
+    -------
+    Program
+    """
+    return Parser(functions).parse(code)
+
+
+def parse_dataset(dataset, functions: List[Function]) -> List[Program]:
+    """
+    Parse all entries of the dataset
+
+    Parameters
+    ----------
+    dataset : chainer.dataset
+        The dataset whose items are (Entry,)
+    functions : list of Function
+        All functions that can be used in source code
+
+    Returns
+    -------
+    list of Program
+        The programs in the same order as the dataset
+    """
+    return Parser(functions).parse_entries([entry for entry, in dataset])
@@ -1,8 +1,27 @@
-import copy
+import functools
+from typing import Union, List, Callable
 from .dsl import Function, Type, Variable, Expression, Program, Statement
+from .compact_program import CompactProgram
+from .rewrite_rules import RewriteEngine, REORDERING_RULES, DEPENDENCY_RULES
+from .abstract_interpretation import analyze
 
 
-def normalize(program: Program):
+def _clone(program: Union[Program, CompactProgram]) -> Program:
+    # CompactProgram.to_program creates new objects, so it is not needed to clone the result
+    if isinstance(program, CompactProgram):
+        return program.to_program()
+    return program.clone()
+
+
+_reordering_rules = RewriteEngine(REORDERING_RULES, [])
+
+
+@functools.lru_cache(maxsize=None)
+def _dependency_rules(minimum: Function, maximum: Function) -> RewriteEngine:
+    return RewriteEngine(DEPENDENCY_RULES, [minimum, maximum])
+
+
+def normalize(program: Union[Program, CompactProgram]) -> Program:
     """
     Return the normalized program
     This function applies 2 transformations:
@@ -11,7 +30,7 @@ def normalize(program: Program):
 
     Parameters
     ----------
-    program : Program
+    program : Program or CompactProgram
         The program that will be normalized
 
     Returns
@@ -24,28 +43,49 @@ def normalize(program: Program):
     This function modify the program object of the argument
     to reduce runtime overhead.
     """
-    program = program.clone()  # Clone program to isolate the argument from modifications
+    program = _clone(program)  # Clone program to isolate the argument from modifications
+    normalize_in_place(program)
+    return program
 
+
+def normalize_in_place(program: Program) -> bool:
+    """
+    Normalize the program in place (see normalize)
+
+    Parameters
+    ----------
+    program : Program
+        The program that will be modified
+
+    Returns
+    -------
+    bool
+        Whether the program is changed or not
+    """
     # inputs should be sorted by id
     program.inputs.sort(key=lambda i: i.id)
 
-    # Re-assign id
+    # Re-assign id.
+    # The rules may share a Variable object between statements, so the variables are recreated
+    # instead of modifying their ids.
     old_id_to_new_id = dict()
     for i in program.inputs:
-        old_id = i.id
-        i.id = len(old_id_to_new_id)
-        old_id_to_new_id[old_id] = i.id
+        old_id_to_new_id[i.id] = len(old_id_to_new_id)
     for statement in program.body:
-        old_id = statement.variable.id
-        statement.variable.id = len(old_id_to_new_id)
-        old_id_to_new_id[old_id] = statement.variable.id
-        for arg in statement.expression.arguments:
-            arg.id = old_id_to_new_id[arg.id]
+        old_id_to_new_id[statement.variable.id] = len(old_id_to_new_id)
+    changed = any([old_id != new_id for old_id, new_id in old_id_to_new_id.items()])
 
-    return program
+    program.inputs = [Variable(old_id_to_new_id[i.id], i.t) for i in program.inputs]
+    for statement in program.body:
+        statement.variable = Variable(
+            old_id_to_new_id[statement.variable.id], statement.variable.t)
+        statement.expression.arguments = [Variable(old_id_to_new_id[arg.id], arg.t)
+                                          for arg in statement.expression.arguments]
+
+    return changed
 
 
-def remove_redundant_variables(program: Program) -> Program:
+def remove_redundant_variables(program: Union[Program, CompactProgram]) -> Program:
     """
     Return the program that is removed the redundant variables
     For examples, the program A will be converted to the program B
@@ -63,7 +103,7 @@ def remove_redundant_variables(program: Program) -> Program:
 
     Parameters
     ----------
-    program : Program
+    program : Program or CompactProgram
         The program that will be simplified
 
     Returns
@@ -72,14 +112,32 @@ def remove_redundant_variables(program: Program) -> Program:
         The simplified program
     """
 
-    program = program.clone()  # Clone program to isolate the argument from modifications
+    program = _clone(program)  # Clone program to isolate the argument from modifications
+    remove_redundant_variables_in_place(program)
+    return program
+
+
+def remove_redundant_variables_in_place(program: Program) -> bool:
+    """
+    Remove the redundant variables in place (see remove_redundant_variables)
+
+    Parameters
+    ----------
+    program : Program
+        The program that will be modified
 
+    Returns
+    -------
+    bool
+        Whether the program is changed or not
+    """
     inputs = []
     body = []
     if len(program.body) == 0:
+        changed = len(program.inputs) != 0
         program.inputs.clear()
         program.body.clear()
-        return program
+        return changed
 
     # Last line is always used (because it is output value)
     v_used = set([program.body[-1].variable])
@@ -96,12 +154,13 @@ def remove_redundant_variables(program: Program) -> Program:
             # v is not a redundant variable
             inputs.append(v)
 
+    changed = len(inputs) != len(program.inputs) or len(body) != len(program.body)
     program.inputs = inputs
     program.body = body
-    return program
+    return changed
 
 
-def remove_redundant_expressions(program: Program) -> Program:
+def remove_redundant_expressions(program: Union[Program, CompactProgram]) -> Program:
     """
     Return the program that is removed the redundant expressions
     This function applies following 3 rules:
@@ -150,7 +209,7 @@ def remove_redundant_expressions(program: Program) -> Program:
 
     Parameters
     ----------
-    program : Program
+    program : Program or CompactProgram
         The program that will be simplified
 
     Returns
@@ -158,44 +217,60 @@ def remove_redundant_expressions(program: Program) -> Program:
     Program
         The simplified program
     """
-    program = program.clone()  # Clone program to isolate the argument from modifications
+    program = _clone(program)  # Clone program to isolate the argument from modifications
+    remove_redundant_expressions_in_place(program)
+    return program
+
+
+def remove_redundant_expressions_in_place(program: Program) -> bool:
+    """
+    Remove the redundant expressions in place (see remove_redundant_expressions)
+
+    Parameters
+    ----------
+    program : Program
+        The program that will be modified
 
+    Returns
+    -------
+    bool
+        Whether the program is changed or not
+    """
     replacement = dict()  # Variable -> Variable
     expression_to_variable = dict()  # (str, [Variable]) -> Variable
     variable_to_expression = dict()  # Variable -> Expression
 
     body = []
-    for statement in program.body:
-        if (statement.expression.function.name, tuple(statement.expression.arguments)) in expression_to_variable:
+    for i, statement in enumerate(program.body):
+        for j, arg in enumerate(statement.expression.arguments):
+            if arg in replacement:
+                statement.expression.arguments[j] = replacement[arg]
+
+        key = (statement.expression.function.name,
+               tuple(statement.expression.arguments))
+        if key in expression_to_variable:
             # Rule1
-            replacement[statement.variable] = expression_to_variable[(
-                statement.expression.function.name, tuple(statement.expression.arguments))]
+            v = expression_to_variable[key]
+        else:
+            # Rule2, Rule3
+            v = _reordering_rules.rewrite(
+                statement.expression, variable_to_expression)
+        # The last statement cannot be removed because it defines the output
+        if v is not None and i != len(program.body) - 1:
+            replacement[statement.variable] = v
             continue
-        if len(statement.expression.arguments) > 0 and statement.expression.arguments[0] in variable_to_expression:
-            exp_arg1 = variable_to_expression[statement.expression.arguments[0]]
-            if statement.expression.function.name == "SORT" and (exp_arg1.function.name == "SORT"):
-                # Rule2
-                replacement[statement.variable] = statement.expression.arguments[0]
-                continue
-            if statement.expression.function.name == "REVERSE" and (exp_arg1.function.name == "REVERSE"):
-                # Rule3
-                replacement[statement.variable] = variable_to_expression[statement.expression.arguments[0]].arguments[0]
-                continue
-
-        for i, arg in enumerate(statement.expression.arguments):
-            if arg in replacement:
-                statement.expression.arguments[i] = replacement[arg]
-        body.append(statement)
 
-        expression_to_variable[(statement.expression.function.name, tuple(
-            statement.expression.arguments))] = statement.variable
+        body.append(statement)
+        expression_to_variable[key] = statement.variable
         variable_to_expression[statement.variable] = statement.expression
+    # The arguments are replaced only if some statements are removed
+    changed = len(body) != len(program.body)
     program.body = body
 
-    return program
+    return changed
 
 
-def remove_dependency_between_variables(program: Program, minimum: Function, maximum: Function) -> Program:
+def remove_dependency_between_variables(program: Union[Program, CompactProgram], minimum: Function, maximum: Function) -> Program:
     """
     Return the program that is reduced dependencies between variables
     This function applies following 3 rules:
@@ -244,7 +319,7 @@ def remove_dependency_between_variables(program: Program, minimum: Function, max
 
     Parameters
     ----------
-    program : Program
+    program : Program or CompactProgram
         The program that will be simplified
     minimum : Function
         The MINIMUM function
@@ -256,38 +331,213 @@ def remove_dependency_between_variables(program: Program, minimum: Function, max
     Program
         The simplified program
     """
-    program = program.clone()  # Clone program to isolate the argument from modifications
+    program = _clone(program)  # Clone program to isolate the argument from modifications
+    remove_dependency_between_variables_in_place(program, minimum, maximum)
+    return program
 
+
+def remove_dependency_between_variables_in_place(program: Program, minimum: Function, maximum: Function) -> bool:
+    """
+    Reduce dependencies between variables in place (see remove_dependency_between_variables)
+
+    Parameters
+    ----------
+    program : Program
+        The program that will be modified
+    minimum : Function
+        The MINIMUM function
+    maximum : Function
+        The MAXIMUM function
+
+    Returns
+    -------
+    bool
+        Whether the program is changed or not
+    """
+    changed = False
+    rules = _dependency_rules(minimum, maximum)
     variable_to_expression = dict()  # Variable -> Expression
 
-    body = []
     for statement in program.body:
-        if len(statement.expression.arguments) > 0 and statement.expression.arguments[0] in variable_to_expression:
-            exp_arg1 = variable_to_expression[statement.expression.arguments[0]]
-            if (exp_arg1.function.name == "SORT" or exp_arg1.function.name == "REVERSE") and (statement.expression.function.name == "SUM" or statement.expression.function.name == "MAXIMUM" or statement.expression.function.name == "MINIMUM"):
-                # Rule1
-                x = exp_arg1.arguments[0]
-                exp = Expression(statement.expression.function, [x])
-                body.append(Statement(statement.variable, exp))
-                variable_to_expression[statement.variable] = statement.expression
-                continue
-            if exp_arg1.function.name == "SORT" and (statement.expression.function.name == "HEAD"):
-                # Rule2
-                x = exp_arg1.arguments[0]
-                exp = Expression(minimum, [x])
-                body.append(Statement(statement.variable, exp))
-                variable_to_expression[statement.variable] = exp
-                continue
-            if exp_arg1.function.name == "SORT" and (statement.expression.function.name == "LAST"):
-                # Rule3
-                x = exp_arg1.arguments[0]
-                exp = Expression(maximum, [x])
-                body.append(Statement(statement.variable, exp))
-                variable_to_expression[statement.variable] = exp
-                continue
-
-        body.append(statement)
+        # Rule1, Rule2, Rule3
+        exp = rules.rewrite(statement.expression, variable_to_expression)
+        if exp is not None:
+            statement.expression = exp
+            changed = True
         variable_to_expression[statement.variable] = statement.expression
 
-    program.body = body
+    return changed
+
+
+def remove_redundant_expressions_by_facts(program: Union[Program, CompactProgram], minimum: Function, maximum: Function) -> Program:
+    """
+    Return the program that is removed the redundant expressions by using the facts
+    inferred by the abstract interpretation (see abstract_interpretation.analyze).
+    Unlike remove_redundant_expressions, the sortedness and signs are tracked through
+    the other functions (e.g., MAP INC of a sorted list is sorted).
+    This function applies following 4 rules:
+
+    Rule1: SORT function and SCANL1 MAX function for the sorted list will be removed
+    ```
+    <Program>
+    a <- [int]
+    b <- SORT a
+    c <- MAP INC b
+    d <- SORT c
+    e <- ZIPWITH * c d
+
+    <Program returned by this function>
+    a <- [int]
+    b <- SORT a
+    c <- MAP INC b
+    e <- ZIPWITH * c c
+    ```
+
+    Rule2: FILTER function whose predicate is true for all elements will be removed
+    ```
+    <Program>
+    a <- [int]
+    b <- MAP SQR a
+    c <- MAP INC b
+    d <- FILTER isPOS c
+    e <- ZIPWITH * c d
+
+    <Program returned by this function>
+    a <- [int]
+    b <- MAP SQR a
+    c <- MAP INC b
+    e <- ZIPWITH * c c
+    ```
+
+    Rule3: HEAD function to a sorted list will be converted
+           into MINIMUM function
+
+    Rule4: LAST function to a sorted list will be converted
+           into MAXIMUM function
+
+    Parameters
+    ----------
+    program : Program or CompactProgram
+        The program that will be simplified
+    minimum : Function
+        The MINIMUM function
+    maximum : Function
+        The MAXIMUM function
+
+    Returns
+    -------
+    Program
+        The simplified program
+    """
+    program = _clone(program)  # Clone program to isolate the argument from modifications
+    remove_redundant_expressions_by_facts_in_place(program, minimum, maximum)
     return program
+
+
+def remove_redundant_expressions_by_facts_in_place(program: Program, minimum: Function, maximum: Function) -> bool:
+    """
+    Remove the redundant expressions by using the facts in place
+    (see remove_redundant_expressions_by_facts)
+
+    Parameters
+    ----------
+    program : Program
+        The program that will be modified
+    minimum : Function
+        The MINIMUM function
+    maximum : Function
+        The MAXIMUM function
+
+    Returns
+    -------
+    bool
+        Whether the program is changed or not
+    """
+    # The rules do not change the values of variables, so the facts are computed only once
+    facts = analyze(program)
+    changed = False
+    replacement = dict()  # Variable -> Variable
+
+    body = []
+    for i, statement in enumerate(program.body):
+        expression = statement.expression
+        for j, arg in enumerate(expression.arguments):
+            if arg in replacement:
+                expression.arguments[j] = replacement[arg]
+
+        name = expression.function.name
+        arg_facts = [facts[arg] for arg in expression.arguments]
+        # Rule1, Rule2
+        redundant = (name in ["SORT", "SCANL1 MAX"] and arg_facts[0].sorted) or \
+            (name == "FILTER isPOS" and arg_facts[0].positive) or \
+            (name == "FILTER isNEG" and arg_facts[0].maximum < 0)
+        # The last statement cannot be removed because it defines the output
+        if redundant and i != len(program.body) - 1:
+            replacement[statement.variable] = expression.arguments[0]
+            changed = True
+            continue
+
+        # Rule3, Rule4
+        if name == "HEAD" and arg_facts[0].sorted:
+            statement.expression = Expression(minimum, expression.arguments)
+            changed = True
+        elif name == "LAST" and arg_facts[0].sorted:
+            statement.expression = Expression(maximum, expression.arguments)
+            changed = True
+        body.append(statement)
+    program.body = body
+
+    return changed
+
+
+"""
+The rule that simplifies the program in place and returns whether the program is changed
+"""
+Rule = Callable[[Program], bool]
+
+
+class Pipeline:
+    """
+    The simplifier that applies the rules until the program is not changed
+
+    The argument is cloned only once, and the rules modify the cloned program in place.
+    The result is normalized, so the pipeline can be used as the simplify function
+    of generate_dataset without the outer fixpoint loop.
+
+    Attributes
+    ----------
+    rules : list of Rule
+        The rules (e.g., remove_redundant_variables_in_place)
+    """
+
+    def __init__(self, rules: List[Rule]):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        rules : list of Rule
+        """
+        self.rules = rules
+
+    def __call__(self, program: Union[Program, CompactProgram]) -> Program:
+        """
+        Return the simplified and normalized program
+
+        Parameters
+        ----------
+        program : Program or CompactProgram
+            The program that will be simplified. It is not modified.
+
+        Returns
+        -------
+        Program
+        """
+        program = _clone(program)
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.rules:
+                changed |= rule(program)
+        normalize_in_place(program)
+        return program
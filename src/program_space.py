@@ -0,0 +1,178 @@
+import dataclasses
+import functools
+from collections import Counter
+from typing import List, Dict, Tuple, Iterator
+from .dsl import Function, Type, Signature
+from .program_generator import argument_patterns
+
+
+@dataclasses.dataclass
+class ProgramSpaceSize:
+    """
+    The number of programs enumerated by `programs`
+
+    Attributes
+    ----------
+    counts : dict from (int, Signature, Function) to int
+        The number of raw programs for each (length, signature, first function)
+    live_counts : dict from (int, Signature, Function) to int
+        The number of programs without dead code for each (length, signature, first function).
+        They are the enumerated programs that remove_redundant_variables keeps unchanged.
+        The total is only an estimate of the number of distinct programs after simplification:
+        the programs with dead code may be simplified into programs that are not enumerated
+        (e.g., the variables are renumbered by normalize), and stronger simplifiers
+        (e.g., the ones that merge equivalent programs) may merge the programs without dead code.
+    """
+    counts: Dict[Tuple[int, Signature, Function], int]
+    live_counts: Dict[Tuple[int, Signature, Function], int]
+
+    def _counts(self, live: bool) -> Dict[Tuple[int, Signature, Function], int]:
+        return self.live_counts if live else self.counts
+
+    def total(self, live: bool = False) -> int:
+        """
+        Return the total number of programs
+
+        Parameters
+        ----------
+        live : bool
+            If it is True, only the programs without dead code are counted
+        """
+        return sum(self._counts(live).values())
+
+    def by_length(self, live: bool = False) -> Dict[int, int]:
+        """
+        Return the number of programs for each length
+        """
+        retval: Dict[int, int] = dict()
+        for (length, _, _), n in self._counts(live).items():
+            retval[length] = retval.get(length, 0) + n
+        return retval
+
+    def by_signature(self, live: bool = False) -> Dict[Signature, int]:
+        """
+        Return the number of programs for each signature
+        """
+        retval: Dict[Signature, int] = dict()
+        for (_, signature, _), n in self._counts(live).items():
+            retval[signature] = retval.get(signature, 0) + n
+        return retval
+
+    def by_first_function(self, live: bool = False) -> Dict[Function, int]:
+        """
+        Return the number of programs for each function used in the first statement
+        """
+        retval: Dict[Function, int] = dict()
+        for (_, _, f), n in self._counts(live).items():
+            retval[f] = retval.get(f, 0) + n
+        return retval
+
+
+@functools.lru_cache(maxsize=None)
+def _transitions(num_int: int, num_int_list: int, num_unused_int: int, num_unused_int_list: int,
+                 signature: Tuple[Type, ...]) -> Tuple[Tuple[Tuple[Type, ...], int, int, int], ...]:
+    # The patterns are invariant under permutations of the existing variables,
+    # so the unused variables can be assumed to be the first ones
+    num_existing = {Type.Int: num_int, Type.IntList: num_int_list}
+    num_unused = {Type.Int: num_unused_int, Type.IntList: num_unused_int_list}
+    transitions = Counter()
+    for pattern in argument_patterns(num_int, num_int_list, signature):
+        new_inputs = []
+        num_new = {Type.Int: 0, Type.IntList: 0}
+        consumed = {Type.Int: set(), Type.IntList: set()}
+        for index, t in zip(pattern, signature):
+            if index == num_existing[t] + num_new[t]:
+                num_new[t] += 1
+                new_inputs.append(t)
+            elif index < num_unused[t]:
+                consumed[t].add(index)
+        transitions[(tuple(new_inputs), len(consumed[Type.Int]), len(consumed[Type.IntList]))] += 1
+    return tuple([(new_inputs, n_int, n_list, n) for (new_inputs, n_int, n_list), n in transitions.items()])
+
+
+def count_programs(functions: List[Function], min_length: int, max_length: int) -> ProgramSpaceSize:
+    """
+    Count the programs enumerated by `programs` without enumerating them
+
+    Parameters
+    ----------
+    functions : list of Function
+        All functions that can be used in source code
+    min_length : int
+        The minimum length of programs
+    max_length : int
+        The maximum length of programs
+
+    Returns
+    -------
+    ProgramSpaceSize
+    """
+    assert(min_length <= max_length)
+
+    # state: (input types, #Int vars, #IntList vars, #unused Int statements, #unused IntList statements,
+    #         output type, first function)
+    states = Counter([((), 0, 0, 0, 0, None, None)])
+    counts: Dict[Tuple[int, Signature, Function], int] = dict()
+    live_counts: Dict[Tuple[int, Signature, Function], int] = dict()
+
+    for length in range(1, max_length + 1):
+        next_states = Counter()
+        for (input_types, n_int, n_list, u_int, u_list, _, first), n in states.items():
+            for f in functions:
+                t_out = f.signature.output_type
+                for new_inputs, c_int, c_list, m in _transitions(n_int, n_list, u_int, u_list,
+                                                                 tuple(f.signature.input_types)):
+                    n_new_int = len([t for t in new_inputs if t == Type.Int])
+                    next_states[(
+                        input_types + new_inputs,
+                        n_int + n_new_int + (1 if t_out == Type.Int else 0),
+                        n_list + len(new_inputs) - n_new_int +
+                        (1 if t_out == Type.IntList else 0),
+                        u_int - c_int + (1 if t_out == Type.Int else 0),
+                        u_list - c_list + (1 if t_out == Type.IntList else 0),
+                        t_out,
+                        first if first is not None else f
+                    )] += n * m
+        states = next_states
+
+        if length < min_length:
+            continue
+        for (input_types, _, _, u_int, u_list, t_out, first), n in states.items():
+            key = (length, Signature(list(input_types), t_out), first)
+            counts[key] = counts.get(key, 0) + n
+            if u_int + u_list == 1:
+                # Only the last statement is unused
+                live_counts[key] = live_counts.get(key, 0) + n
+
+    return ProgramSpaceSize(counts, live_counts)
+
+
+class SizedIterator:
+    """
+    The iterator with the known number of items
+
+    It is used to give the total to progress bars (e.g., tqdm uses len(iterable)).
+    """
+
+    def __init__(self, iterator: Iterator, length: int):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        iterator : Iterator
+            The wrapped iterator
+        length : int
+            The number of items in the iterator
+        """
+        self._iterator = iterator
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
@@ -0,0 +1,218 @@
+import dataclasses
+from typing import List, Dict, Tuple, Union, Callable
+from .dsl import Function, Variable, Expression, Program
+
+"""
+The reference to an argument used in rewrite rules.
+("outer", i) is the i-th argument of the rewritten expression, and
+("inner", i) is the i-th argument of the expression that defines the `position`-th argument.
+"""
+Reference = Tuple[str, int]
+
+
+@dataclasses.dataclass
+class RewriteRule:
+    """
+    The rule that rewrites the composition of 2 functions (outer(..., inner(...), ...))
+
+    Attributes
+    ----------
+    outer : str
+        The name of the function of the rewritten expression
+    inner : str
+        The name of the function that defines the argument
+    function : str or None
+        The name of the function of the new expression.
+        If it is None, the expression is replaced with `arguments[0]`.
+    arguments : list of Reference
+        The arguments of the new expression
+    position : int
+        The index of the argument of `outer` defined by `inner`
+    condition : function or None
+        The function that receives the outer and inner expressions,
+        and returns whether this rule can be applied or not.
+    """
+    outer: str
+    inner: str
+    function: Union[None, str]
+    arguments: List[Reference]
+    position: int = 0
+    condition: Union[None, Callable[[Expression, Expression], bool]] = None
+
+
+_PREDICATES = ["isPOS", "isNEG", "isODD", "isEVEN"]
+_REDUCERS = ["SUM", "MAXIMUM", "MINIMUM"]
+
+"""
+The rules that remove the reordering functions (SORT, REVERSE) before reduce functions,
+and convert HEAD/LAST of a sorted list into MINIMUM/MAXIMUM
+"""
+DEPENDENCY_RULES: List[RewriteRule] = \
+    [RewriteRule(f, g, f, [("inner", 0)]) for f in _REDUCERS for g in ["SORT", "REVERSE"]] + \
+    [
+        RewriteRule("HEAD", "SORT", "MINIMUM", [("inner", 0)]),
+        RewriteRule("LAST", "SORT", "MAXIMUM", [("inner", 0)]),
+    ]
+
+"""
+The rules that remove the reordering functions applied to the reordered list
+"""
+REORDERING_RULES: List[RewriteRule] = [
+    RewriteRule("SORT", "SORT", None, [("outer", 0)]),
+    RewriteRule("REVERSE", "REVERSE", None, [("inner", 0)]),
+]
+
+"""
+The identities of LINQ functions.
+TAKE and DROP use the slice semantics (e.g., TAKE -1 [1, 2, 3] = [1, 2]),
+so their compositions (e.g., TAKE n (TAKE n x)) are not simplified.
+"""
+LINQ_RULES: List[RewriteRule] = \
+    DEPENDENCY_RULES + REORDERING_RULES + \
+    [
+        # MAP composition
+        RewriteRule("MAP INC", "MAP DEC", None, [("inner", 0)]),
+        RewriteRule("MAP DEC", "MAP INC", None, [("inner", 0)]),
+        RewriteRule("MAP doNEG", "MAP doNEG", None, [("inner", 0)]),
+        RewriteRule("MAP SHL", "MAP SHL", "MAP MUL4", [("inner", 0)]),
+        RewriteRule("MAP SHR", "MAP SHR", "MAP DIV4", [("inner", 0)]),
+        # Reordering
+        RewriteRule("SORT", "REVERSE", "SORT", [("inner", 0)]),
+        RewriteRule("HEAD", "REVERSE", "LAST", [("inner", 0)]),
+        RewriteRule("LAST", "REVERSE", "HEAD", [("inner", 0)]),
+        RewriteRule("HEAD", "SCANL1 MAX", "HEAD", [("inner", 0)]),
+        RewriteRule("HEAD", "SCANL1 MIN", "HEAD", [("inner", 0)]),
+        RewriteRule("LAST", "SCANL1 MAX", "MAXIMUM", [("inner", 0)]),
+        RewriteRule("LAST", "SCANL1 MIN", "MINIMUM", [("inner", 0)]),
+    ] + \
+    [RewriteRule("FILTER " + p, "FILTER " + p, None, [("outer", 0)]) for p in _PREDICATES] + \
+    [RewriteRule("COUNT " + p, "FILTER " + p, "COUNT " + p, [("inner", 0)]) for p in _PREDICATES] + \
+    [RewriteRule("COUNT " + p, g, "COUNT " + p, [("inner", 0)])
+     for p in _PREDICATES for g in ["SORT", "REVERSE"]]
+
+
+class RewriteEngine:
+    """
+    The simplifier that applies the rewrite rules
+
+    The rules are indexed by (outer, inner, position), so only the applicable rules
+    are checked for each argument of each statement.
+    It can be used as a Rule of program_simplifier.Pipeline.
+    """
+
+    def __init__(self, rules: List[RewriteRule], functions: List[Function]):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        rules : list of RewriteRule
+        functions : list of Function
+            The functions that can be used in the new expressions.
+            The rules that need the other functions are ignored.
+        """
+        self._functions: Dict[str, Function] = dict()
+        for f in functions:
+            self._functions[f.name] = f
+        self._rules: Dict[Tuple[str, str, int], List[Tuple[RewriteRule, Union[None, Function]]]] = dict()
+        for rule in rules:
+            if rule.function is not None and rule.function != rule.outer and \
+                    not rule.function in self._functions:
+                continue
+            key = (rule.outer, rule.inner, rule.position)
+            if not key in self._rules:
+                self._rules[key] = []
+            self._rules[key].append((rule, self._functions.get(rule.function)))
+
+    def rules(self, outer: str, inner: str, position: int) -> List[Tuple[RewriteRule, Union[None, Function]]]:
+        """
+        Return the rules applicable to the composition
+
+        Parameters
+        ----------
+        outer : str
+            The name of the function of the rewritten expression
+        inner : str
+            The name of the function that defines the argument
+        position : int
+            The index of the argument
+
+        Returns
+        -------
+        list of (RewriteRule, Function or None)
+            The rules and the functions of the new expressions.
+            The function is None if the rule does not create a new expression
+            or the new expression uses the function of the rewritten expression.
+        """
+        return self._rules.get((outer, inner, position), [])
+
+    def rewrite(self, expression: Expression,
+                variable_to_expression: Dict[Variable, Expression]) -> Union[None, Variable, Expression]:
+        """
+        Apply the first applicable rule to the expression
+
+        Parameters
+        ----------
+        expression : Expression
+        variable_to_expression : dict from Variable to Expression
+            The expressions that define the variables
+
+        Returns
+        -------
+        Variable, Expression or None
+            The variable or expression equivalent to `expression`.
+            If no rule is applicable, it returns None.
+        """
+        for position, arg in enumerate(expression.arguments):
+            inner = variable_to_expression.get(arg)
+            if inner is None:
+                continue
+            for rule, f in self.rules(expression.function.name, inner.function.name, position):
+                if rule.condition is not None and not rule.condition(expression, inner):
+                    continue
+                arguments = [(expression if src == "outer" else inner).arguments[i]
+                             for src, i in rule.arguments]
+                if rule.function is None:
+                    return arguments[0]
+                return Expression(f if f is not None else expression.function, arguments)
+        return None
+
+    def __call__(self, program: Program) -> bool:
+        """
+        Apply the rules to the program in place
+
+        Parameters
+        ----------
+        program : Program
+            The program that will be modified
+
+        Returns
+        -------
+        bool
+            Whether the program is changed or not
+        """
+        changed = False
+        replacement = dict()  # Variable -> Variable
+        variable_to_expression = dict()  # Variable -> Expression
+        body = []
+        for i, statement in enumerate(program.body):
+            arguments = statement.expression.arguments
+            for j, arg in enumerate(arguments):
+                if arg in replacement:
+                    arguments[j] = replacement[arg]
+
+            result = self.rewrite(statement.expression, variable_to_expression)
+            if isinstance(result, Variable):
+                # The last statement cannot be removed because it defines the output
+                if i != len(program.body) - 1:
+                    replacement[statement.variable] = result
+                    changed = True
+                    continue
+            elif result is not None:
+                statement.expression = result
+                changed = True
+
+            body.append(statement)
+            variable_to_expression[statement.variable] = statement.expression
+        program.body = body
+        return changed
@@ -0,0 +1,218 @@
+import dataclasses
+import os
+import pickle
+import chainer as ch
+from typing import List, Tuple, Union, Set
+from .dataset import Entry, DatasetMetadata, Dataset
+
+
+@dataclasses.dataclass
+class Shard:
+    """
+    The shard file of the dataset
+
+    Attributes
+    ----------
+    filename : str
+        The name of the file (relative to the directory)
+    offsets : list of int
+        The offset of each pickled entry
+    """
+    filename: str
+    offsets: List[int]
+
+
+@dataclasses.dataclass
+class Manifest:
+    """
+    The manifest of the sharded dataset
+
+    Attributes
+    ----------
+    shards : list of Shard
+        The completed shards
+    metadata : DatasetMetadata
+        The metadata of the entries in the shards
+    complete : bool
+        Whether the writer was closed or not
+    """
+    shards: List[Shard]
+    metadata: DatasetMetadata
+    complete: bool
+
+
+_MANIFEST = "manifest.pickle"
+
+
+class ShardedDatasetWriter:
+    """
+    The writer that streams entries into shard files
+
+    The entries are appended to the current shard file, and a new shard is started when
+    the size of the file exceeds `max_shard_bytes`. The manifest (manifest.pickle) is
+    written atomically whenever a shard is completed, so the completed shards can be read
+    even if the process crashes.
+
+    Attributes
+    ----------
+    directory : str
+        The output directory
+    max_shard_bytes : int
+        The (soft) maximum size of each shard file
+    """
+
+    def __init__(self, directory: str, value_range: int, max_list_length: int,
+                 max_shard_bytes: int = 64 * 1024 * 1024):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        directory : str
+        value_range : int
+        max_list_length : int
+        max_shard_bytes : int
+        """
+        self.directory = directory
+        self.max_shard_bytes = max_shard_bytes
+        self._value_range = value_range
+        self._max_list_length = max_list_length
+        self._max_num_inputs = 0
+        self._symbols: Set[str] = set()
+        self._shards: List[Shard] = []
+        self._file = None
+        self._offsets: List[int] = []
+        os.makedirs(directory, exist_ok=True)
+        self._write_manifest(False)
+
+    def _metadata(self) -> DatasetMetadata:
+        # Same as dataset.dataset_metadata
+        return DatasetMetadata(self._max_num_inputs, set(self._symbols),
+                               self._value_range, self._max_list_length)
+
+    def _write_manifest(self, complete: bool):
+        tmp = os.path.join(self.directory, _MANIFEST + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(Manifest(list(self._shards), self._metadata(), complete), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.directory, _MANIFEST))
+
+    def _finish_shard(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._shards.append(
+            Shard(os.path.basename(self._file.name), self._offsets))
+        self._file = None
+        self._offsets = []
+        self._write_manifest(False)
+
+    def append(self, entry: Entry):
+        """
+        Append the entry
+
+        Parameters
+        ----------
+        entry : Entry
+        """
+        if self._file is None:
+            self._file = open(os.path.join(
+                self.directory, "shard-{:05d}.pickle".format(len(self._shards))), "wb")
+        self._max_num_inputs = max(self._max_num_inputs, len(entry.examples[0].inputs))
+        if len(self._symbols) == 0:
+            self._symbols = set(entry.attribute.keys())
+
+        self._offsets.append(self._file.tell())
+        pickle.dump(entry, self._file)
+        if self._file.tell() >= self.max_shard_bytes:
+            self._finish_shard()
+
+    def close(self) -> DatasetMetadata:
+        """
+        Complete the current shard and the manifest
+
+        Returns
+        -------
+        DatasetMetadata
+            The metadata of all entries
+        """
+        self._finish_shard()
+        self._write_manifest(True)
+        return self._metadata()
+
+
+class ShardedDataset(ch.dataset.DatasetMixin):
+    """
+    The dataset that reads the entries written by ShardedDatasetWriter
+
+    Each example is (Entry,) as the dataset of Dataset. The entries are read
+    from the files when they are accessed, so the memory usage does not depend on the dataset size.
+
+    Attributes
+    ----------
+    directory : str
+    metadata : DatasetMetadata
+    complete : bool
+        Whether the writer was closed or not. If it is False, only the completed shards are read.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Constructor
+
+        Parameters
+        ----------
+        directory : str
+        """
+        self.directory = directory
+        with open(os.path.join(directory, _MANIFEST), "rb") as f:
+            manifest = pickle.load(f)
+        self.metadata = manifest.metadata
+        self.complete = manifest.complete
+        self._index: List[Tuple[str, int]] = [
+            (shard.filename, offset) for shard in manifest.shards for offset in shard.offsets]
+        self._file = None
+        self._filename: Union[None, str] = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getstate__(self):
+        # The file object is not picklable (e.g., MultiprocessIterator)
+        state = self.__dict__.copy()
+        state["_file"] = None
+        state["_filename"] = None
+        return state
+
+    def get_example(self, i: int) -> Tuple[Entry]:
+        filename, offset = self._index[i]
+        if self._filename != filename:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(os.path.join(self.directory, filename), "rb")
+            self._filename = filename
+        self._file.seek(offset)
+        return (pickle.load(self._file),)
+
+
+def load(path: str) -> Dataset:
+    """
+    Load the dataset written by generate_dataset
+
+    Parameters
+    ----------
+    path : str
+        The pickle file or the directory of the sharded dataset
+
+    Returns
+    -------
+    Dataset
+    """
+    if os.path.isdir(path):
+        dataset = ShardedDataset(path)
+        return Dataset(dataset, dataset.metadata)
+    with open(path, "rb") as f:
+        return pickle.load(f)
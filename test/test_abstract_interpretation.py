@@ -0,0 +1,95 @@
+import unittest
+import math
+import numpy as np
+
+from src.deepcoder_utils import generate_io_samples
+from src.dsl import Function, Type, Variable, Expression, Program, Signature, Statement, to_function
+from src.interpreter import execute_statements, inputs_to_batch, from_batch
+from src.program_generator import programs
+from src.abstract_interpretation import Facts, analyze, transfer, may_produce_valid_output
+
+
+class Test_abstract_interpretation(unittest.TestCase):
+    def test_transfer(self):
+        xs = Facts(-10, 10, 0, 5)
+        self.assertEqual(Facts(-10, 10, 0, 5, True), transfer("SORT", [xs]))
+        self.assertEqual(Facts(0, 100, 0, 5, False), transfer("MAP SQR", [xs]))
+        self.assertEqual(Facts(1, 10, 0, 5, False),
+                         transfer("FILTER isPOS", [xs]))
+        self.assertEqual(Facts(0, 5), transfer("COUNT isNEG", [xs]))
+        self.assertEqual(Facts(-50, 50), transfer("SUM", [xs]))
+        self.assertEqual(Facts(-10, 20), transfer("HEAD", [xs], 20))
+        self.assertEqual(Facts(-math.inf, math.inf), transfer("HEAD", [xs]))
+
+        # The sortedness is kept by monotonic functions
+        sorted_xs = transfer("SORT", [xs])
+        self.assertTrue(transfer("MAP INC", [sorted_xs]).sorted)
+        self.assertFalse(transfer("MAP doNEG", [sorted_xs]).sorted)
+        self.assertTrue(transfer("SCANL1 MAX", [xs]).sorted)
+
+        # The predicate is false for all elements
+        self.assertEqual(
+            0, transfer("FILTER isNEG", [transfer("MAP SQR", [xs])]).max_length)
+
+    def test_analyze(self):
+        SORT = Function("SORT", Signature([Type.IntList], Type.IntList))
+        MAP_INC = Function("MAP INC", Signature([Type.IntList], Type.IntList))
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        p = Program([Variable(0, Type.Int), Variable(1, Type.IntList)], [
+            Statement(Variable(2, Type.IntList), Expression(
+                SORT, [Variable(1, Type.IntList)])),
+            Statement(Variable(3, Type.IntList), Expression(
+                MAP_INC, [Variable(2, Type.IntList)])),
+            Statement(Variable(4, Type.IntList), Expression(
+                TAKE, [Variable(0, Type.Int), Variable(3, Type.IntList)])),
+        ])
+        facts = analyze(p, 10, 5)
+        self.assertEqual(Facts(-10, 10), facts[Variable(0, Type.Int)])
+        self.assertEqual(Facts(-9, 11, 0, 5, True),
+                         facts[Variable(4, Type.IntList)])
+
+    def test_analyze_is_sound(self):
+        LINQ, _ = generate_io_samples.get_language(10)
+        functions = [to_function(f) for f in LINQ]
+        rng = np.random.RandomState(0)
+        for p in programs(functions, 1, 2):
+            examples = [[int(rng.randint(-10, 11)) if v.t == Type.Int else
+                         list(map(int, rng.randint(-10, 11, size=rng.randint(0, 6))))
+                         for v in p.inputs] for _ in range(20)]
+            values = execute_statements(
+                p, inputs_to_batch(examples, [v.t for v in p.inputs]), 10)
+            for v, facts in analyze(p, 10, 5).items():
+                for x in from_batch(values[v]):
+                    if v.t == Type.Int:
+                        self.assertTrue(facts.minimum <= x <= facts.maximum)
+                        continue
+                    self.assertTrue(
+                        facts.min_length <= len(x) <= facts.max_length)
+                    self.assertTrue(
+                        all([facts.minimum <= e <= facts.maximum for e in x]))
+                    if facts.sorted:
+                        self.assertEqual(sorted(x), x)
+
+    def test_may_produce_valid_output(self):
+        MAP_SQR = Function("MAP SQR", Signature([Type.IntList], Type.IntList))
+        FILTER_NEG = Function("FILTER isNEG", Signature(
+            [Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        p = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.IntList), Expression(
+                MAP_SQR, [Variable(0, Type.IntList)])),
+            Statement(Variable(2, Type.IntList), Expression(
+                FILTER_NEG, [Variable(1, Type.IntList)])),
+        ])
+        # The empty list is in the range
+        self.assertTrue(may_produce_valid_output(p, 10, 5))
+
+        # The output is always Null
+        p.body.append(Statement(Variable(3, Type.Int), Expression(
+            HEAD, [Variable(2, Type.IntList)])))
+        self.assertFalse(may_produce_valid_output(p, 10, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
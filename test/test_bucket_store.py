@@ -0,0 +1,58 @@
+import unittest
+import os
+import tempfile
+
+from src.dsl import Function, Type, Variable, Expression, Program, Signature, Statement
+from src.dataset import Example
+from src.compact_program import FunctionTable
+from src.bucket_store import BucketStore
+
+
+class Test_BucketStore(unittest.TestCase):
+    def test_spill(self):
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        p = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.Int), Expression(
+                HEAD, [Variable(0, Type.IntList)]))
+        ])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            buckets = BucketStore(FunctionTable([HEAD]), ["HEAD"], 100, tmpdir)
+            for i in range(10):
+                self.assertEqual(i // 2, buckets.append(
+                    i % 2, p, [Example([[i]], i)], {"HEAD": True}))
+            # The buckets are spilled to the files
+            self.assertNotEqual(0, buckets.num_spills)
+            self.assertEqual(2, len(os.listdir(tmpdir)))
+            # The table is not written to the files
+            self.assertFalse(any([b"HEAD" in open(os.path.join(tmpdir, name), "rb").read()
+                                  for name in os.listdir(tmpdir)]))
+            self.assertEqual([0, 1], buckets.keys())
+            self.assertEqual(5, buckets.size(1))
+
+            # The order of the entries is kept
+            store = buckets.pop(1)
+            self.assertEqual(5, len(store))
+            self.assertEqual([[Example([[i]], i)] for i in [1, 3, 5, 7, 9]],
+                             [store.examples(i) for i in range(5)])
+            self.assertEqual(p, store.program(4))
+            self.assertFalse(1 in buckets)
+            self.assertEqual(1, len(os.listdir(tmpdir)))
+
+            buckets.close()
+            self.assertEqual(0, len(os.listdir(tmpdir)))
+
+    def test_without_limit(self):
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        p = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.Int), Expression(
+                HEAD, [Variable(0, Type.IntList)]))
+        ])
+        buckets = BucketStore(FunctionTable([HEAD]), ["HEAD"])
+        for i in range(10):
+            buckets.append(0, p, [Example([[i]], i)], {"HEAD": True})
+        self.assertEqual(0, buckets.num_spills)
+        self.assertEqual(10, len(buckets.pop(0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from src.cache import LRUCache
+
+
+class Test_LRUCache(unittest.TestCase):
+    def test_get_and_put(self):
+        cache = LRUCache(2)
+        self.assertEqual(None, cache.get("a"))
+        cache.put("a", 0)
+        cache.put("b", 1)
+        self.assertEqual(0, cache.get("a"))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+        # "b" is the least recently used item
+        cache.put("c", 2)
+        self.assertEqual(2, len(cache))
+        self.assertFalse("b" in cache)
+        self.assertEqual(0, cache.get("a"))
+        self.assertEqual(2, cache.get("c"))
+        self.assertEqual(-1, cache.get("b", -1))
+
+    def test_peek(self):
+        cache = LRUCache(2)
+        cache.put("a", 0)
+        cache.put("b", 1)
+        self.assertEqual(0, cache.peek("a"))
+        self.assertEqual(0, cache.hits + cache.misses)
+        # peek does not mark the item as recently used
+        cache.put("c", 2)
+        self.assertFalse("a" in cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
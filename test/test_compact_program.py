@@ -0,0 +1,42 @@
+import unittest
+
+from src.dsl import Function, Type, Variable, Expression, Program, Signature, Statement
+from src.compact_program import FunctionTable, CompactProgram
+
+
+class Test_CompactProgram(unittest.TestCase):
+    def test_append(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        table = FunctionTable([TAKE, HEAD])
+        p = CompactProgram(table)
+        p1 = p.append(TAKE, [0, 1], [Type.Int, Type.IntList])
+        p2 = p1.append(HEAD, [2])
+        self.assertEqual(0, len(p))
+        self.assertEqual(1, len(p1))
+        self.assertEqual(2, len(p2))
+        self.assertEqual([Type.Int, Type.IntList], p2.input_types)
+        self.assertEqual(Type.Int, p2.variable_type(3))
+        self.assertEqual("a <- int\nb <- [int]\nc <- TAKE a b\nd <- HEAD c\n",
+                         p2.to_string())
+
+    def test_conversion(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        table = FunctionTable([TAKE, HEAD])
+        p = Program([Variable(0, Type.IntList), Variable(2, Type.IntList)], [
+            Statement(Variable(1, Type.Int), Expression(
+                HEAD, [Variable(0, Type.IntList)])),
+            Statement(Variable(3, Type.IntList), Expression(
+                TAKE, [Variable(1, Type.Int), Variable(2, Type.IntList)]))
+        ])
+        cp = CompactProgram.from_program(p, table)
+        self.assertEqual(p, cp.to_program())
+        self.assertEqual(p.to_string(), cp.to_string())
+        self.assertEqual(cp, CompactProgram.from_program(p, table))
+
+
+if __name__ == "__main__":
+    unittest.main()
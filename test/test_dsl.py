@@ -14,6 +14,33 @@ class Test_Program(unittest.TestCase):
                 F, [Variable(1, Type.Int), Variable(0, Type.Int)]))]
         ).to_string())
 
+    def test_fingerprint(self):
+        F = Function("FUNC", Signature([Type.Int], Type.IntList))
+        G = Function("GUNC", Signature([Type.Int], Type.IntList))
+
+        def program(f, arg):
+            return Program([Variable(0, Type.Int), Variable(1, Type.Int)],
+                           [Statement(Variable(2, Type.IntList), Expression(f, [Variable(arg, Type.Int)]))])
+        p = program(F, 0)
+        self.assertEqual(p.fingerprint(), program(F, 0).fingerprint())
+        self.assertEqual(p.fingerprint(), p.clone().fingerprint())
+        self.assertNotEqual(p.fingerprint(), program(F, 1).fingerprint())
+        self.assertNotEqual(p.fingerprint(), program(G, 0).fingerprint())
+        self.assertNotEqual(p.fingerprint(), Program(p.inputs, []).fingerprint())
+
+    def test_clone_does_not_copy_caches(self):
+        F = Function("FUNC", Signature([Type.Int], Type.IntList))
+        p = Program([Variable(0, Type.Int)], [Statement(
+            Variable(1, Type.IntList), Expression(F, [Variable(0, Type.Int)]))])
+        p.to_string()
+        p.fingerprint()
+        p_clone = p.clone()
+        p_clone.inputs[0].id = 1
+        p_clone.body[0].variable.id = 0
+        p_clone.body[0].expression.arguments[0].id = 1
+        self.assertEqual("b <- int\na <- FUNC b\n", p_clone.to_string())
+        self.assertNotEqual(p.fingerprint(), p_clone.fingerprint())
+
     def test_clone(self):
         F = Function("FUNC", Signature([Type.Int, Type.IntList], Type.IntList))
         a = Variable(0, Type.Int)
@@ -0,0 +1,85 @@
+import unittest
+import tempfile
+import pickle
+
+from src.deepcoder_utils import generate_io_samples
+from src.dsl import Function, Type, Signature, to_function
+from src.program_parser import parse
+from src.program_simplifier import normalize
+from src.generate_dataset import generate_dataset, DatasetSpec, EquivalenceCheckingSpec
+from src.egraph import EGraph, EGraphSimplifier
+
+
+class Test_egraph(unittest.TestCase):
+    def setUp(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        self.functions = list(map(to_function, LINQ))
+
+    def simplify(self, code, simplifier=None):
+        simplifier = simplifier or EGraphSimplifier(self.functions)
+        return normalize(simplifier(parse(code, self.functions))).to_string()
+
+    def test_egraph_merges_congruent_nodes(self):
+        SORT = Function("SORT", Signature([Type.IntList], Type.IntList))
+        egraph = EGraph()
+        a = egraph.add(("input", 0, Type.IntList))
+        b = egraph.add(("input", 1, Type.IntList))
+        sa = egraph.add(("call", SORT, (a,)))
+        sb = egraph.add(("call", SORT, (b,)))
+        self.assertNotEqual(egraph.find(sa), egraph.find(sb))
+        egraph.union(a, b)
+        egraph.rebuild()
+        self.assertEqual(egraph.find(sa), egraph.find(sb))
+
+    def test_simplify(self):
+        self.assertEqual("a <- [int]\nb <- MAXIMUM a\n", self.simplify(
+            "a <- [int]\nb <- SORT a\nc <- REVERSE b\nd <- HEAD c"))
+        self.assertEqual("a <- [int]\nb <- MAP INC a\nc <- ZIPWITH + b b\n", self.simplify(
+            "a <- [int]\nb <- MAP INC a\nc <- MAP INC a\nd <- ZIPWITH + b c"))
+        self.assertEqual("a <- [int]\nb <- COUNT isPOS a\n", self.simplify(
+            "a <- [int]\nb <- REVERSE a\nc <- FILTER isPOS b\nd <- FILTER isPOS c\ne <- COUNT isPOS d"))
+
+    def test_equivalent_programs_have_same_canonical_form(self):
+        self.assertEqual(
+            self.simplify("a <- [int]\nb <- SORT a\nc <- SORT b\nd <- HEAD c"),
+            self.simplify("a <- [int]\nb <- REVERSE a\nc <- MINIMUM b"))
+
+    def test_output_is_defined_by_statement(self):
+        # REVERSE (REVERSE a) is equivalent to the input
+        self.assertEqual("a <- [int]\nb <- REVERSE a\nc <- REVERSE b\n", self.simplify(
+            "a <- [int]\nb <- REVERSE a\nc <- REVERSE b"))
+
+    def test_budget(self):
+        simplifier = EGraphSimplifier(self.functions, max_iterations=0)
+        self.assertEqual("a <- [int]\nb <- SORT a\nc <- SORT b\n", self.simplify(
+            "a <- [int]\nb <- SORT a\nc <- SORT b", simplifier))
+        self.assertEqual(0, simplifier.num_saturated)
+        self.assertEqual(1, simplifier.num_programs)
+
+        # The timeout is opt-in
+        self.assertEqual(None, EGraphSimplifier(self.functions).timeout_seconds)
+        simplifier = EGraphSimplifier(self.functions, timeout_seconds=0.0)
+        self.simplify("a <- [int]\nb <- SORT a\nc <- SORT b", simplifier)
+        self.assertEqual(0, simplifier.num_saturated)
+
+    def test_generate_dataset_with_egraph_simplifier(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        SORT = [f for f in LINQ if f.src == "SORT"][0]
+        REVERSE = [f for f in LINQ if f.src == "REVERSE"][0]
+
+        with tempfile.NamedTemporaryFile() as f:
+            name = f.name
+            generate_dataset([SORT, REVERSE], DatasetSpec(50, 20, 5, 1, 2),
+                             EquivalenceCheckingSpec(1.0, 1, None), name,
+                             simplify=EGraphSimplifier([to_function(SORT), to_function(REVERSE)]))
+            srcs = set()
+            with open(name, "rb") as fp:
+                for entry, in pickle.load(fp).dataset:
+                    srcs.add(entry.source_code)
+            # SORT (SORT a) and SORT (REVERSE a) are simplified into SORT a
+            self.assertFalse("a <- [int]\nb <- SORT a\nc <- SORT b" in srcs)
+            self.assertFalse("a <- [int]\nb <- REVERSE a\nc <- SORT b" in srcs)
+
+
+if __name__ == "__main__":
+    unittest.main()
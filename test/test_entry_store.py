@@ -0,0 +1,40 @@
+import unittest
+
+from src.dsl import Function, Type, Variable, Expression, Program, Signature, Statement
+from src.dataset import Example, Entry
+from src.compact_program import FunctionTable
+from src.entry_store import EntryStore
+
+
+class Test_EntryStore(unittest.TestCase):
+    def test_append(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        store = EntryStore(FunctionTable([TAKE, HEAD]), ["TAKE", "HEAD"])
+        p1 = Program([Variable(0, Type.Int), Variable(1, Type.IntList)], [
+            Statement(Variable(2, Type.IntList), Expression(
+                TAKE, [Variable(0, Type.Int), Variable(1, Type.IntList)]))
+        ])
+        p2 = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.Int), Expression(
+                HEAD, [Variable(0, Type.IntList)]))
+        ])
+        examples1 = [Example([1, [3, 4]], [3]), Example([0, []], [])]
+        examples2 = [Example([[-1, 2]], -1)]
+        self.assertEqual(0, store.append(p1, examples1, {"TAKE": True, "HEAD": False}))
+        self.assertEqual(1, store.append(p2, examples2, {"TAKE": False, "HEAD": True}))
+        self.assertEqual(2, len(store))
+
+        self.assertEqual(p1, store.program(0))
+        self.assertEqual(p2, store.program(1))
+        self.assertEqual(p1.to_string()[:-1], store.source_code(0))
+        self.assertEqual(examples1, store.examples(0))
+        self.assertEqual(examples2, store.examples(1))
+        self.assertEqual({"TAKE": False, "HEAD": True}, store.attribute(1))
+        self.assertEqual(Entry("a <- [int]\nb <- HEAD a", examples2, {"TAKE": False, "HEAD": True}),
+                         store.entry(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
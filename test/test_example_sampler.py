@@ -0,0 +1,111 @@
+import unittest
+import numpy as np
+
+from src.deepcoder_utils import generate_io_samples
+from src.dsl import Function, Type, Variable, Expression, Program, Signature, Statement, to_function
+from src.interpreter import execute_statements, inputs_to_batch, from_batch
+from src.program_generator import programs
+from src.example_sampler import preimage, input_intervals, ExampleSampler
+from src.abstract_interpretation import may_produce_valid_output
+
+
+class Test_example_sampler(unittest.TestCase):
+    def test_preimage(self):
+        self.assertEqual([(-5, 4)], preimage("MAP SHL", (-10, 9), 5))
+        self.assertEqual([(-3, 3)], preimage("MAP SQR", (-10, 9), 5))
+        self.assertEqual([(-2, 1)], preimage("SUM", (-10, 9), 5))
+        self.assertEqual([(-5, 4), (-4, 5)], preimage("ZIPWITH -", (-10, 9), 5))
+        self.assertEqual([(-1, 1)], preimage("SCANL1 *", (-10, 9), 5))
+        self.assertEqual([None, (-10, 9)], preimage("TAKE", (-10, 9), 5))
+        self.assertEqual([None], preimage("COUNT isPOS", (-10, 9), 5))
+
+    def test_input_intervals(self):
+        MAP_MUL4 = Function("MAP MUL4", Signature([Type.IntList], Type.IntList))
+        ZIPWITH_PLUS = Function("ZIPWITH +", Signature(
+            [Type.IntList, Type.IntList], Type.IntList))
+        p = Program([Variable(0, Type.IntList), Variable(1, Type.IntList)], [
+            Statement(Variable(2, Type.IntList), Expression(
+                MAP_MUL4, [Variable(0, Type.IntList)])),
+            Statement(Variable(3, Type.IntList), Expression(
+                ZIPWITH_PLUS, [Variable(2, Type.IntList), Variable(1, Type.IntList)])),
+        ])
+        self.assertEqual({Variable(0, Type.IntList): (-12, 12), Variable(1, Type.IntList): (-50, 49)},
+                         input_intervals(p, 100, 5))
+
+    def test_sample(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        functions = [to_function(f) for f in LINQ]
+        sampler = ExampleSampler(50, 5, rng=np.random.RandomState(0))
+        for p in programs(functions, 1, 2):
+            num_fallbacks = sampler.num_fallbacks
+            num_failures = sampler.num_failures
+            examples = sampler.sample(p, 5)
+            if p.body[-1].expression.function.name in ["HEAD", "LAST", "MINIMUM", "MAXIMUM", "ACCESS"]:
+                # The examples whose outputs are Null are rejected
+                if examples is None:
+                    continue
+            else:
+                # The propagation is precise enough for these parameters
+                self.assertEqual(num_fallbacks, sampler.num_fallbacks)
+                self.assertEqual(num_failures, sampler.num_failures)
+            self.assertEqual(5, len(examples))
+            values = execute_statements(
+                p, inputs_to_batch([example.inputs for example in examples],
+                                   [v.t for v in p.inputs]), 50)
+            self.assertEqual([example.output for example in examples],
+                             from_batch(values[p.body[-1].variable]))
+            # All values except Null are in the range, and the output is not Null
+            for v, value in values.items():
+                for x in from_batch(value):
+                    if v.t == Type.Int:
+                        self.assertTrue(-50 <= x <= 50)
+                    else:
+                        self.assertTrue(all([-50 <= e < 50 for e in x]))
+            for example in examples:
+                if p.body[-1].variable.t == Type.Int:
+                    self.assertTrue(-50 <= example.output < 50)
+
+    def test_nullable_output(self):
+        MAP_SQR = Function("MAP SQR", Signature([Type.IntList], Type.IntList))
+        FILTER_NEG = Function("FILTER isNEG", Signature([Type.IntList], Type.IntList))
+        FILTER_POS = Function("FILTER isPOS", Signature([Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+
+        def program(f):
+            return Program([Variable(0, Type.IntList)], [
+                Statement(Variable(1, Type.IntList), Expression(
+                    MAP_SQR, [Variable(0, Type.IntList)])),
+                Statement(Variable(2, Type.IntList), Expression(
+                    f, [Variable(1, Type.IntList)])),
+                Statement(Variable(3, Type.Int), Expression(
+                    HEAD, [Variable(2, Type.IntList)])),
+            ])
+
+        # The output is always Null, so both the sampler and the abstract interpretation reject the program
+        sampler = ExampleSampler(50, 5, rng=np.random.RandomState(0))
+        self.assertFalse(may_produce_valid_output(program(FILTER_NEG), 50, 5))
+        self.assertIsNone(sampler.sample(program(FILTER_NEG), 5))
+        self.assertEqual(1, sampler.num_failures)
+
+        # The output may be Null, and the examples whose outputs are Null are rejected
+        self.assertTrue(may_produce_valid_output(program(FILTER_POS), 50, 5))
+        examples = sampler.sample(program(FILTER_POS), 5)
+        self.assertEqual(5, len(examples))
+        self.assertTrue(all([0 <= example.output < 50 for example in examples]))
+
+    def test_fallback_to_rejection(self):
+        COUNT = Function("COUNT isPOS", Signature([Type.IntList], Type.Int))
+        p = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.Int), Expression(
+                COUNT, [Variable(0, Type.IntList)])),
+        ])
+        # COUNT may be out of the range if the list is long
+        sampler = ExampleSampler(3, 10, max_attempts=100, rng=np.random.RandomState(0))
+        examples = sampler.sample(p, 5)
+        self.assertTrue(all([example.output < 3 for example in examples]))
+        self.assertEqual(1, sampler.num_fallbacks)
+        self.assertEqual(1.0, sampler.fallback_rate)
+
+
+if __name__ == "__main__":
+    unittest.main()
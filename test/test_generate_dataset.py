@@ -2,12 +2,21 @@ import unittest
 import tempfile
 import pickle
 import os
+import random
 import numpy as np
+from unittest import mock
 from src.deepcoder_utils import generate_io_samples
-from src.dsl import Function, Type, Variable, Expression, Program
+from src.dsl import Function, Type, Variable, Expression, Program, to_function
 from src.dataset import DatasetMetadata
 from src.generate_dataset import generate_dataset, DatasetSpec, EquivalenceCheckingSpec, IteratorDecorator
-from src.program_simplifier import remove_redundant_variables
+from src.generate_dataset import _equivalence_classes
+from src.program_simplifier import remove_redundant_variables, remove_redundant_variables_in_place, Pipeline
+from src.program_generator import programs, RandomProgramSampler
+from src.checkpoint import Checkpoint
+from src.cache import ProgramCache
+from src.sharded_dataset import ShardedDataset
+from src.example_sampler import ExampleSampler
+from src.membership import ExactSet, BloomFilter
 
 
 class Test_generate_dataset(unittest.TestCase):
@@ -74,6 +83,230 @@ class Test_generate_dataset(unittest.TestCase):
             self.assertEqual(DatasetMetadata(
                 3, set(["TAKE", "HEAD"]), 50, 20), metadata)
 
+    def test_generate_dataset_with_pipeline(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        HEAD = [f for f in LINQ if f.src == "HEAD"][0]
+        TAKE = [f for f in LINQ if f.src == "TAKE"][0]
+
+        with tempfile.NamedTemporaryFile() as f:
+            name = f.name
+            generate_dataset([HEAD, TAKE], DatasetSpec(
+                50, 20, 5, 2, 2), EquivalenceCheckingSpec(1.0, 1, None), name,
+                simplify=Pipeline([remove_redundant_variables_in_place]))
+
+            srcs = set()
+            with open(name, "rb") as fp:
+                for entry, in pickle.load(fp).dataset:
+                    srcs.add(entry.source_code)
+            self.assertEqual(set([
+                "a <- [int]\nb <- HEAD a\nc <- TAKE b a",
+                "a <- int\nb <- [int]\nc <- TAKE a b\nd <- TAKE a c",
+                "a <- int\nb <- [int]\nc <- int\nd <- TAKE a b\ne <- TAKE c d",
+                "a <- int\nb <- [int]\nc <- TAKE a b\nd <- HEAD c",
+                "a <- [int]\nb <- [int]\nc <- HEAD a\nd <- TAKE c b"
+            ]), srcs)
+
+    def test_generate_dataset_with_cache(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        HEAD = [f for f in LINQ if f.src == "HEAD"][0]
+        TAKE = [f for f in LINQ if f.src == "TAKE"][0]
+
+        cache = ProgramCache(100, 100)
+        with tempfile.NamedTemporaryFile() as f:
+            name = f.name
+            generate_dataset([HEAD, TAKE], DatasetSpec(
+                50, 20, 5, 2, 2), EquivalenceCheckingSpec(1.0, 1, None), name,
+                simplify=remove_redundant_variables, cache=cache)
+
+            srcs = set()
+            with open(name, "rb") as fp:
+                for entry, in pickle.load(fp).dataset:
+                    srcs.add(entry.source_code)
+            self.assertEqual(set([
+                "a <- [int]\nb <- HEAD a\nc <- TAKE b a",
+                "a <- int\nb <- [int]\nc <- TAKE a b\nd <- TAKE a c",
+                "a <- int\nb <- [int]\nc <- int\nd <- TAKE a b\ne <- TAKE c d",
+                "a <- int\nb <- [int]\nc <- TAKE a b\nd <- HEAD c",
+                "a <- [int]\nb <- [int]\nc <- HEAD a\nd <- TAKE c b"
+            ]), srcs)
+        # Each program is enumerated only once
+        self.assertEqual(0, cache.simplified.hits)
+        self.assertEqual(len(cache.simplified), cache.simplified.misses)
+        self.assertEqual(len(cache.compiled), cache.compiled.misses)
+
+        # Each raw program is enumerated twice
+        repeat = IteratorDecorator(lambda ps: (p for program in ps for p in [program, program]),
+                                   lambda x: x)
+        cache = ProgramCache(100, 100)
+        with tempfile.NamedTemporaryFile() as f, \
+                mock.patch.object(generate_io_samples, "compile",
+                                  wraps=generate_io_samples.compile) as compile:
+            name = f.name
+            generate_dataset([HEAD, TAKE], DatasetSpec(
+                50, 20, 5, 2, 2), EquivalenceCheckingSpec(1.0, 1, None), name,
+                simplify=remove_redundant_variables, decorator=repeat, cache=cache)
+
+            with open(name, "rb") as fp:
+                self.assertEqual(srcs, set([entry.source_code for entry, in pickle.load(fp).dataset]))
+        # The repeated programs are not simplified and compiled again
+        self.assertEqual(len(cache.simplified), cache.simplified.misses)
+        self.assertEqual(cache.simplified.misses, cache.simplified.hits)
+        self.assertEqual(len(cache.compiled), cache.compiled.misses)
+        self.assertEqual(cache.compiled.misses, compile.call_count)
+
+    def test_generate_dataset_to_shards(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        HEAD = [f for f in LINQ if f.src == "HEAD"][0]
+        TAKE = [f for f in LINQ if f.src == "TAKE"][0]
+
+        for num_dataset in [None, 3]:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                np.random.seed(0)
+                generate_dataset([HEAD, TAKE], DatasetSpec(
+                    50, 20, 5, 1, 2), EquivalenceCheckingSpec(1.0, 1, None), os.path.join(tmpdir, "dataset"),
+                    num_dataset, simplify=remove_redundant_variables)
+                with open(os.path.join(tmpdir, "dataset"), "rb") as fp:
+                    expected = pickle.load(fp)
+
+                np.random.seed(0)
+                generate_dataset([HEAD, TAKE], DatasetSpec(
+                    50, 20, 5, 1, 2), EquivalenceCheckingSpec(1.0, 1, None), os.path.join(tmpdir, "shards"),
+                    num_dataset, simplify=remove_redundant_variables, max_shard_bytes=1000)
+                dataset = ShardedDataset(os.path.join(tmpdir, "shards"))
+                self.assertEqual(expected.metadata, dataset.metadata)
+                self.assertEqual(set([entry.source_code for entry, in expected.dataset]),
+                                 set([entry.source_code for entry, in dataset]))
+
+    def test_generate_dataset_to_shards_keeps_partial_output(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        HEAD = [f for f in LINQ if f.src == "HEAD"][0]
+        TAKE = [f for f in LINQ if f.src == "TAKE"][0]
+
+        def crash(programs):
+            for i, program in enumerate(programs):
+                if i == 100:
+                    raise RuntimeError("crash")
+                yield program
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            np.random.seed(0)
+            with self.assertRaises(RuntimeError):
+                generate_dataset([HEAD, TAKE], DatasetSpec(
+                    50, 20, 5, 1, 2), EquivalenceCheckingSpec(1.0, 1, None), tmpdir, 100,
+                    simplify=remove_redundant_variables, decorator=IteratorDecorator(crash, lambda x: x),
+                    max_shard_bytes=1)
+            # The entries of the shortest programs are written as soon as they are found
+            dataset = ShardedDataset(tmpdir)
+            self.assertFalse(dataset.complete)
+            self.assertNotEqual(0, len(dataset))
+            for entry, in dataset:
+                body = [line for line in entry.source_code.split("\n")
+                        if not line.split(" <- ")[1] in ["int", "[int]"]]
+                self.assertEqual(1, len(body))
+
+    def test_equivalence_classes_do_not_depend_on_phases(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        functions = [to_function(f) for f in LINQ
+                     if f.src in ["HEAD", "LAST", "SORT", "REVERSE", "MAXIMUM", "MAP INC"]]
+        ps = [p for p in programs(functions, 1, 2)
+              if [v.t for v in p.inputs] == [Type.IntList] and p.body[-1].variable.t == Type.Int]
+        rng = np.random.RandomState(0)
+        examples = [[list(map(int, rng.randint(-50, 50, size=rng.randint(0, 5))))]
+                    for _ in range(10)]
+        expected = _equivalence_classes(ps, examples, [Type.IntList], 50, len(examples))
+        self.assertTrue(len(expected) < len(ps))
+        for num_first in [0, 1, 3]:
+            self.assertEqual(expected, _equivalence_classes(
+                ps, examples, [Type.IntList], 50, num_first))
+
+    def test_generate_dataset_with_spilled_entries(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        functions = [f for f in LINQ if f.src in ["HEAD", "TAKE", "SORT", "SUM"]]
+
+        def generate(max_memory_bytes):
+            np.random.seed(0)
+            random.seed(0)
+            with tempfile.NamedTemporaryFile() as f, tempfile.TemporaryDirectory() as tmpdir:
+                name = f.name
+                generate_dataset(functions, DatasetSpec(
+                    50, 20, 5, 1, 2), EquivalenceCheckingSpec(1.0, 1, np.random.RandomState(0)),
+                    name, simplify=remove_redundant_variables,
+                    max_memory_bytes=max_memory_bytes, spill_directory=tmpdir)
+                # The spilled files are removed
+                self.assertEqual([], os.listdir(tmpdir))
+                with open(name, "rb") as fp:
+                    return [entry for entry, in pickle.load(fp).dataset]
+
+        self.assertEqual(generate(None), generate(1024))
+
+    def test_generate_dataset_with_bloom_filters(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        functions = [f for f in LINQ if f.src in ["HEAD", "TAKE", "SORT", "SUM"]]
+
+        def generate(invalid_programs, seen_programs):
+            np.random.seed(0)
+            random.seed(0)
+            with tempfile.NamedTemporaryFile() as f:
+                name = f.name
+                generate_dataset(functions, DatasetSpec(
+                    50, 20, 5, 1, 2), EquivalenceCheckingSpec(1.0, 1, np.random.RandomState(0)),
+                    name, simplify=remove_redundant_variables,
+                    invalid_programs=invalid_programs, seen_programs=seen_programs)
+                with open(name, "rb") as fp:
+                    return [entry for entry, in pickle.load(fp).dataset]
+
+        invalid_programs = BloomFilter(10000, 1e-6)
+        seen_programs = BloomFilter(10000, 1e-6)
+        self.assertEqual(generate(None, None), generate(invalid_programs, seen_programs))
+        self.assertNotEqual(0, len(seen_programs))
+        self.assertNotEqual(0, invalid_programs.lookups)
+        # The duplicates are detected by the filter
+        self.assertNotEqual(0, seen_programs.hits)
+
+    def test_generate_dataset_with_example_sampler(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        HEAD = [f for f in LINQ if f.src == "HEAD"][0]
+        TAKE = [f for f in LINQ if f.src == "TAKE"][0]
+        SUM = [f for f in LINQ if f.src == "SUM"][0]
+
+        sampler = ExampleSampler(50, 5, rng=np.random.RandomState(0))
+        with tempfile.NamedTemporaryFile() as f:
+            name = f.name
+            generate_dataset([HEAD, TAKE, SUM], DatasetSpec(
+                50, 20, 5, 1, 2), EquivalenceCheckingSpec(1.0, 1, None), name,
+                simplify=remove_redundant_variables, example_sampler=sampler)
+
+            with open(name, "rb") as fp:
+                d = pickle.load(fp)
+            self.assertNotEqual(0, len(d.dataset))
+            for entry, in d.dataset:
+                self.assertEqual(5, len(entry.examples))
+                for example in entry.examples:
+                    self.assertTrue(-50 <= example.output <= 50 if isinstance(example.output, int)
+                                    else all([-50 <= x < 50 for x in example.output]))
+        self.assertEqual(0, sampler.num_failures)
+
+    def test_generate_dataset_with_probes(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        functions = [f for f in LINQ if f.src in ["HEAD", "LAST", "SORT", "REVERSE"]]
+
+        def generate(num_of_probes):
+            with tempfile.NamedTemporaryFile() as f:
+                name = f.name
+                np.random.seed(0)
+                generate_dataset(functions, DatasetSpec(
+                    50, 20, 5, 1, 2), EquivalenceCheckingSpec(1.0, 1, np.random.RandomState(0),
+                                                              num_of_probes=num_of_probes),
+                    name, simplify=remove_redundant_variables)
+                with open(name, "rb") as fp:
+                    return set([entry.source_code for entry, in pickle.load(fp).dataset])
+
+        # The probes do not change the equivalence classes
+        dataset = generate(10)
+        self.assertEqual(generate(0), dataset)
+        self.assertIn("a <- [int]\nb <- SORT a\nc <- HEAD b", dataset)
+        self.assertIn("a <- [int]\nb <- SORT a\nc <- LAST b", dataset)
+
     def test_generate_dataset_can_relax_equivalence_checking(self):
         LINQ, _ = generate_io_samples.get_language(50)
         HEAD = [f for f in LINQ if f.src == "HEAD"][0]
@@ -129,6 +362,70 @@ class Test_generate_dataset(unittest.TestCase):
             self.assertEqual(2, len(program.items))
             self.assertEqual(1, len(entries.items))
 
+    def test_generate_dataset_gives_number_of_programs_to_decorator(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        HEAD = [f for f in LINQ if f.src == "HEAD"][0]
+        LAST = [f for f in LINQ if f.src == "LAST"][0]
+
+        lengths = []
+
+        def program_decorator(generator):
+            lengths.append(len(generator))
+            return generator
+        decorator = IteratorDecorator(program_decorator, lambda x: x)
+
+        with tempfile.NamedTemporaryFile() as f:
+            name = f.name
+            generate_dataset([HEAD, LAST], DatasetSpec(
+                50, 20, 5, 1, 2), EquivalenceCheckingSpec(1, 1, None), name, decorator=decorator)
+            self.assertEqual([10], lengths)
+
+    def test_generate_dataset_resume_from_checkpoint(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        HEAD = [f for f in LINQ if f.src == "HEAD"][0]
+        LAST = [f for f in LINQ if f.src == "LAST"][0]
+        spec = DatasetSpec(50, 20, 5, 1, 2)
+
+        def load(name):
+            with open(name, "rb") as fp:
+                return set([entry.source_code for entry, in pickle.load(fp).dataset])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            name = os.path.join(tmpdir, "dataset")
+            np.random.seed(0)
+            generate_dataset([HEAD, LAST], spec, EquivalenceCheckingSpec(1.0, 1, None), name)
+            expected = load(name)
+
+            class Interrupt(Exception):
+                pass
+
+            def interrupt(generator):
+                for i, program in enumerate(generator):
+                    if i == 5:
+                        raise Interrupt()
+                    yield program
+            checkpoint_dir = os.path.join(tmpdir, "checkpoint")
+            with self.assertRaises(Interrupt):
+                generate_dataset([HEAD, LAST], spec, EquivalenceCheckingSpec(1.0, 1, None), name,
+                                 decorator=IteratorDecorator(interrupt, lambda x: x),
+                                 checkpoint=Checkpoint(checkpoint_dir, 2))
+
+            # Resume the enumeration
+            resumed = []
+
+            def record(generator):
+                for program in generator:
+                    resumed.append(program)
+                    yield program
+            np.random.seed(0)
+            generate_dataset([HEAD, LAST], spec, EquivalenceCheckingSpec(1.0, 1, None), name,
+                             decorator=IteratorDecorator(record, lambda x: x),
+                             checkpoint=Checkpoint(checkpoint_dir, 2))
+            self.assertEqual(expected, load(name))
+            # The last checkpoint is saved after 4 programs
+            n = len(list(programs([to_function(HEAD), to_function(LAST)], 1, 2)))
+            self.assertEqual(n - 4, len(resumed))
+
     def test_generate_dataset_separate_higher_order_function_and_lambda(self):
         LINQ, _ = generate_io_samples.get_language(50)
         HEAD = [f for f in LINQ if f.src == "HEAD"][0]
@@ -174,5 +471,82 @@ class Test_generate_dataset(unittest.TestCase):
             self.assertEqual(2, len(dataset))
             self.assertTrue(dataset[0][0].source_code != dataset[1][0].source_code)
 
+    def test_generate_dataset_with_multiple_processes(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        functions = [f for f in LINQ if f.src in ["HEAD", "LAST", "SORT", "TAKE"]]
+
+        def generate(num_dataset, n_processes, use_sampler=False):
+            sampled = []
+
+            def record(programs):
+                for program in programs:
+                    sampled.append(program.to_string())
+                    yield program
+
+            with tempfile.NamedTemporaryFile() as f:
+                name = f.name
+                np.random.seed(0)
+                random.seed(0)
+                sampler = None
+                if use_sampler:
+                    sampler = RandomProgramSampler([to_function(f) for f in functions], 1, 2,
+                                                   rng=np.random.RandomState(0), batch_size=1)
+                generate_dataset(functions, DatasetSpec(
+                    50, 20, 5, 1, 2), EquivalenceCheckingSpec(1.0, 1, None), name, num_dataset,
+                    simplify=remove_redundant_variables, sampler=sampler, n_processes=n_processes,
+                    decorator=IteratorDecorator(record, lambda x: x))
+                with open(name, "rb") as fp:
+                    return [(entry.source_code, entry.examples) for entry, in pickle.load(fp).dataset], sampled
+
+        for num_dataset, use_sampler in [(None, False), (5, False), (10, True)]:
+            serial, serial_sampled = generate(num_dataset, None, use_sampler)
+            self.assertEqual(serial, generate(num_dataset, 1, use_sampler)[0])
+            parallel, parallel_sampled = generate(num_dataset, 2, use_sampler)
+            self.assertEqual(parallel, generate(num_dataset, 3, use_sampler)[0])
+            self.assertEqual(len(serial), len(parallel))
+            if num_dataset is None:
+                self.assertEqual(set([src for src, _ in serial]), set([src for src, _ in parallel]))
+            if use_sampler:
+                # The programs are prefetched, but the sampler is updated in the same order
+                n = min(len(serial_sampled), len(parallel_sampled))
+                self.assertEqual(serial_sampled[:n], parallel_sampled[:n])
+
+        # The programs that are sampled again after they are pruned are not regarded as invalid
+        invalid_programs = ExactSet()
+        with tempfile.NamedTemporaryFile() as f:
+            np.random.seed(0)
+            random.seed(0)
+            generate_dataset(functions, DatasetSpec(50, 20, 5, 1, 2),
+                             EquivalenceCheckingSpec(1.0, 1, None), f.name, 14,
+                             simplify=remove_redundant_variables, n_processes=2,
+                             invalid_programs=invalid_programs)
+        self.assertEqual(0, len(invalid_programs))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self.assertRaises(RuntimeError):
+                generate_dataset(functions, DatasetSpec(50, 20, 5, 1, 2),
+                                 EquivalenceCheckingSpec(1.0, 1, None), os.path.join(tmpdir, "dataset"),
+                                 checkpoint=Checkpoint(tmpdir), n_processes=2)
+
+    def test_generate_dataset_with_sampler(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        HEAD = [f for f in LINQ if f.src == "HEAD"][0]
+        LAST = [f for f in LINQ if f.src == "LAST"][0]
+        MAXIMUM = [f for f in LINQ if f.src == "MAXIMUM"][0]
+        sampler = RandomProgramSampler(
+            [to_function(f) for f in [HEAD, LAST, MAXIMUM]], 1, 1, rng=np.random.RandomState(0), batch_size=10)
+
+        with tempfile.NamedTemporaryFile() as f:
+            name = f.name
+            np.random.seed(0)
+            generate_dataset([HEAD, LAST, MAXIMUM], DatasetSpec(
+                50, 20, 5, 1, 1), EquivalenceCheckingSpec(1, 1, None), name, 2, sampler=sampler)
+            with open(name, "rb") as fp:
+                d = pickle.load(fp)
+                dataset = d.dataset
+            self.assertEqual(2, len(dataset))
+            self.assertTrue(sampler.statistics.num_observed >= 2)
+
+
 if __name__ == "__main__":
     unittest.main()
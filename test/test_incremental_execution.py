@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+
+from src.deepcoder_utils import generate_io_samples
+from src.dsl import Type, to_function
+from src.interpreter import output_key, from_batch
+from src.program_generator import ProgramEnumerator
+from src.program_simplifier import normalize, remove_redundant_variables
+from src.incremental_execution import ProbeInputs, IncrementalExecutor
+
+
+class Test_incremental_execution(unittest.TestCase):
+    def test_probe_inputs(self):
+        probes = ProbeInputs(10, 50, 5, np.random.RandomState(0))
+        x = probes.value(Type.IntList, 0)
+        self.assertTrue(all([1 <= len(l) <= 5 for l in from_batch(x)]))
+        self.assertTrue(all([-50 <= e < 50 for l in from_batch(x) for e in l]))
+        self.assertTrue(all([-5 <= n <= 5 for n in from_batch(probes.value(Type.Int, 0))]))
+        # The values are fixed
+        self.assertIs(x, probes.inputs([Type.Int, Type.IntList])[1])
+        self.assertIsNot(x, probes.inputs([Type.IntList, Type.IntList])[1])
+
+    def test_incremental_execution(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        functions = [to_function(f) for f in LINQ
+                     if f.src in ["HEAD", "TAKE", "SORT", "MAP INC", "ZIPWITH +"]]
+        executor = IncrementalExecutor(
+            ProbeInputs(10, 50, 5, np.random.RandomState(0)), 50)
+        enumerator = ProgramEnumerator(functions, 1, 3)
+        n = 0
+        for program in enumerator:
+            n += 1
+            output = executor.output(enumerator.frame)
+            # Same as the normalized program executed from scratch
+            expected = IncrementalExecutor(executor.probes, 50).execute(normalize(program))
+            self.assertEqual(output_key(expected), output_key(output))
+            simplified = remove_redundant_variables(program)
+            if len(simplified.inputs) == len(program.inputs):
+                self.assertEqual(output_key(output), output_key(
+                    IncrementalExecutor(executor.probes, 50).execute(simplified)))
+        # Each program evaluates only its last statement
+        self.assertEqual(n, executor.num_evaluated_statements)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+
+from src.dsl import Function, Type, Variable, Expression, Program, Signature, Statement
+from src.interpreter import execute, to_batch, from_batch, inputs_to_batch, output_key, equal_rows, IntListBatch, OVERFLOW
+
+
+class Test_interpreter(unittest.TestCase):
+    def test_to_batch(self):
+        self.assertEqual([1, -2], from_batch(to_batch([1, -2], Type.Int)))
+        batch = to_batch([[1, 2, 3], []], Type.IntList)
+        self.assertEqual([3, 0], list(batch.lengths))
+        self.assertEqual((2, 3), batch.values.shape)
+        self.assertEqual([[1, 2, 3], []], from_batch(batch))
+
+    def test_list_functions(self):
+        def run(name, inputs, types, output_type):
+            F = Function(name, Signature(types, output_type))
+            args = [Variable(i, t) for i, t in enumerate(types)]
+            p = Program(args, [Statement(
+                Variable(len(types), output_type), Expression(F, args))])
+            return from_batch(execute(p, inputs_to_batch(inputs, types), 256))
+
+        xs = [[[3, -1, 2]], [[]], [[5]]]
+        self.assertEqual([[2, -1, 3], [], [5]],
+                         run("REVERSE", xs, [Type.IntList], Type.IntList))
+        self.assertEqual([[-1, 2, 3], [], [5]],
+                         run("SORT", xs, [Type.IntList], Type.IntList))
+        self.assertEqual([3, 256, 5],
+                         run("HEAD", xs, [Type.IntList], Type.Int))
+        self.assertEqual([2, 256, 5],
+                         run("LAST", xs, [Type.IntList], Type.Int))
+        self.assertEqual([-1, 256, 5],
+                         run("MINIMUM", xs, [Type.IntList], Type.Int))
+        self.assertEqual([4, 0, 5],
+                         run("SUM", xs, [Type.IntList], Type.Int))
+        self.assertEqual([[4, 0, 3], [], [6]],
+                         run("MAP INC", xs, [Type.IntList], Type.IntList))
+        self.assertEqual([[3, 2], [], [5]],
+                         run("FILTER isPOS", xs, [Type.IntList], Type.IntList))
+        self.assertEqual([1, 0, 0],
+                         run("COUNT isNEG", xs, [Type.IntList], Type.Int))
+        self.assertEqual([[3, 2, 4], [], [5]],
+                         run("SCANL1 +", xs, [Type.IntList], Type.IntList))
+        self.assertEqual([[1, 0, -2]],
+                         run("MAP SHR", [[[3, 1, -5]]], [Type.IntList], Type.IntList))
+
+        nxs = [[1, [3, -1, 2]], [-1, [3, -1, 2]], [5, []]]
+        self.assertEqual([[3], [3, -1], []],
+                         run("TAKE", nxs, [Type.Int, Type.IntList], Type.IntList))
+        self.assertEqual([[-1, 2], [2], []],
+                         run("DROP", nxs, [Type.Int, Type.IntList], Type.IntList))
+        self.assertEqual([-1, 256, 256],
+                         run("ACCESS", nxs, [Type.Int, Type.IntList], Type.Int))
+
+        xys = [[[1, 2, 3], [4, 5]], [[], [1]]]
+        self.assertEqual([[4, 10], []],
+                         run("ZIPWITH *", xys, [Type.IntList, Type.IntList], Type.IntList))
+
+    def test_execute(self):
+        SORT = Function("SORT", Signature([Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        a = Variable(0, Type.IntList)
+        b = Variable(1, Type.IntList)
+        c = Variable(2, Type.Int)
+        d = Variable(3, Type.IntList)
+        p = Program([a], [Statement(b, Expression(SORT, [a])), Statement(
+            c, Expression(HEAD, [b])), Statement(d, Expression(TAKE, [c, a]))])
+        output = execute(p, inputs_to_batch(
+            [[[3, 1, 2]], [[0, 5]]], [Type.IntList]), 256)
+        self.assertEqual([[3], []], from_batch(output))
+
+    def test_overflow(self):
+        SCANL1_MUL = Function("SCANL1 *", Signature([Type.IntList], Type.IntList))
+        COUNT_ODD = Function("COUNT isODD", Signature([Type.IntList], Type.Int))
+        a = Variable(0, Type.IntList)
+        b = Variable(1, Type.IntList)
+        c = Variable(2, Type.Int)
+        p = Program([a], [Statement(b, Expression(SCANL1_MUL, [a])),
+                          Statement(c, Expression(COUNT_ODD, [b]))])
+        inputs = inputs_to_batch([[[3, 5, 7]], [[255] * 20]], [Type.IntList])
+        # 255 ** 20 exceeds 64-bit integers
+        self.assertEqual([[3, 15, 105], [OVERFLOW]], from_batch(
+            execute(Program([a], p.body[:1]), inputs, 256)))
+        # The overflow propagates even if the output is small
+        self.assertEqual([3, OVERFLOW], from_batch(execute(p, inputs, 256)))
+
+    def test_output_key(self):
+        x = IntListBatch(np.array([[1, 2, 0]]), np.array([2]))
+        y = IntListBatch(np.array([[1, 2]]), np.array([2]))
+        z = IntListBatch(np.array([[1, 2]]), np.array([1]))
+        self.assertEqual(output_key(x), output_key(y))
+        self.assertNotEqual(output_key(x), output_key(z))
+        self.assertEqual([True], list(equal_rows(x, y)))
+        self.assertEqual([False], list(equal_rows(x, z)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+
+from src.membership import ExactSet, BloomFilter
+
+
+class Test_membership(unittest.TestCase):
+    def test_exact_set(self):
+        s = ExactSet()
+        s.add(1)
+        self.assertTrue(1 in s)
+        self.assertFalse(2 in s)
+        self.assertEqual(1, len(s))
+        self.assertEqual(0.5, s.hit_rate)
+        self.assertNotEqual(0, s.nbytes)
+
+    def test_bloom_filter(self):
+        rng = np.random.RandomState(0)
+        keys = [int.from_bytes(rng.bytes(16), "little") for _ in range(2000)]
+        f = BloomFilter(1000, 0.01)
+        for key in keys[:1000]:
+            f.add(key)
+        # No false negatives
+        self.assertTrue(all([key in f for key in keys[:1000]]))
+        # The false positive rate is close to the specified value
+        false_positives = sum([key in f for key in keys[1000:]])
+        self.assertLess(false_positives, 30)
+        self.assertEqual(2000, f.lookups)
+        self.assertEqual(1000 + false_positives, f.hits)
+        # About 1.2 bytes per key
+        self.assertLess(f.nbytes, 1500)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(RuntimeError):
+            BloomFilter(0)
+        with self.assertRaises(RuntimeError):
+            BloomFilter(100, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
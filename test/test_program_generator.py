@@ -1,8 +1,15 @@
 import unittest
+import pickle
 import numpy as np
+from collections import Counter
 
 from src.dsl import Function, Type, Variable, Expression, Program, Signature
-from src.program_generator import arguments, programs, random_programs, IdGenerator, Variable, Type
+from src.program_simplifier import remove_redundant_variables
+from src.program_generator import arguments, argument_patterns, random_arguments, programs, ProgramEnumerator, compact_programs, random_programs, shards, shard_programs, parallel_programs, SymmetryBreaking, NoDeadCode, RandomProgramSampler, IdGenerator, Variable, Type
+
+
+def _length_of_source(program):
+    return len(program.to_string())
 
 
 class Test_program_generator(unittest.TestCase):
@@ -43,6 +50,33 @@ class Test_program_generator(unittest.TestCase):
         self.assertEqual(2, args[0].generator.generate())
         self.assertEqual(0, g.generate())
 
+    def test_argument_patterns(self):
+        self.assertEqual(((0, 0), (0, 1), (1, 0), (1, 1)),
+                         argument_patterns(1, 1, (Type.Int, Type.IntList)))
+        """
+        [v(0), v(0)]
+        [v(0), v_new]
+        [v_new, v(0)]
+        [v_new, v_new]
+        [v_new1, v_new2]
+        """
+        self.assertEqual(((0, 0), (0, 1), (1, 0), (1, 1), (1, 2)),
+                         argument_patterns(1, 0, (Type.Int, Type.Int)))
+
+    def test_random_arguments(self):
+        g = IdGenerator()
+        vs = set([Variable(g.generate(), Type.Int),
+                  Variable(g.generate(), Type.IntList)])
+        expected = set(map(lambda x: tuple(x.arguments), arguments(
+            g, vs, [Type.Int, Type.IntList])))
+        rng = np.random.RandomState(0)
+        actual = set()
+        for _ in range(100):
+            actual.add(tuple(random_arguments(
+                g, vs, [Type.Int, Type.IntList], rng).arguments))
+        self.assertEqual(expected, actual)
+        self.assertEqual(2, g.generate())
+
     def test_programs(self):
         TAKE = Function("TAKE", Signature(
             [Type.Int, Type.IntList], Type.IntList))
@@ -60,6 +94,122 @@ class Test_program_generator(unittest.TestCase):
 
         self.assertEqual(set([2]), l)
 
+    def test_programs_do_not_share_objects(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        expected = list(map(lambda x: x.to_string(), programs([TAKE], 1, 2)))
+        srcs = []
+        for p in programs([TAKE], 1, 2):
+            srcs.append(p.to_string())
+            # Modify the yielded program
+            for v in p.inputs:
+                v.id += 100
+            for statement in p.body:
+                statement.variable.id += 100
+        self.assertEqual(expected, srcs)
+
+    def test_program_enumerator_can_be_resumed(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        expected = list(map(lambda x: x.to_string(),
+                            programs([TAKE, HEAD], 1, 3)))
+
+        enumerator = ProgramEnumerator([TAKE, HEAD], 1, 3)
+        srcs = []
+        for p in enumerator:
+            srcs.append(p.to_string())
+            if len(srcs) == 10:
+                break
+        frontier = pickle.loads(pickle.dumps(enumerator.frontier))
+        for p in ProgramEnumerator([TAKE, HEAD], 1, 3, frontier=frontier):
+            srcs.append(p.to_string())
+        self.assertEqual(expected, srcs)
+
+    def test_shards(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        expected = list(map(lambda x: x.to_string(),
+                            programs([TAKE, HEAD], 1, 3)))
+        for depth in [1, 2, 4]:
+            srcs = []
+            for shard in shards([TAKE, HEAD], 3, depth):
+                srcs.extend(map(lambda x: x.to_string(),
+                                shard_programs([TAKE, HEAD], shard, 1, 3)))
+            self.assertEqual(expected, srcs)
+
+    def test_parallel_programs(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        expected = list(map(lambda x: x.to_string(),
+                            programs([TAKE, HEAD], 1, 2)))
+        for n in [1, 2]:
+            srcs = list(map(lambda x: x.to_string(), parallel_programs(
+                [TAKE, HEAD], 1, 2, n_processes=n, depth=2)))
+            self.assertEqual(expected, srcs)
+        self.assertEqual([len(src) for src in expected], list(parallel_programs(
+            [TAKE, HEAD], 1, 2, n_processes=2, transform=_length_of_source)))
+        # A shard is enumerated by multiple tasks
+        expected = list(map(lambda x: x.to_string(),
+                            programs([TAKE, HEAD], 1, 3)))
+        srcs = list(map(lambda x: x.to_string(), parallel_programs(
+            [TAKE, HEAD], 1, 3, n_processes=2, chunk_size=3)))
+        self.assertEqual(expected, srcs)
+
+    def test_symmetry_breaking(self):
+        REVERSE = Function("REVERSE", Signature(
+            [Type.IntList], Type.IntList))
+        ADD = Function("ZIPWITH +", Signature(
+            [Type.IntList, Type.IntList], Type.IntList))
+        constraint = SymmetryBreaking([REVERSE, ADD])
+        srcs = set(map(lambda x: x.to_string(), programs(
+            [REVERSE, ADD], 1, 2, [constraint])))
+        self.assertEqual(50, len(list(programs([REVERSE, ADD], 1, 2))))
+        self.assertEqual(38, len(srcs))
+        self.assertEqual(12, constraint.skipped)
+        self.assertTrue("a <- [int]\nb <- ZIPWITH + a a\nc <- ZIPWITH + a b\n" in srcs)
+        self.assertFalse("a <- [int]\nb <- ZIPWITH + a a\nc <- ZIPWITH + b a\n" in srcs)
+
+        # The independent statements are sorted by the index of functions
+        srcs = set(map(lambda x: x.to_string(), programs(
+            [REVERSE, ADD], 4, 4, [SymmetryBreaking([REVERSE, ADD])])))
+        self.assertTrue(
+            "a <- [int]\nb <- REVERSE a\nc <- REVERSE a\nd <- ZIPWITH + a a\ne <- ZIPWITH + c d\n" in srcs)
+        self.assertFalse(
+            "a <- [int]\nb <- REVERSE a\nc <- ZIPWITH + a a\nd <- REVERSE a\ne <- ZIPWITH + c d\n" in srcs)
+        # The statement that uses the new input of the former one is not reordered
+        self.assertTrue(
+            "a <- [int]\nb <- ZIPWITH + a a\nc <- REVERSE a\nd <- ZIPWITH + b c\n" in
+            set(map(lambda x: x.to_string(), programs([REVERSE, ADD], 3, 3, [SymmetryBreaking([REVERSE, ADD])]))))
+
+    def test_no_dead_code(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        expected = set([p.to_string() for p in programs([TAKE, HEAD], 1, 3)
+                        if len(remove_redundant_variables(p).body) == len(p.body)])
+        constraint = NoDeadCode([TAKE, HEAD], 3)
+        srcs = list(map(lambda x: x.to_string(), programs(
+            [TAKE, HEAD], 1, 3, [constraint])))
+        self.assertEqual(expected, set(srcs))
+        self.assertEqual(len(expected), len(srcs))
+        # The programs that start with the rejected prefixes are counted
+        self.assertEqual(len(list(programs([TAKE, HEAD], 1, 3))),
+                         len(srcs) + constraint.skipped)
+
+    def test_compact_programs(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        expected = list(map(lambda x: x.to_string(),
+                            programs([TAKE, HEAD], 1, 2)))
+        actual = list(map(lambda x: x.to_string(),
+                          compact_programs([TAKE, HEAD], 1, 2)))
+        self.assertEqual(len(expected), len(actual))
+        self.assertEqual(set(expected), set(actual))
+
 
 class Test_random_programs(unittest.TestCase):
     def test_random_programs(self):
@@ -72,6 +222,63 @@ class Test_random_programs(unittest.TestCase):
         self.assertTrue(min(l) >= 1)
         self.assertTrue(max(l) >= 2)
 
+    def test_random_programs_with_constraints(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        for _, program in zip(range(100), random_programs([TAKE, HEAD], 1, 3, rng=np.random.RandomState(100),
+                                                          constraints=[NoDeadCode([TAKE, HEAD], 3)])):
+            self.assertEqual(len(program.body), len(
+                remove_redundant_variables(program).body))
+
+
+class Test_RandomProgramSampler(unittest.TestCase):
+    def test_sample(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        sampler = RandomProgramSampler(
+            [TAKE, HEAD], 1, 3, rng=np.random.RandomState(100))
+        programs = sampler.sample(100)
+        self.assertEqual(100, len(programs))
+        l = set(map(lambda x: len(x.body), programs))
+        self.assertEqual(set([1, 2, 3]), l)
+        self.assertEqual(100, sampler.statistics.num_sampled)
+
+    def test_length_distribution_is_adjusted(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        sampler = RandomProgramSampler(
+            [TAKE, HEAD], 1, 2, rng=np.random.RandomState(100), batch_size=100)
+        rng = np.random.RandomState(0)
+        for _, program in zip(range(1000), sampler):
+            length = len(program.body)
+            # The half of the programs with length 2 are simplified into length 1
+            sampler.observe(length, 1 if length == 1 else rng.choice([1, 2]))
+        # The uniform distribution is achieved by sampling only length 2 programs
+        self.assertTrue(sampler.weights[1] > 0.9)
+        self.assertEqual(0, sampler.statistics.discard_rate())
+
+        sampler.observe(2, 0)
+        self.assertEqual(1, sampler.statistics.num_too_short)
+
+    def test_random_programs_without_dead_code_are_uniform(self):
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        expected = set([p.to_string() for p in programs([TAKE, HEAD], 3, 3)
+                        if len(remove_redundant_variables(p).body) == 3])
+        n = 3000
+        counts = Counter([p.to_string() for _, p in zip(
+            range(n), random_programs([TAKE, HEAD], 3, 3, rng=np.random.RandomState(0),
+                                      constraints=[NoDeadCode([TAKE, HEAD], 3)]))])
+        self.assertEqual(expected, set(counts.keys()))
+        # Chi-squared test (the critical value of 19 degrees of freedom at the significance level 0.001)
+        mean = n / len(expected)
+        self.assertEqual(20, len(expected))
+        self.assertLess(sum([(c - mean) ** 2 / mean for c in counts.values()]), 43.82)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+from src.dsl import Function, Type, Variable, Expression, Program, Signature, Statement
+from src.dataset import Entry
+from src.program_generator import programs
+from src.program_parser import Parser, parse, parse_dataset
+
+
+class Test_program_parser(unittest.TestCase):
+    def setUp(self):
+        self.HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        self.ACCESS = Function("ACCESS", Signature(
+            [Type.Int, Type.IntList], Type.Int))
+        self.MAP_INC = Function("MAP INC", Signature(
+            [Type.IntList], Type.IntList))
+        self.ZIPWITH = Function("ZIPWITH +", Signature(
+            [Type.IntList, Type.IntList], Type.IntList))
+        self.functions = [self.HEAD, self.ACCESS, self.MAP_INC, self.ZIPWITH]
+
+    def test_parse(self):
+        p = parse("a <- int\nb <- [int]\nc <- ACCESS a b", self.functions)
+        self.assertEqual(Program(
+            [Variable(0, Type.Int), Variable(1, Type.IntList)],
+            [Statement(Variable(2, Type.Int), Expression(
+                self.ACCESS, [Variable(0, Type.Int), Variable(1, Type.IntList)]))]), p)
+
+    def test_parse_is_inverse_of_to_string(self):
+        parser = Parser(self.functions)
+        for p in programs(self.functions, 1, 2):
+            self.assertEqual(p, parser.parse(p.to_string()))
+            self.assertEqual(p, parser.parse(p.to_string()[:-1]))
+
+    def test_parse_search_result(self):
+        parser = Parser(self.functions, {"map (+1)": "MAP INC"})
+        p = parser.parse_search_result(
+            " %2 <- access %0 %1\n", [Type.Int, Type.IntList])
+        self.assertEqual("a <- int\nb <- [int]\nc <- ACCESS a b\n", p.to_string())
+
+        p = parser.parse_search_result(
+            " %1 <- map (+1) %0\n %2 <- zipwith + %1 %0\n", [Type.IntList])
+        self.assertEqual("a <- [int]\nb <- MAP INC a\nc <- ZIPWITH + b a\n",
+                         p.to_string())
+
+    def test_parse_invalid_code(self):
+        parser = Parser(self.functions)
+        with self.assertRaises(RuntimeError):
+            parser.parse("a <- [int]\nb <- TAIL a")
+        with self.assertRaises(RuntimeError):
+            parser.parse("a <- [int]\nb <- HEAD c")
+
+    def test_parse_dataset(self):
+        dataset = [(Entry("a <- [int]\nb <- HEAD a", [], dict()),),
+                   (Entry("a <- [int]\nb <- MAP INC a", [], dict()),)]
+        self.assertEqual(["a <- [int]\nb <- HEAD a\n", "a <- [int]\nb <- MAP INC a\n"],
+                         [p.to_string() for p in parse_dataset(dataset, self.functions)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,9 @@ import unittest
 
 from src.dsl import Function, Type, Variable, Expression, Program, Signature, Statement
 from src.program_simplifier import normalize, remove_redundant_variables, remove_redundant_expressions, remove_dependency_between_variables
+from src.program_simplifier import remove_redundant_variables_in_place, remove_redundant_expressions_in_place, remove_dependency_between_variables_in_place, Pipeline
+from src.program_simplifier import remove_redundant_expressions_by_facts
+from src.program_generator import programs
 
 
 class Test_program_simplifier(unittest.TestCase):
@@ -164,6 +167,132 @@ class Test_program_simplifier(unittest.TestCase):
                 MAXIMUM, [Variable(0, Type.IntList)])),
         ]))
 
+    def test_remove_redundant_expressions_by_facts(self):
+        SORT = Function("SORT", Signature([Type.IntList], Type.IntList))
+        MAP_INC = Function("MAP INC", Signature([Type.IntList], Type.IntList))
+        MAP_SQR = Function("MAP SQR", Signature([Type.IntList], Type.IntList))
+        FILTER = Function("FILTER isPOS", Signature(
+            [Type.IntList], Type.IntList))
+        ZIPWITH = Function("ZIPWITH *", Signature(
+            [Type.IntList, Type.IntList], Type.IntList))
+        MAXIMUM = Function("MAXIMUM", Signature([Type.IntList], Type.Int))
+        MINIMUM = Function("MINIMUM", Signature([Type.IntList], Type.Int))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+
+        # Rule1
+        p = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.IntList), Expression(
+                SORT, [Variable(0, Type.IntList)])),
+            Statement(Variable(2, Type.IntList), Expression(
+                MAP_INC, [Variable(1, Type.IntList)])),
+            Statement(Variable(3, Type.IntList), Expression(
+                SORT, [Variable(2, Type.IntList)])),
+            Statement(Variable(4, Type.IntList), Expression(
+                ZIPWITH, [Variable(2, Type.IntList), Variable(3, Type.IntList)]))
+        ])
+        p = remove_redundant_expressions_by_facts(p, MINIMUM, MAXIMUM)
+        self.assertEqual(p, Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.IntList), Expression(
+                SORT, [Variable(0, Type.IntList)])),
+            Statement(Variable(2, Type.IntList), Expression(
+                MAP_INC, [Variable(1, Type.IntList)])),
+            Statement(Variable(4, Type.IntList), Expression(
+                ZIPWITH, [Variable(2, Type.IntList), Variable(2, Type.IntList)]))
+        ]))
+
+        # Rule2, Rule3
+        p = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.IntList), Expression(
+                MAP_SQR, [Variable(0, Type.IntList)])),
+            Statement(Variable(2, Type.IntList), Expression(
+                MAP_INC, [Variable(1, Type.IntList)])),
+            Statement(Variable(3, Type.IntList), Expression(
+                FILTER, [Variable(2, Type.IntList)])),
+            Statement(Variable(4, Type.IntList), Expression(
+                SORT, [Variable(3, Type.IntList)])),
+            Statement(Variable(5, Type.Int), Expression(
+                HEAD, [Variable(4, Type.IntList)]))
+        ])
+        p = remove_redundant_expressions_by_facts(p, MINIMUM, MAXIMUM)
+        self.assertEqual(p, Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.IntList), Expression(
+                MAP_SQR, [Variable(0, Type.IntList)])),
+            Statement(Variable(2, Type.IntList), Expression(
+                MAP_INC, [Variable(1, Type.IntList)])),
+            Statement(Variable(4, Type.IntList), Expression(
+                SORT, [Variable(2, Type.IntList)])),
+            Statement(Variable(5, Type.Int), Expression(
+                MINIMUM, [Variable(4, Type.IntList)]))
+        ]))
+
+    def test_in_place_rules_report_changes(self):
+        REVERSE = Function("REVERSE", Signature([Type.IntList], Type.IntList))
+        SORT = Function("SORT", Signature([Type.IntList], Type.IntList))
+        p = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.IntList), Expression(
+                REVERSE, [Variable(0, Type.IntList)]))
+        ])
+        self.assertFalse(remove_redundant_variables_in_place(p))
+        self.assertFalse(remove_redundant_expressions_in_place(p))
+
+        p.body.append(Statement(Variable(2, Type.IntList), Expression(
+            REVERSE, [Variable(0, Type.IntList)])))
+        p.body.append(Statement(Variable(3, Type.IntList), Expression(
+            SORT, [Variable(2, Type.IntList)])))
+        self.assertTrue(remove_redundant_expressions_in_place(p))
+        self.assertEqual(2, len(p.body))
+        self.assertEqual(Variable(1, Type.IntList),
+                         p.body[1].expression.arguments[0])
+
+    def test_remove_redundant_expressions_keeps_output(self):
+        REVERSE = Function("REVERSE", Signature([Type.IntList], Type.IntList))
+        SORT = Function("SORT", Signature([Type.IntList], Type.IntList))
+        p = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.IntList), Expression(
+                REVERSE, [Variable(0, Type.IntList)])),
+            Statement(Variable(2, Type.IntList), Expression(
+                SORT, [Variable(0, Type.IntList)])),
+            Statement(Variable(3, Type.IntList), Expression(
+                REVERSE, [Variable(1, Type.IntList)]))
+        ])
+        # The last statement defines the output, so it is not removed
+        self.assertEqual(p, remove_redundant_expressions(p))
+
+    def test_pipeline(self):
+        SORT = Function("SORT", Signature([Type.IntList], Type.IntList))
+        REVERSE = Function("REVERSE", Signature([Type.IntList], Type.IntList))
+        MAXIMUM = Function("MAXIMUM", Signature([Type.IntList], Type.Int))
+        MINIMUM = Function("MINIMUM", Signature([Type.IntList], Type.Int))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        ZIPWITH = Function("ZIPWITH *", Signature(
+            [Type.IntList, Type.IntList], Type.IntList))
+        functions = [SORT, REVERSE, MINIMUM, HEAD, ZIPWITH]
+
+        def simplify(program):
+            program = remove_redundant_expressions(program)
+            program = remove_dependency_between_variables(
+                program, MINIMUM, MAXIMUM)
+            return remove_redundant_variables(program)
+        pipeline = Pipeline([
+            remove_redundant_expressions_in_place,
+            lambda p: remove_dependency_between_variables_in_place(
+                p, MINIMUM, MAXIMUM),
+            remove_redundant_variables_in_place
+        ])
+
+        for p in programs(functions, 1, 3):
+            src = p.to_string()
+            expected = p
+            while True:
+                old = expected.to_string()
+                expected = simplify(expected)
+                if expected.to_string() == old:
+                    break
+            expected = normalize(expected)
+            self.assertEqual(expected.to_string(), pipeline(p).to_string())
+            # The argument is not modified
+            self.assertEqual(src, p.clone().to_string())
+
 
 if __name__ == "__main__":
     unittest.main()
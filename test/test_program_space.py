@@ -0,0 +1,63 @@
+import unittest
+
+from src.dsl import Function, Type, Signature
+from src.program_generator import programs, NoDeadCode
+from src.program_simplifier import remove_redundant_variables
+from src.program_space import count_programs, SizedIterator
+
+
+class Test_program_space(unittest.TestCase):
+    def setUp(self):
+        self.HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        self.TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        self.ZIPWITH = Function("ZIPWITH +", Signature(
+            [Type.IntList, Type.IntList], Type.IntList))
+        self.functions = [self.HEAD, self.TAKE, self.ZIPWITH]
+
+    def test_count_programs(self):
+        size = count_programs(self.functions, 1, 3)
+        ps = list(programs(self.functions, 1, 3))
+        self.assertEqual(len(ps), size.total())
+
+        by_length = dict()
+        by_signature = dict()
+        by_first_function = dict()
+        for p in ps:
+            signature = Signature([v.t for v in p.inputs], p.body[-1].variable.t)
+            f = p.body[0].expression.function
+            by_length[len(p.body)] = by_length.get(len(p.body), 0) + 1
+            by_signature[signature] = by_signature.get(signature, 0) + 1
+            by_first_function[f] = by_first_function.get(f, 0) + 1
+        self.assertEqual(by_length, size.by_length())
+        self.assertEqual(by_signature, size.by_signature())
+        self.assertEqual(by_first_function, size.by_first_function())
+
+    def test_count_programs_with_min_length(self):
+        size = count_programs(self.functions, 2, 3)
+        self.assertEqual(len(list(programs(self.functions, 2, 3))), size.total())
+        self.assertEqual(set([2, 3]), set(size.by_length().keys()))
+
+    def test_count_live_programs(self):
+        size = count_programs(self.functions, 1, 3)
+        live = list(programs(self.functions, 1, 3,
+                             [NoDeadCode(self.functions, 3)]))
+        self.assertEqual(len(live), size.total(live=True))
+        self.assertEqual({1: 2}, count_programs(
+            [self.HEAD, self.TAKE], 1, 1).by_length(live=True))
+
+        # They are the programs that remove_redundant_variables keeps unchanged
+        by_length = dict()
+        for p in programs(self.functions, 1, 3):
+            if len(remove_redundant_variables(p).body) == len(p.body):
+                by_length[len(p.body)] = by_length.get(len(p.body), 0) + 1
+        self.assertEqual(by_length, size.by_length(live=True))
+
+    def test_sized_iterator(self):
+        it = SizedIterator(iter([1, 2, 3]), 3)
+        self.assertEqual(3, len(it))
+        self.assertEqual([1, 2, 3], list(it))
+
+
+if __name__ == "__main__":
+    unittest.main()
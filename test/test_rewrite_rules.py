@@ -0,0 +1,90 @@
+import unittest
+import numpy as np
+
+from src.deepcoder_utils import generate_io_samples
+from src.dsl import Function, Type, Variable, Expression, Program, Signature, Statement, to_function
+from src.interpreter import execute, inputs_to_batch, output_key
+from src.rewrite_rules import RewriteEngine, RewriteRule, LINQ_RULES
+
+
+class Test_rewrite_rules(unittest.TestCase):
+    def test_linq_rules_preserve_semantics(self):
+        LINQ, _ = generate_io_samples.get_language(50)
+        functions = dict([(f.name, f) for f in map(to_function, LINQ)])
+        engine = RewriteEngine(LINQ_RULES, list(functions.values()))
+        rng = np.random.RandomState(0)
+
+        for rule in LINQ_RULES:
+            outer = functions[rule.outer]
+            inner = functions[rule.inner]
+            inputs = [Variable(i, t)
+                      for i, t in enumerate(inner.signature.input_types)]
+            x = Variable(len(inputs), inner.signature.output_type)
+            args = []
+            for i, t in enumerate(outer.signature.input_types):
+                if i == rule.position:
+                    args.append(x)
+                elif i < len(inputs) and inputs[i].t == t:
+                    args.append(inputs[i])
+                else:
+                    inputs.append(Variable(len(inputs) + 1, t))
+                    args.append(inputs[-1])
+            y = Variable(len(inputs) + 1, outer.signature.output_type)
+            p = Program(inputs, [
+                Statement(x, Expression(inner, inputs[:len(inner.signature.input_types)])),
+                Statement(y, Expression(outer, args))
+            ])
+            if y.t == Type.IntList:
+                # The last statement is not removed, so use the result of `outer`
+                p.body.append(Statement(Variable(len(inputs) + 2, Type.IntList),
+                                        Expression(functions["REVERSE"], [y])))
+            p_rewritten = p.clone()
+            self.assertTrue(engine(p_rewritten), rule)
+
+            examples = []
+            for _ in range(100):
+                examples.append([int(rng.randint(-5, 5)) if v.t == Type.Int else
+                                 list(map(int, rng.randint(-10, 10, size=rng.randint(0, 5))))
+                                 for v in inputs])
+            batch = inputs_to_batch(examples, [v.t for v in inputs])
+            self.assertEqual(output_key(execute(p, batch, 50)),
+                             output_key(execute(p_rewritten, batch, 50)), rule)
+
+    def test_rules_are_indexed(self):
+        SORT = Function("SORT", Signature([Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        TAKE = Function("TAKE", Signature(
+            [Type.Int, Type.IntList], Type.IntList))
+        engine = RewriteEngine(
+            [RewriteRule("TAKE", "SORT", "HEAD", [("inner", 0)], 1)], [HEAD])
+        a = Variable(0, Type.Int)
+        b = Variable(1, Type.IntList)
+        c = Variable(2, Type.IntList)
+        self.assertEqual(None, engine.rewrite(Expression(TAKE, [a, b]), {}))
+        self.assertEqual(Expression(HEAD, [b]), engine.rewrite(
+            Expression(TAKE, [a, c]), {c: Expression(SORT, [b])}))
+
+    def test_rules_without_functions_are_ignored(self):
+        SORT = Function("SORT", Signature([Type.IntList], Type.IntList))
+        HEAD = Function("HEAD", Signature([Type.IntList], Type.Int))
+        engine = RewriteEngine(LINQ_RULES, [])
+        a = Variable(0, Type.IntList)
+        b = Variable(1, Type.IntList)
+        # HEAD (SORT a) -> MINIMUM a requires MINIMUM
+        self.assertEqual(None, engine.rewrite(
+            Expression(HEAD, [b]), {b: Expression(SORT, [a])}))
+
+    def test_output_is_not_removed(self):
+        REVERSE = Function("REVERSE", Signature([Type.IntList], Type.IntList))
+        p = Program([Variable(0, Type.IntList)], [
+            Statement(Variable(1, Type.IntList), Expression(
+                REVERSE, [Variable(0, Type.IntList)])),
+            Statement(Variable(2, Type.IntList), Expression(
+                REVERSE, [Variable(1, Type.IntList)]))
+        ])
+        self.assertFalse(RewriteEngine(LINQ_RULES, [])(p))
+        self.assertEqual(2, len(p.body))
+
+
+if __name__ == "__main__":
+    unittest.main()
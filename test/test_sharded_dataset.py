@@ -0,0 +1,50 @@
+import unittest
+import tempfile
+import pickle
+import os
+
+from src.dataset import Entry, Example, DatasetMetadata
+from src.sharded_dataset import ShardedDatasetWriter, ShardedDataset, load
+
+
+def entry(i: int) -> Entry:
+    return Entry("a <- [int]\nb <- HEAD a", [Example([[i, 0]], i)], {"HEAD": True, "LAST": False})
+
+
+class Test_sharded_dataset(unittest.TestCase):
+    def test_write_and_read(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = ShardedDatasetWriter(tmpdir, 10, 5, max_shard_bytes=500)
+            for i in range(10):
+                writer.append(entry(i))
+            metadata = writer.close()
+            self.assertEqual(DatasetMetadata(
+                1, set(["HEAD", "LAST"]), 10, 5), metadata)
+            self.assertTrue(len([f for f in os.listdir(tmpdir) if f.startswith("shard")]) > 1)
+
+            dataset = ShardedDataset(tmpdir)
+            self.assertTrue(dataset.complete)
+            self.assertEqual(metadata, dataset.metadata)
+            self.assertEqual(10, len(dataset))
+            self.assertEqual([(entry(i),) for i in range(10)], list(dataset))
+            self.assertEqual((entry(3),), dataset[3])
+            self.assertEqual((entry(3),), pickle.loads(pickle.dumps(dataset))[3])
+
+            d = load(tmpdir)
+            self.assertEqual(metadata, d.metadata)
+            self.assertEqual(10, len(d.dataset))
+
+    def test_read_completed_shards_after_crash(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = ShardedDatasetWriter(tmpdir, 10, 5, max_shard_bytes=500)
+            for i in range(10):
+                writer.append(entry(i))
+            # The writer is not closed
+            dataset = ShardedDataset(tmpdir)
+            self.assertFalse(dataset.complete)
+            self.assertTrue(0 < len(dataset) < 10)
+            self.assertEqual([(entry(i),) for i in range(len(dataset))], list(dataset))
+
+
+if __name__ == "__main__":
+    unittest.main()